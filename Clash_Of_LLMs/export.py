@@ -0,0 +1,291 @@
+"""
+Exports of game results, generated as they are sent, so a download
+never holds the whole file in memory.
+
+Two tables can be exported: the stats of every turn played, and the
+per-node state trajectories of a game recorded with a StateHistory (see
+graph.frames), one row per node per step. Each table is produced as
+batches of typed columns, written out as CSV, newline-delimited JSON,
+or, when pyarrow is installed, Parquet or an Arrow IPC stream.
+"""
+import contextlib
+import csv
+import io
+import json
+
+import numpy as np
+
+from Clash_Of_LLMs.graph.node_state import ALIGNMENTS, ATTRIBUTES
+
+FORMATS = ("csv", "ndjson", "parquet", "arrow")
+MIMETYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "parquet": "parquet", "arrow": "arrows"}
+
+# Header of the stats download, as the game has always written it
+STATS_CSV_HEADER = (
+    "sep=|\nTurn|Team|Message|Potency|Red Alignment|Blue Alignment|Neutral Alignment|Red Influence|Blue Energy\n"
+)
+
+# Typed columns of the stats table: (name, stats key, type)
+STATS_COLUMNS = (
+    ("turn", None, "int64"),
+    ("team", "CurrentTeam", "string"),
+    ("message", "CurrentMessageContent", "string"),
+    ("potency", "CurrentPotency", "float64"),
+    ("red", "Red", "int64"),
+    ("red_percentage", "RedPercentage", "float64"),
+    ("blue", "Blue", "int64"),
+    ("blue_percentage", "BluePercentage", "float64"),
+    ("neutral", "Neutral", "int64"),
+    ("neutral_percentage", "NeutralPercentage", "float64"),
+    ("alienated", "Alienated", "int64"),
+    ("alienated_percentage", "AlienatedPercentage", "float64"),
+    ("blue_energy", "BlueEnergy", "float64"),
+)
+
+# Types of the trajectory columns of each node attribute
+TRAJECTORY_TYPES = {
+    "alignment": "string",
+    "susceptibility": "float64",
+    "uncertainty": "float64",
+    "alienated": "bool",
+}
+
+# Rows written to a Parquet row group (or Arrow chunk) at least, and
+# characters of text sent in one chunk at least
+ROWS_PER_CHUNK = 65536
+CHUNK_SIZE = 1 << 20
+
+
+def stats_csv(stats_table):
+    """
+    The stats of every turn in the "|" separated format of the game's
+    CSV download, one line at a time.
+
+    Parameters
+    ----------
+    stats_table : list
+        Stats of each turn (see Simulator.get_stats).
+    """
+    yield STATS_CSV_HEADER
+    if not stats_table:
+        return
+    total_pop = stats_table[0]["Red"] + stats_table[0]["Blue"] + stats_table[0]["Neutral"]
+    for i, entry in enumerate(stats_table):
+        yield (
+            f"{i // 2 + 1}|{entry['CurrentTeam']}|{entry['CurrentMessageContent']}|{entry['CurrentPotency']}"
+            f"|{entry['Red']}/{total_pop} ({entry['RedPercentage']}%)"
+            f"|{entry['Blue']}/{total_pop} ({entry['BluePercentage']}%)"
+            f"|{entry['Neutral']}/{total_pop} ({entry['NeutralPercentage']}%)"
+            f"|{total_pop - entry['Alienated']}/{total_pop} ({100 - entry['AlienatedPercentage']}%)"
+            f"|{entry['BlueEnergy']}\n"
+        )
+
+
+def stats_batches(stats_table):
+    """
+    The stats table as typed columns, turn being the round (a Red and a
+    Blue turn) the entry belongs to.
+
+    Returns
+    -------
+    columns : list
+        (name, type) of each column.
+    batches : iterator
+        Dicts of column name -> values.
+    """
+    columns = [(name, dtype) for name, _, dtype in STATS_COLUMNS]
+
+    def batches():
+        for start in range(0, len(stats_table), ROWS_PER_CHUNK):
+            entries = stats_table[start:start + ROWS_PER_CHUNK]
+            batch = {"turn": [(start + i) // 2 + 1 for i in range(len(entries))]}
+            for name, key, _ in STATS_COLUMNS[1:]:
+                batch[name] = [entry[key] for entry in entries]
+            yield batch
+
+    return columns, batches()
+
+
+def trajectory_batches(history, labels, fields=None, lock=None):
+    """
+    The recorded state of every node at every step, one batch (of one
+    row per node) per step. Steps are rebuilt one after another from the
+    history's keyframes and deltas, so only one step is held in memory
+    at a time.
+
+    Parameters
+    ----------
+    history : StateHistory
+        The recorded steps.
+    labels : list
+        Node label of each row.
+    fields : list, optional
+        Node attributes to export. The default is all of ATTRIBUTES.
+    lock : threading.Lock, optional
+        Held while each step is read, e.g. the lock of a game that may
+        still be played. The export ends early if the history is cleared
+        (the game restarted) meanwhile.
+
+    Returns
+    -------
+    columns : list
+        (name, type) of each column.
+    batches : iterator
+        Dicts of column name -> values.
+
+    Raises
+    ------
+    ValueError
+        If a field is not a node attribute.
+    """
+    fields = list(ATTRIBUTES) if fields is None else list(fields)
+    if any(field not in ATTRIBUTES for field in fields):
+        raise ValueError(f"Invalid field. Must be one of {', '.join(ATTRIBUTES)}.")
+    integer_labels = all(isinstance(label, (int, np.integer)) for label in labels)
+    columns = [("step", "int64"), ("node", "int64" if integer_labels else "string")]
+    columns += [(field, TRAJECTORY_TYPES[field]) for field in fields]
+    nodes = np.asarray(labels) if integer_labels else np.array([str(label) for label in labels], dtype=object)
+    names = np.array(ALIGNMENTS, dtype=object)
+    lock = contextlib.nullcontext() if lock is None else lock
+
+    def batches():
+        with lock:
+            stores = history.stores
+            steps = list(history.steps)
+            frames = {field: iter(stores[field]) for field in fields} if stores else {}
+        for step in steps:
+            with lock:
+                if history.stores is not stores:
+                    return
+                values = {field: next(frames[field]) for field in fields}
+            batch = {"step": np.full(len(nodes), step, dtype=np.int64), "node": nodes}
+            for field in fields:
+                if field == "alignment":
+                    batch[field] = names[values[field]]
+                elif field == "alienated":
+                    batch[field] = np.unpackbits(values[field], count=len(nodes), bitorder="little").astype(bool)
+                else:
+                    batch[field] = values[field]
+            yield batch
+
+    return columns, batches()
+
+
+def _values(values):
+    return values.tolist() if isinstance(values, np.ndarray) else values
+
+
+def write_csv(columns, batches):
+    """
+    Comma separated text, with a header row.
+    """
+    names = [name for name, _ in columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(names)
+    for batch in batches:
+        writer.writerows(zip(*(_values(batch[name]) for name in names)))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_ndjson(columns, batches):
+    """
+    One JSON object per row, with numbers, booleans and nulls typed as
+    in the columns (rather than as text, as in CSV).
+    """
+    names = [name for name, _ in columns]
+    for batch in batches:
+        lines = [json.dumps(dict(zip(names, row))) for row in zip(*(_values(batch[name]) for name in names))]
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError("Invalid format. Parquet and Arrow exports need pyarrow installed.") from None
+    return pyarrow
+
+
+def write_arrow(columns, batches, format="arrow"):
+    """
+    A Parquet file, or an Arrow IPC stream, written a row group (or
+    record batch) at a time.
+
+    Raises
+    ------
+    ValueError
+        If pyarrow is not installed.
+    """
+    pa = _pyarrow()
+    if format == "parquet":
+        import pyarrow.parquet as pq
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(), "bool": pa.bool_()}
+    schema = pa.schema([(name, types[dtype]) for name, dtype in columns])
+
+    def chunks():
+        sink = io.BytesIO()
+        writer = pq.ParquetWriter(sink, schema) if format == "parquet" else pa.ipc.new_stream(sink, schema)
+        pending, rows = [], 0
+        for batch in batches:
+            record_batch = pa.record_batch(
+                [pa.array(batch[name], types[dtype]) for name, dtype in columns], schema=schema
+            )
+            pending.append(record_batch)
+            rows += record_batch.num_rows
+            if rows >= ROWS_PER_CHUNK:
+                writer.write_table(pa.Table.from_batches(pending, schema))
+                pending, rows = [], 0
+                yield sink.getvalue()
+                sink.seek(0)
+                sink.truncate()
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema))
+        writer.close()
+        yield sink.getvalue()
+
+    return chunks()
+
+
+def write(columns, batches, format):
+    """
+    Write batches of columns in an export format.
+
+    Parameters
+    ----------
+    columns : list
+        (name, type) of each column.
+    batches : iterator
+        Dicts of column name -> values.
+    format : str
+        One of FORMATS.
+
+    Returns
+    -------
+    iterator
+        Chunks of the file, str for text formats and bytes otherwise.
+
+    Raises
+    ------
+    ValueError
+        If the format is unknown, or needs pyarrow and it is not
+        installed. Raised before anything is written.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Invalid format. Must be one of {', '.join(FORMATS)}.")
+    if format == "csv":
+        return write_csv(columns, batches)
+    if format == "ndjson":
+        return write_ndjson(columns, batches)
+    return write_arrow(columns, batches, format)
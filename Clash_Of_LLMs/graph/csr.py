@@ -0,0 +1,216 @@
+import networkx as nx
+import numpy as np
+
+
+class CSRGraph:
+    """
+    Compressed sparse row (CSR) adjacency for an undirected network. The
+    neighbours of node ``i`` are ``indices[indptr[i]:indptr[i + 1]]``,
+    with every undirected edge stored once in each direction.
+
+    Attributes
+    ----------
+    indptr : numpy.ndarray
+        Row offsets into ``indices`` (length ``num_nodes + 1``).
+    indices : numpy.ndarray
+        Concatenated neighbour lists.
+    labels : list
+        Node label for each row, in the order the rows are stored.
+
+    Methods
+    -------
+    from_networkx(G)
+        Build a CSR adjacency from a networkx graph.
+    from_edges(num_nodes, sources, targets)
+        Build a CSR adjacency from an edge list.
+    to_networkx()
+        Build the equivalent networkx graph.
+    row(node) / rows(nodes)
+        Map node labels to row indices.
+    neighbors(node)
+        Return the neighbours of a node as an array of row indices.
+    gather(frontier)
+        Return (source, target) row index pairs for every edge leaving
+        the frontier.
+    """
+
+    def __init__(self, indptr, indices, labels=None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        num_nodes = len(self.indptr) - 1
+        self.labels = list(range(num_nodes)) if labels is None else list(labels)
+        if self.labels == list(range(num_nodes)):
+            self._index = None
+        else:
+            self._index = {label: i for i, label in enumerate(self.labels)}
+
+    @classmethod
+    def from_networkx(cls, G):
+        """
+        Build a CSR adjacency from a networkx graph. Rows follow the
+        node order of ``G`` and each neighbour list keeps the order of
+        ``G.neighbors(node)``, so loops over the CSR arrays visit nodes
+        and edges in the same order as loops over ``G``.
+
+        Parameters
+        ----------
+        G : networkx.Graph
+            The graph to convert.
+
+        Returns
+        -------
+        CSRGraph
+            The CSR adjacency.
+        """
+        labels = list(G.nodes)
+        if labels == list(range(len(labels))):
+            index = None
+        else:
+            index = {label: i for i, label in enumerate(labels)}
+
+        degrees = np.fromiter(
+            (len(G._adj[label]) for label in labels), dtype=np.int64, count=len(labels)
+        )
+        indptr = np.zeros(len(labels) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+
+        neighbours = (nbr for label in labels for nbr in G._adj[label])
+        if index is not None:
+            neighbours = (index[nbr] for nbr in neighbours)
+        indices = np.fromiter(neighbours, dtype=np.int32, count=int(indptr[-1]))
+        return cls(indptr, indices, labels)
+
+    @classmethod
+    def from_edges(cls, num_nodes, sources, targets):
+        """
+        Build a CSR adjacency from an undirected edge list. Duplicate
+        edges are merged, and each neighbour list is sorted.
+
+        Parameters
+        ----------
+        num_nodes : int
+            Number of nodes, labelled 0 to num_nodes - 1.
+        sources, targets : numpy.ndarray
+            Endpoints of each edge.
+
+        Returns
+        -------
+        CSRGraph
+            The CSR adjacency.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        keys = np.minimum(sources, targets) * num_nodes + np.maximum(sources, targets)
+        keys.sort()
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+        low, high = np.divmod(keys, num_nodes)
+
+        # Store each edge in both directions (self-loops once), sorted by
+        # (row, column)
+        loop = low == high
+        entries = np.concatenate([keys, high[~loop] * num_nodes + low[~loop]])
+        entries.sort()
+        rows, columns = np.divmod(entries, num_nodes)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+        return cls(indptr, columns)
+
+    def to_networkx(self):
+        """
+        Build the equivalent networkx graph, with the same node order and
+        the same neighbour order, so loops over G visit nodes and edges
+        in the same order as loops over the CSR arrays.
+
+        Returns
+        -------
+        networkx.Graph
+            The graph.
+        """
+        G = nx.Graph()
+        G.add_nodes_from(self.labels)
+        # Fill the adjacency dicts directly, in row order: adding edges
+        # would order each neighbour list by when its edges were added.
+        # Both directions of an edge share one data dict, as in networkx
+        adj = G._adj
+        labels = self.labels
+        indptr = self.indptr.tolist()
+        neighbours = self.indices.tolist()
+        for u, label in enumerate(labels):
+            row = adj[label]
+            for v in neighbours[indptr[u]:indptr[u + 1]]:
+                other = labels[v]
+                data = adj[other].get(label)
+                row[other] = {} if data is None else data
+        return G
+
+    def edges(self):
+        """
+        Return every undirected edge once, as (source, target) row index
+        arrays, in the order networkx lists ``G.edges``.
+        """
+        rows = np.repeat(np.arange(self.num_nodes), self.degrees())
+        upper = self.indices >= rows
+        return rows[upper], self.indices[upper].astype(np.int64)
+
+    @property
+    def num_nodes(self):
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self):
+        """
+        Number of undirected edges (self-loops are stored once).
+        """
+        rows = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+        loops = int(np.count_nonzero(rows == self.indices))
+        return (len(self.indices) - loops) // 2 + loops
+
+    def row(self, node):
+        """
+        Map a node label to its row index.
+        """
+        return node if self._index is None else self._index[node]
+
+    def rows(self, nodes):
+        """
+        Map an iterable of node labels to an array of row indices.
+        """
+        if self._index is None:
+            return np.fromiter(nodes, dtype=np.int64)
+        return np.fromiter((self._index[node] for node in nodes), dtype=np.int64)
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def neighbors(self, node):
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def gather(self, frontier):
+        """
+        Return every edge leaving the frontier as two aligned arrays.
+
+        Parameters
+        ----------
+        frontier : numpy.ndarray
+            Row indices of the frontier nodes.
+
+        Returns
+        -------
+        sources : numpy.ndarray
+            Row index of the frontier node for each edge.
+        targets : numpy.ndarray
+            Row index of the neighbour for each edge.
+        """
+        frontier = np.asarray(frontier, dtype=np.int64)
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        sources = np.repeat(frontier, counts)
+        # Position of each edge within its row, added to the row start
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        targets = self.indices[np.repeat(starts, counts) + offsets].astype(np.int64)
+        return sources, targets
@@ -0,0 +1,124 @@
+import itertools
+import secrets
+
+import numpy as np
+
+from Clash_Of_LLMs.graph.node_state import ATTRIBUTES
+
+# Versions come from one counter per process, so every new tracker starts
+# above the versions of the trackers before it. The counter starts at a
+# random point, so the versions a tracker issues are, all but certainly,
+# not ones another process (or this server before a restart) issued, and
+# clients holding those get a full resync. Versions stay below 2 ** 53,
+# which JSON numbers (JavaScript doubles) hold exactly.
+_versions = itertools.count(secrets.randbelow(2**52))
+
+
+class DeltaTracker:
+    """
+    Tracks which nodes changed between versions of a NodeState, so
+    clients can be sent only the nodes that changed since the version
+    they hold. Changes are found by comparing the state arrays with a
+    snapshot at each commit, which costs O(n) per version whatever code
+    made the changes. Whether anything changed since the last commit is
+    read from NodeState.generation, so reads of an unchanged state need
+    no commit.
+
+    Attributes
+    ----------
+    version : int
+        Current version of the state.
+    base_version : int
+        Version the tracker started at. Clients holding an older (or
+        unknown) version need a full resync.
+    node_version : dict
+        Version at which each node last changed, per attribute (see
+        node_state.ATTRIBUTES).
+    pending : bool
+        Whether the state may have changed since the last commit.
+
+    Methods
+    -------
+    mark_changed()
+        Note that the state may have changed, e.g. after writing its
+        arrays directly.
+    commit()
+        Record the changes since the last commit as a new version.
+    changed_since(version, fields)
+        Nodes changed after a version, or None if a full resync is
+        needed.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.version = self.base_version = next(_versions)
+        self.node_version = {
+            field: np.full(state.num_nodes, self.version, dtype=np.int64)
+            for field in ATTRIBUTES
+        }
+        self._snapshot = self._take_snapshot()
+        self._generation = state.generation
+        self._marked = False
+
+    @property
+    def pending(self):
+        return self._marked or self.state.generation != self._generation
+
+    def _take_snapshot(self):
+        # Alienated flags are compared packed, eight nodes per byte
+        return {field: getattr(self.state, field).copy() for field in ATTRIBUTES}
+
+    def mark_changed(self):
+        self._marked = True
+
+    def commit(self):
+        """
+        Record the nodes changed since the last commit under a new
+        version.
+
+        Returns
+        -------
+        int
+            The new version.
+        """
+        state = self.state
+        self.version = next(_versions)
+        for field in ATTRIBUTES:
+            if field == "alienated":
+                changed = np.unpackbits(
+                    state.alienated ^ self._snapshot[field],
+                    count=state.num_nodes,
+                    bitorder="little",
+                ).astype(bool)
+            else:
+                changed = getattr(state, field) != self._snapshot[field]
+            self.node_version[field][changed] = self.version
+        self._snapshot = self._take_snapshot()
+        self._generation = state.generation
+        self._marked = False
+        return self.version
+
+    def changed_since(self, version, fields=ATTRIBUTES):
+        """
+        Nodes that changed after a given version.
+
+        Parameters
+        ----------
+        version : int or None
+            Version held by the client.
+        fields : iterable, optional
+            Attributes to consider. The default is all of them.
+
+        Returns
+        -------
+        numpy.ndarray or None
+            Row indices of the changed nodes, or None if the version is
+            not one of this tracker's, and the client needs a full
+            resync.
+        """
+        if version is None or not self.base_version <= version <= self.version:
+            return None
+        changed = np.zeros(self.state.num_nodes, dtype=bool)
+        for field in fields:
+            changed |= self.node_version[field] > version
+        return np.flatnonzero(changed)
@@ -0,0 +1,293 @@
+import numpy as np
+
+from Clash_Of_LLMs.graph.kernels import influence_kernel, message_influence_kernel
+from Clash_Of_LLMs.graph.node_state import ALIGNMENT_CODES, BLUE, NEUTRAL, RED
+
+METRICS = ("Red", "Blue", "Neutral", "Alienated")
+
+
+class Ensemble:
+    """
+    Monte Carlo ensemble of R independent replicas of one game, played
+    on the graph of a Simulator. The state of every replica is stored as
+    (R, N) arrays, so each diffusion step and peer influence sweep is a
+    single vectorised operation across all replicas.
+
+    Message spreading follows Simulator.spread_message_csr exactly. Peer
+    influence is a synchronous approximation of Simulator.green_influence:
+    the serial sweep lets each node see the changes made earlier in the
+    same sweep, which cannot be batched. Instead the sweep runs in
+    rounds, where round k lets every node be influenced by its k-th
+    neighbour (in node order) if that neighbour is more certain, with
+    all pairs in a round reading the state left by the previous round.
+
+    Attributes
+    ----------
+    simulator : Simulator
+        The simulator whose graph and parameters are used.
+    num_replicas : int
+        Number of replicas (R).
+    alignment : numpy.ndarray
+        (R, N) int8 alignment codes.
+    uncertainty : numpy.ndarray
+        (R, N) uncertainties.
+    susceptibility : numpy.ndarray
+        (R, N) susceptibilities.
+    alienated : numpy.ndarray
+        (R, N) boolean alienated flags.
+    history : dict
+        Per-step counts for each of METRICS, as lists of (R,) arrays.
+
+    Methods
+    -------
+    reset()
+        Return every replica to the starting state.
+    play(messages, quantiles)
+        Play a scripted game in every replica and summarise the counts.
+    play_turn(team, potency)
+        Introduce a message and spread it for one turn.
+    step(team, potency, active)
+        Advance every replica by one simulation step.
+    summary(quantiles)
+        Per-step mean and quantile curves for each metric.
+    """
+
+    def __init__(self, simulator, num_replicas=100, random_seed=None, resample_attributes=False):
+        """
+        Parameters
+        ----------
+        simulator : Simulator
+            The simulator to replicate.
+        num_replicas : int, optional
+            Number of replicas. The default is 100.
+        random_seed : int or numpy.random.SeedSequence, optional
+            Seed for the replica draws. The default spawns a seed from
+            the simulator's seed sequence.
+        resample_attributes : bool, optional
+            Whether each replica starts from freshly drawn node attributes,
+            as in Simulator.initialize_node_attributes. When False, every
+            replica starts from the simulator's current state. The default
+            is False.
+        """
+        if num_replicas < 1:
+            raise ValueError("Invalid number of replicas. Must be at least 1.")
+        self.simulator = simulator
+        self.num_replicas = num_replicas
+        self.resample_attributes = resample_attributes
+        if random_seed is None:
+            random_seed = simulator.seed_sequence.spawn(1)[0]
+        self.rng = np.random.default_rng(random_seed)
+
+        # Superior neighbours of each node in the order the serial sweep
+        # visits them (CSR order, which follows G.neighbors), for the
+        # synchronous peer influence rounds
+        csr = simulator.csr
+        inferiors = np.repeat(np.arange(csr.num_nodes), csr.degrees())
+        superiors = csr.indices.astype(np.int64)
+        rank = np.arange(len(inferiors)) - csr.indptr[inferiors]
+        by_rank = np.argsort(rank, kind="stable")
+        splits = np.cumsum(np.bincount(rank))[:-1]
+        self._sweep_rounds = list(zip(
+            np.split(inferiors[by_rank], splits), np.split(superiors[by_rank], splits)
+        ))
+
+        self.reset()
+
+    def reset(self):
+        """
+        Return every replica to the starting state and clear the history.
+        """
+        R = self.num_replicas
+        n = self.simulator.csr.num_nodes
+        state = self.simulator.state
+        if self.resample_attributes:
+            uncertainty = getattr(self.simulator, "uncertainty", 2.0)
+            self.susceptibility = self.rng.uniform(0.0, 1.0, (R, n))
+            if self.simulator.use_random_start_alignments:
+                self.alignment = self.rng.choice([RED, BLUE], (R, n)).astype(np.int8)
+                self.uncertainty = self.rng.uniform(-(uncertainty), uncertainty, (R, n))
+            else:
+                self.alignment = np.full((R, n), NEUTRAL, dtype=np.int8)
+                self.uncertainty = np.full((R, n), float(uncertainty))
+            self.alienated = np.zeros((R, n), dtype=bool)
+        else:
+            self.alignment = np.tile(state.alignment, (R, 1))
+            self.uncertainty = np.tile(state.uncertainty, (R, 1))
+            self.susceptibility = np.tile(state.susceptibility, (R, 1))
+            self.alienated = np.tile(state.alienated_mask(), (R, 1))
+
+        self.history = {metric: [] for metric in METRICS}
+        self.record()
+
+    def record(self):
+        """
+        Append the current counts of every replica to the history.
+        """
+        red = np.count_nonzero(self.alignment == RED, axis=1)
+        blue = np.count_nonzero(self.alignment == BLUE, axis=1)
+        self.history["Red"].append(red)
+        self.history["Blue"].append(blue)
+        self.history["Neutral"].append(self.alignment.shape[1] - red - blue)
+        self.history["Alienated"].append(np.count_nonzero(self.alienated, axis=1))
+
+    def activate_source_nodes(self, team):
+        """
+        Choose source nodes independently in each replica and switch them
+        to the team, as in Simulator.activate_source_nodes.
+
+        Returns
+        -------
+        active : numpy.ndarray
+            (R, N) boolean mask of the source nodes.
+        """
+        R, n = self.alignment.shape
+        num_initial = int(self.simulator.source_activation_rate * self.simulator.num_nodes)
+        # The num_initial smallest of N random keys are a uniform sample
+        keys = self.rng.random((R, n))
+        if num_initial > 0:
+            chosen = np.argpartition(keys, num_initial - 1, axis=1)[:, :num_initial]
+        else:
+            chosen = np.empty((R, 0), dtype=np.int64)
+        active = np.zeros((R, n), dtype=bool)
+        np.put_along_axis(active, chosen, True, axis=1)
+        self.alignment[active] = ALIGNMENT_CODES[team]
+        return active
+
+    def spread(self, team, potency, active):
+        """
+        Spread a message one step from the active nodes of every replica,
+        with one Bernoulli trial per edge as in
+        Simulator.spread_message_csr.
+
+        Returns
+        -------
+        new_active : numpy.ndarray
+            (R, N) boolean mask of the influenced nodes.
+        """
+        csr = self.simulator.csr
+        R, n = self.alignment.shape
+        flat_active = np.flatnonzero(active)
+        replicas, nodes = np.divmod(flat_active, n)
+        _, targets = csr.gather(nodes)
+        targets += np.repeat(replicas, csr.degrees()[nodes]) * n
+
+        # Flat (replica, node) indices of the neighbours that are not active
+        is_active = active.ravel()
+        targets = targets[~is_active[targets]]
+        candidates, position = np.unique(targets, return_inverse=True)
+
+        alignment = self.alignment.reshape(-1)
+        uncertainty = self.uncertainty.reshape(-1)
+        alienated = self.alienated.reshape(-1)
+        probability = (
+            self.simulator.base_influence_prob
+            * potency
+            * self.susceptibility.reshape(-1)[candidates]
+        )
+        probability[alignment[candidates] != ALIGNMENT_CODES[team]] *= 0.8
+        if team == "Red":
+            probability[alienated[candidates]] = 0.0
+
+        trials = self.rng.random(len(position)) < probability[position]
+        winners = np.unique(candidates[position[trials]])
+
+        new_alignment, new_uncertainty, alienate = message_influence_kernel(
+            alignment[winners], uncertainty[winners], ALIGNMENT_CODES[team], potency
+        )
+        alignment[winners] = new_alignment
+        uncertainty[winners] = new_uncertainty
+        alienated[winners[alienate]] = True
+
+        new_active = np.zeros(R * n, dtype=bool)
+        new_active[winners] = True
+        return new_active.reshape(R, n)
+
+    def green_influence(self):
+        """
+        Synchronous peer influence sweep across every replica (see the
+        class docstring for how it differs from the serial sweep).
+        """
+        for inferior, superior in self._sweep_rounds:
+            U2 = self.uncertainty[:, inferior]
+            U1 = self.uncertainty[:, superior]
+            influenced = U1 < U2
+            if not influenced.any():
+                continue
+            A2 = self.alignment[:, inferior]
+            alignment, uncertainty = influence_kernel(
+                self.alignment[:, superior], U1, A2, U2
+            )
+            self.alignment[:, inferior] = np.where(influenced, alignment, A2)
+            self.uncertainty[:, inferior] = np.where(influenced, uncertainty, U2)
+
+    def step(self, team, potency, active):
+        """
+        Advance every replica by one simulation step: spread the message,
+        then run peer influence and record the counts.
+
+        Returns
+        -------
+        new_active : numpy.ndarray
+            (R, N) boolean mask of the nodes influenced this step.
+        """
+        new_active = self.spread(team, potency, active)
+        self.green_influence()
+        self.record()
+        return new_active
+
+    def play_turn(self, team, potency):
+        """
+        Introduce a message for a team and spread it for steps_per_turn
+        steps in every replica.
+        """
+        if team not in ["Red", "Blue"]:
+            raise ValueError("Invalid team. Must be 'Red' or 'Blue'.")
+        active = self.activate_source_nodes(team)
+        for _ in range(self.simulator.steps_per_turn):
+            active = self.step(team, potency, active)
+
+    def play(self, messages, quantiles=(0.05, 0.5, 0.95)):
+        """
+        Play a scripted game in every replica, one message per turn.
+        Blue energy is not tracked, so every message is played.
+
+        Parameters
+        ----------
+        messages : list
+            (team, potency) pairs, one per turn.
+        quantiles : tuple, optional
+            Quantiles to report. The default is (0.05, 0.5, 0.95).
+
+        Returns
+        -------
+        dict
+            See summary().
+        """
+        for team, potency in messages:
+            self.play_turn(team, float(potency))
+        return self.summary(quantiles)
+
+    def summary(self, quantiles=(0.05, 0.5, 0.95)):
+        """
+        Summarise the recorded counts across replicas.
+
+        Parameters
+        ----------
+        quantiles : tuple, optional
+            Quantiles to report. The default is (0.05, 0.5, 0.95).
+
+        Returns
+        -------
+        dict
+            For each of METRICS, a dict with the per-step "mean" and a
+            per-step curve for each quantile, keyed by the quantile. Step
+            0 is the starting state.
+        """
+        summary = {}
+        for metric in METRICS:
+            counts = np.stack(self.history[metric])
+            curves = {"mean": counts.mean(axis=1)}
+            for q, curve in zip(quantiles, np.quantile(counts, quantiles, axis=1)):
+                curves[q] = curve
+            summary[metric] = curves
+        return summary
@@ -0,0 +1,331 @@
+import bisect
+import os
+import tempfile
+
+import numpy as np
+
+from Clash_Of_LLMs.graph.node_state import ATTRIBUTES, NodeState
+
+# Frame kinds
+KEYFRAME, DELTA = 0, 1
+
+
+class FrameStore:
+    """
+    Node alignments (or another per-node array) at each recorded step of
+    a game, stored compactly: a full keyframe every keyframe_interval
+    frames, and in between only the entries that changed since the
+    previous frame. A frame whose delta would be larger than the full
+    values (e.g. uncertainty, which changes on most nodes) is stored as
+    a keyframe instead. Any frame is rebuilt from the last keyframe
+    before it and the (at most keyframe_interval - 1) deltas after that.
+
+    Frames are held in memory until they take more than max_memory
+    bytes; the store then spills them, and every later frame, to a
+    temporary file in spill_dir, read back through a memory map.
+
+    Parameters
+    ----------
+    keyframe_interval : int, optional
+        Frames between keyframes. The default is 32.
+    max_memory : int, optional
+        Bytes of frames held in memory before spilling. None never
+        spills. The default is None.
+    spill_dir : str, optional
+        Directory of the spill file. The default is the system temporary
+        directory.
+    dtype : numpy.dtype, optional
+        Type of the stored values. The default is uint8, for alignment
+        codes.
+
+    Attributes
+    ----------
+    steps : list
+        The step of each frame, in recording order.
+    spilled : bool
+        Whether the frames are in the spill file.
+
+    Methods
+    -------
+    record(step, values)
+        Add a frame.
+    frame(step)
+        Values at a recorded step.
+    clear()
+        Drop every frame.
+    close()
+        Drop every frame and delete the spill file.
+    """
+
+    def __init__(self, keyframe_interval=32, max_memory=None, spill_dir=None, dtype=np.uint8):
+        if keyframe_interval < 1:
+            raise ValueError("Invalid keyframe interval. Must be at least 1.")
+        self.keyframe_interval = keyframe_interval
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.dtype = np.dtype(dtype)
+        self._file = None
+        self._map = None
+        self.clear()
+
+    def clear(self):
+        self.steps = []
+        self._index = {}
+        # Per frame: (kind, payload), where payload is the arrays, or
+        # (offset, count) into the spill file
+        self._frames = []
+        self._keyframes = []
+        self._last = None
+        self._memory = 0
+        if self._file is not None:
+            self._map = None
+            self._file.seek(0)
+            self._file.truncate()
+        self.spilled = self._file is not None
+
+    def close(self):
+        self.clear()
+        if self._file is not None:
+            self._map = None
+            self._file.close()
+            self._file = None
+            self.spilled = False
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, step):
+        return step in self._index
+
+    @property
+    def nbytes(self):
+        """
+        Bytes of frames held in memory (not counting the spill file).
+        """
+        return self._memory + (self._last.nbytes if self._last is not None else 0)
+
+    def record(self, step, values):
+        """
+        Add the values of a step.
+
+        Parameters
+        ----------
+        step : int
+            The step. Recording a step again replaces it for frame(step).
+        values : numpy.ndarray
+            Value of each node, e.g. its alignment code.
+        """
+        values = np.asarray(values)
+        if values.dtype.itemsize == self.dtype.itemsize and values.dtype.kind in "iub" and self.dtype.kind in "iub":
+            # Same-size integer codes (e.g. int8 alignments) without a copy
+            values = values.view(self.dtype)
+        else:
+            values = values.astype(self.dtype, copy=False)
+        if self._last is not None and len(values) != len(self._last):
+            raise ValueError("Invalid values. Must have one entry per node of the recorded frames.")
+
+        frame = None
+        if self._keyframes and len(self._frames) - self._keyframes[-1] < self.keyframe_interval:
+            changed = np.flatnonzero(values != self._last).astype(np.int32)
+            if changed.nbytes + len(changed) * self.dtype.itemsize < values.nbytes:
+                frame = (DELTA, (changed, values[changed]))
+        if frame is None:
+            self._keyframes.append(len(self._frames))
+            frame = (KEYFRAME, (values.copy(),))
+        self._last = values.copy()
+        self._index[step] = len(self._frames)
+        self.steps.append(step)
+
+        if self.spilled:
+            frame = self._write(frame)
+        else:
+            self._memory += sum(array.nbytes for array in frame[1])
+        self._frames.append(frame)
+        if not self.spilled and self.max_memory is not None and self._memory > self.max_memory:
+            self.spill()
+
+    def spill(self):
+        """
+        Move the frames to the spill file, where later frames also go.
+        """
+        if self.spilled:
+            return
+        self._file = tempfile.TemporaryFile(prefix="clash_frames_", dir=self.spill_dir)
+        self.spilled = True
+        self._frames = [self._write(frame) for frame in self._frames]
+        self._memory = 0
+
+    def _write(self, frame):
+        kind, arrays = frame
+        offset = self._file.seek(0, os.SEEK_END)
+        for array in arrays:
+            self._file.write(array.tobytes())
+        self._map = None
+        return kind, (offset, len(arrays[-1]))
+
+    def _read(self, index):
+        """
+        The arrays of a frame: (values,) of a keyframe, (changed nodes,
+        their values) of a delta.
+        """
+        kind, payload = self._frames[index]
+        if not self.spilled:
+            return kind, payload
+        if self._map is None:
+            self._file.flush()
+            self._map = np.memmap(self._file, dtype=np.uint8, mode="r")
+        offset, count = payload
+        size = self.dtype.itemsize * count
+        if kind == KEYFRAME:
+            return kind, (self._map[offset:offset + size].view(self.dtype),)
+        changed = self._map[offset:offset + 4 * count].view(np.int32)
+        return kind, (changed, self._map[offset + 4 * count:offset + 4 * count + size].view(self.dtype))
+
+    def __getitem__(self, index):
+        """
+        Values of the index-th recorded frame.
+        """
+        if index < 0:
+            index += len(self._frames)
+        if not 0 <= index < len(self._frames):
+            raise IndexError("Invalid frame index. Must be less than the number of frames.")
+        start = self._keyframes[bisect.bisect_right(self._keyframes, index) - 1]
+        frame = np.array(self._read(start)[1][0])
+        for i in range(start + 1, index + 1):
+            changed, values = self._read(i)[1]
+            frame[changed] = values
+        return frame
+
+    def __iter__(self):
+        # Sequential playback applies each delta once
+        frame = None
+        for i in range(len(self._frames)):
+            kind, arrays = self._read(i)
+            if kind == KEYFRAME:
+                frame = np.array(arrays[0])
+            else:
+                frame[arrays[0]] = arrays[1]
+            yield frame.copy()
+
+    def frame(self, step):
+        """
+        Values at a recorded step.
+
+        Raises
+        ------
+        KeyError
+            If the step was not recorded.
+        """
+        if step not in self._index:
+            raise KeyError(f"Invalid step. Step {step} was not recorded.")
+        return self[self._index[step]]
+
+
+class StateHistory:
+    """
+    The full node state (every array of node_state.ATTRIBUTES) at each
+    recorded step, for rewinding a game to any past step. Each array is
+    kept in its own FrameStore, so a past state is rebuilt from the
+    nearest checkpoint (keyframe) and at most keyframe_interval - 1
+    change logs (deltas) in the same time however long the game has
+    run.
+
+    Parameters
+    ----------
+    keyframe_interval, max_memory, spill_dir
+        As for FrameStore, with max_memory shared by the arrays.
+
+    Methods
+    -------
+    record(step, state)
+        Add the state of a step.
+    state_at(step)
+        The NodeState at a recorded step.
+    clear()
+        Drop every step.
+    close()
+        Drop every step and delete the spill files.
+    """
+
+    def __init__(self, keyframe_interval=32, max_memory=None, spill_dir=None):
+        self.keyframe_interval = keyframe_interval
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.stores = {}
+        self.num_nodes = None
+
+    @property
+    def steps(self):
+        return self.stores["alignment"].steps if self.stores else []
+
+    def __contains__(self, step):
+        return bool(self.stores) and step in self.stores["alignment"]
+
+    def __len__(self):
+        return len(self.stores["alignment"]) if self.stores else 0
+
+    @property
+    def nbytes(self):
+        return sum(store.nbytes for store in self.stores.values())
+
+    def record(self, step, state):
+        """
+        Add the state of a step.
+
+        Parameters
+        ----------
+        step : int
+            The step.
+        state : NodeState
+            The node state.
+        """
+        if not self.stores:
+            self.num_nodes = state.num_nodes
+            max_memory = None if self.max_memory is None else self.max_memory // len(ATTRIBUTES)
+            self.stores = {
+                field: FrameStore(
+                    self.keyframe_interval, max_memory, self.spill_dir, getattr(state, field).dtype
+                )
+                for field in ATTRIBUTES
+            }
+        elif state.num_nodes != self.num_nodes:
+            raise ValueError("Invalid state. Must have the nodes of the recorded steps.")
+        for field, store in self.stores.items():
+            store.record(step, getattr(state, field))
+
+    def state_at(self, step):
+        """
+        The node state at a recorded step.
+
+        Returns
+        -------
+        NodeState
+            A new NodeState, with its counters set.
+
+        Raises
+        ------
+        KeyError
+            If the step was not recorded.
+        """
+        if step not in self:
+            raise KeyError(f"Invalid step. Step {step} was not recorded.")
+        state = NodeState(self.num_nodes, dtype=self.stores["uncertainty"].dtype)
+        for field, store in self.stores.items():
+            getattr(state, field)[:] = store.frame(step)
+        state.recount()
+        return state
+
+    def clear(self):
+        for store in self.stores.values():
+            store.close()
+        self.stores = {}
+        self.num_nodes = None
+
+    def close(self):
+        self.clear()
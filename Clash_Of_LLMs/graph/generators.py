@@ -0,0 +1,314 @@
+import numpy as np
+
+from Clash_Of_LLMs.graph.csr import CSRGraph
+
+NETWORK_TYPES = (
+    "erdos_renyi",
+    "barabasi_albert",
+    "watts_strogatz",
+    "stochastic_block",
+    "configuration",
+)
+
+
+def _bernoulli_positions(total, p, rng):
+    """
+    Sorted positions of the successes among ``total`` independent
+    Bernoulli(p) trials, drawn in O(successes) time by summing geometric
+    gaps between successes (Batagelj and Brandes, 2005).
+    """
+    if p <= 0 or total <= 0:
+        return np.empty(0, dtype=np.int64)
+    if p >= 1:
+        return np.arange(total, dtype=np.int64)
+    chunks = []
+    last = -1
+    expected = total * p
+    batch = int(expected + 6 * np.sqrt(expected) + 16)
+    while last < total:
+        positions = last + np.cumsum(rng.geometric(p, batch))
+        chunks.append(positions)
+        last = int(positions[-1])
+    positions = np.concatenate(chunks)
+    return positions[positions < total]
+
+
+def _triangle_pairs(k):
+    """
+    Map indices into the pairs (u, v) with u < v, enumerated as (0, 1),
+    (0, 2), (1, 2), (0, 3), ..., back to their two nodes.
+    """
+    v = np.floor((1 + np.sqrt(1 + 8 * k.astype(np.float64))) / 2).astype(np.int64)
+    # Correct for rounding in the square root
+    v -= v * (v - 1) // 2 > k
+    v += (v + 1) * v // 2 <= k
+    return k - v * (v - 1) // 2, v
+
+
+def erdos_renyi(n, p, rng):
+    """
+    G(n, p) random graph in O(n + m) time, skipping geometrically
+    between the n(n - 1)/2 candidate edges.
+
+    Parameters
+    ----------
+    n : int
+        Number of nodes.
+    p : float
+        Probability of each edge.
+    rng : numpy.random.Generator
+        Random stream.
+
+    Returns
+    -------
+    CSRGraph
+        The graph.
+    """
+    u, v = _triangle_pairs(_bernoulli_positions(n * (n - 1) // 2, p, rng))
+    return CSRGraph.from_edges(n, u, v)
+
+
+def barabasi_albert(n, m, rng):
+    """
+    Preferential attachment graph in O(n m) time. As in networkx, the
+    graph starts from a star on m + 1 nodes and every later node attaches
+    m edges to existing nodes chosen with probability proportional to
+    their degree. Targets are drawn by copying a random endpoint of an
+    earlier edge (Batagelj and Brandes, 2005), resolved for all edges at
+    once by pointer jumping. Repeated targets are merged, so a few nodes
+    can attach with fewer than m edges.
+
+    Parameters
+    ----------
+    n : int
+        Number of nodes.
+    m : int
+        Number of edges attached by each new node.
+    rng : numpy.random.Generator
+        Random stream.
+
+    Returns
+    -------
+    CSRGraph
+        The graph.
+    """
+    if m < 1 or m >= n:
+        raise ValueError(f"Barabási–Albert network must have m >= 1 and m < n, m = {m}, n = {n}")
+    new_nodes = np.arange(m + 1, n, dtype=np.int64)
+    num_edges = m + len(new_nodes) * m
+    # Edge e has endpoint slots 2e (source) and 2e + 1 (target)
+    sources = np.concatenate([np.zeros(m, dtype=np.int64), np.repeat(new_nodes, m)])
+    targets = np.full(num_edges, -1, dtype=np.int64)
+    targets[:m] = np.arange(1, m + 1)
+
+    # Each new node copies a random slot of the edges before its own
+    first_edge = m + (sources[m:] - m - 1) * m
+    pointer = np.empty(num_edges, dtype=np.int64)
+    pointer[m:] = np.floor(rng.random(num_edges - m) * 2 * first_edge).astype(np.int64)
+
+    pending = np.arange(m, num_edges)
+    while len(pending):
+        slot = pointer[pending]
+        source_slot = slot % 2 == 0
+        targets[pending[source_slot]] = sources[slot[source_slot] // 2]
+        pending, edge = pending[~source_slot], slot[~source_slot] // 2
+        resolved = targets[edge] >= 0
+        targets[pending[resolved]] = targets[edge[resolved]]
+        pending, edge = pending[~resolved], edge[~resolved]
+        pointer[pending] = pointer[edge]
+    return CSRGraph.from_edges(n, sources, targets)
+
+
+def watts_strogatz(n, k, p, rng, max_tries=100):
+    """
+    Small-world graph in O(n k) time: a ring lattice where each node is
+    joined to its k // 2 nearest neighbours on either side, with every
+    edge rewired to a uniformly random node with probability p. Rewired
+    edges avoid self-loops and existing edges, as in networkx.
+
+    Parameters
+    ----------
+    n : int
+        Number of nodes.
+    k : int
+        Lattice degree.
+    p : float
+        Rewiring probability.
+    rng : numpy.random.Generator
+        Random stream.
+    max_tries : int, optional
+        Redraws for a rewired edge before it is left in place. The
+        default is 100.
+
+    Returns
+    -------
+    CSRGraph
+        The graph.
+    """
+    if k > n:
+        raise ValueError("k>n, choose smaller k or larger n")
+    if k == n:
+        u, v = _triangle_pairs(np.arange(n * (n - 1) // 2, dtype=np.int64))
+        return CSRGraph.from_edges(n, u, v)
+    nodes = np.arange(n, dtype=np.int64)
+    sources = np.tile(nodes, k // 2)
+    targets = (sources + np.repeat(np.arange(1, k // 2 + 1), n)) % n
+
+    rewire = rng.random(len(sources)) < p
+    kept = np.minimum(sources, targets) * n + np.maximum(sources, targets)
+    taken = np.sort(kept[~rewire])
+    pending = np.flatnonzero(rewire)
+    for _ in range(max_tries):
+        if not len(pending):
+            break
+        candidates = rng.integers(0, n, len(pending))
+        keys = np.minimum(sources[pending], candidates) * n + np.maximum(sources[pending], candidates)
+        position = np.minimum(np.searchsorted(taken, keys), len(taken) - 1)
+        ok = (candidates != sources[pending]) & (taken[position] != keys if len(taken) else True)
+        # Two rewired edges may not pick the same new edge
+        _, first = np.unique(keys, return_index=True)
+        unique = np.zeros(len(keys), dtype=bool)
+        unique[first] = True
+        ok &= unique
+        targets[pending[ok]] = candidates[ok]
+        taken = np.sort(np.concatenate([taken, keys[ok]]))
+        pending = pending[~ok]
+    return CSRGraph.from_edges(n, sources, targets)
+
+
+def stochastic_block(sizes, probabilities, rng):
+    """
+    Stochastic block model in O(n + m) time: nodes are split into blocks
+    and each pair of nodes in blocks i and j is joined with probability
+    probabilities[i][j], using geometric skipping within each block pair.
+
+    Parameters
+    ----------
+    sizes : list
+        Number of nodes in each block.
+    probabilities : list
+        Symmetric matrix of edge probabilities between blocks.
+    rng : numpy.random.Generator
+        Random stream.
+
+    Returns
+    -------
+    CSRGraph
+        The graph, with nodes numbered block by block.
+    """
+    sizes = [int(size) for size in sizes]
+    probabilities = np.asarray(probabilities, dtype=float)
+    if probabilities.shape != (len(sizes), len(sizes)):
+        raise ValueError("Block probabilities must be a square matrix with one row per block.")
+    if not np.allclose(probabilities, probabilities.T):
+        raise ValueError("Block probabilities must be symmetric.")
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    sources, targets = [], []
+    for i, size_i in enumerate(sizes):
+        u, v = _triangle_pairs(_bernoulli_positions(size_i * (size_i - 1) // 2, probabilities[i, i], rng))
+        sources.append(u + offsets[i])
+        targets.append(v + offsets[i])
+        for j in range(i + 1, len(sizes)):
+            k = _bernoulli_positions(size_i * sizes[j], probabilities[i, j], rng)
+            u, v = np.divmod(k, sizes[j])
+            sources.append(u + offsets[i])
+            targets.append(v + offsets[j])
+    return CSRGraph.from_edges(int(offsets[-1]), np.concatenate(sources), np.concatenate(targets))
+
+
+def configuration(degrees, rng):
+    """
+    Erased configuration model in O(n + m) time: stubs are shuffled and
+    paired, then self-loops and repeated edges are dropped, so high
+    degree nodes can end up slightly below their target degree.
+
+    Parameters
+    ----------
+    degrees : list
+        Target degree of each node. The sum must be even.
+    rng : numpy.random.Generator
+        Random stream.
+
+    Returns
+    -------
+    CSRGraph
+        The graph.
+    """
+    degrees = np.asarray(degrees, dtype=np.int64)
+    if np.any(degrees < 0) or degrees.sum() % 2:
+        raise ValueError("Invalid degree sequence. Degrees must be non-negative with an even sum.")
+    stubs = np.repeat(np.arange(len(degrees)), degrees)
+    rng.shuffle(stubs)
+    sources, targets = stubs[0::2], stubs[1::2]
+    loop = sources == targets
+    return CSRGraph.from_edges(len(degrees), sources[~loop], targets[~loop])
+
+
+def generate(
+    network_type,
+    n,
+    seed=None,
+    er_probability=0.05,
+    ba_connections=2,
+    ws_neighbours=4,
+    ws_rewire_probability=0.1,
+    block_sizes=None,
+    block_probabilities=None,
+    degrees=None
+):
+    """
+    Generate a network of a given type straight into CSR arrays. Takes
+    the same parameters as Simulator.create_network_custom.
+
+    Parameters
+    ----------
+    network_type : str
+        One of NETWORK_TYPES.
+    n : int
+        Number of nodes (the block sizes or degree sequence set it for
+        "stochastic_block" and "configuration").
+    seed : int, numpy.random.SeedSequence or numpy.random.Generator, optional
+        Seed for the graph.
+    er_probability : float, optional
+        Probability of erdos renyi graph edge creation.
+    ba_connections : int, optional
+        Number of barabasi albert initial node connections.
+    ws_neighbours : int, optional
+        Number of watts strogatz graph neigbour edges.
+    ws_rewire_probability : float, optional
+        Probability of watts strogatz graph edge rewiring.
+    block_sizes, block_probabilities : list, optional
+        Stochastic block model blocks (see stochastic_block). The default
+        is two equal blocks, with er_probability within blocks and a
+        tenth of it between them.
+    degrees : list, optional
+        Configuration model degree sequence. The default is a Poisson
+        sequence with the mean degree of a G(n, er_probability) graph.
+
+    Returns
+    -------
+    CSRGraph
+        The graph.
+    """
+    rng = np.random.default_rng(seed)
+    if network_type == "erdos_renyi":
+        return erdos_renyi(n, er_probability, rng)
+    if network_type == "barabasi_albert":
+        return barabasi_albert(n, ba_connections, rng)
+    if network_type == "watts_strogatz":
+        return watts_strogatz(n, ws_neighbours, ws_rewire_probability, rng)
+    if network_type == "stochastic_block":
+        if block_sizes is None:
+            block_sizes = [n // 2, n - n // 2]
+        if block_probabilities is None:
+            block_probabilities = [
+                [er_probability, er_probability / 10],
+                [er_probability / 10, er_probability],
+            ]
+        return stochastic_block(block_sizes, block_probabilities, rng)
+    if network_type == "configuration":
+        if degrees is None:
+            degrees = rng.poisson(er_probability * (n - 1), n)
+            degrees[0] += degrees.sum() % 2
+        return configuration(degrees, rng)
+    raise ValueError(f"Invalid network type. Must be one of {', '.join(NETWORK_TYPES)}.")
@@ -0,0 +1,368 @@
+"""
+Bulk reading and writing of networks.
+
+Text formats are read a chunk of lines at a time into NumPy arrays and
+turned into a CSRGraph in one step (CSRGraph.from_edges sorts and
+merges duplicate edges), instead of one add_edge per edge:
+
+- edge lists: one "source target" pair per line, e.g. crawl dumps.
+- adjacency CSVs: the GameGraph format (see plot.py), one
+  "name,colour,"target,target,..."" row per node.
+
+Networks are saved in binary as a CSR .npz (indptr, indices and, unless
+the nodes are 0 to n - 1, labels), written uncompressed so load_csr can
+memory-map the arrays instead of reading them: a network of 10M edges
+then loads in milliseconds, and its pages are only read when used.
+"""
+import csv
+import io
+import warnings
+import zipfile
+
+import numpy as np
+
+from Clash_Of_LLMs.graph.csr import CSRGraph
+
+# Bytes of text parsed at a time
+CHUNK_SIZE = 1 << 24
+# Rows (nodes or edges) written at a time
+WRITE_ROWS = 1 << 16
+
+
+def _labelled_rows(labels, first_seen=False):
+    """
+    Row of each label, from one np.unique over all of them.
+
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        Node labels (ints or strings), with repeats.
+    first_seen : bool, optional
+        Number the rows in the order labels first appear, rather than in
+        sorted order. The default is False.
+
+    Returns
+    -------
+    unique : numpy.ndarray
+        The label of each row.
+    rows : numpy.ndarray
+        The row of each of labels.
+    """
+    if not first_seen:
+        unique, rows = np.unique(labels, return_inverse=True)
+        return unique, rows
+    unique, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return unique[order], rank[inverse]
+
+
+def _labels(unique):
+    """
+    CSRGraph labels of the rows: None when they are 0 to n - 1.
+    """
+    if unique.dtype.kind in "iu" and (len(unique) == 0 or (unique[0] == 0 and unique[-1] == len(unique) - 1)):
+        return None
+    return unique.tolist()
+
+
+def read_edge_list(path, delimiter=None, comments="#", chunk_size=CHUNK_SIZE):
+    """
+    Read an undirected edge list. Columns after the first two (e.g.
+    weights) are ignored, and duplicate edges are merged.
+
+    Parameters
+    ----------
+    path : str or file
+        Text file with one "source target" pair per line.
+    delimiter : str, optional
+        Column separator. The default is any whitespace.
+    comments : str, optional
+        Start of comment lines. The default is "#".
+    chunk_size : int, optional
+        Bytes of text parsed at a time.
+
+    Returns
+    -------
+    CSRGraph
+        The network. Integer node ids are kept as labels (sorted), or
+        as row numbers when they are 0 to n - 1; any other ids are
+        string labels.
+
+    Raises
+    ------
+    ValueError
+        If a line does not have two columns.
+    """
+    chunks = []
+    numeric = True
+    file = open(path) if isinstance(path, str) else path
+    try:
+        while True:
+            lines = file.readlines(chunk_size)
+            if not lines:
+                break
+            if numeric:
+                try:
+                    chunks.append(_parse_pairs(lines, delimiter, comments, np.int64))
+                    continue
+                except ValueError:
+                    # Not integer ids: parse every chunk as strings
+                    numeric = False
+                    chunks = [chunk.astype(str) for chunk in chunks]
+            chunks.append(_parse_pairs(lines, delimiter, comments, str))
+    finally:
+        file.close() if isinstance(path, str) else None
+
+    pairs = np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype=np.int64)
+    unique, rows = _labelled_rows(pairs.ravel())
+    rows = rows.reshape(-1, 2)
+    csr = CSRGraph.from_edges(len(unique), rows[:, 0], rows[:, 1])
+    return CSRGraph(csr.indptr, csr.indices, _labels(unique))
+
+
+def _parse_pairs(lines, delimiter, comments, dtype):
+    with warnings.catch_warnings():
+        # Chunks of only comments are empty
+        warnings.simplefilter("ignore", UserWarning)
+        pairs = np.loadtxt(lines, dtype=dtype, delimiter=delimiter, comments=comments, usecols=(0, 1), ndmin=2)
+    return pairs
+
+
+def write_edge_list(csr, path, delimiter=" "):
+    """
+    Write every undirected edge once, as "source target" lines.
+
+    Parameters
+    ----------
+    csr : CSRGraph
+        The network.
+    path : str or file
+        Text file to write.
+    delimiter : str, optional
+        Column separator. The default is a space.
+    """
+    sources, targets = csr.edges()
+    labels = None if csr._index is None else np.array(csr.labels, dtype=object)
+    file = open(path, "w") if isinstance(path, str) else path
+    try:
+        for start in range(0, len(sources), WRITE_ROWS):
+            u = sources[start:start + WRITE_ROWS]
+            v = targets[start:start + WRITE_ROWS]
+            if labels is not None:
+                u, v = labels[u], labels[v]
+            file.write("".join(f"{a}{delimiter}{b}\n" for a, b in zip(u.tolist(), v.tolist())))
+    finally:
+        file.close() if isinstance(path, str) else None
+
+
+def read_adjacency_csv(path, chunk_rows=WRITE_ROWS):
+    """
+    Read a network in the GameGraph CSV format: one row per node, with
+    its name, its colour and a comma separated list of the nodes it
+    connects to. Names and connections are read as the same kind of
+    label: integers if every name is an integer, else strings, so "1"
+    and 1 are one node. Nodes are numbered in the order they first
+    appear, and duplicate edges are merged.
+
+    Parameters
+    ----------
+    path : str or file
+        CSV file.
+    chunk_rows : int, optional
+        Rows parsed at a time.
+
+    Returns
+    -------
+    csr : CSRGraph
+        The network.
+    colours : list
+        Colour of each node (of the last row naming it), or None for
+        nodes that are only connected to.
+
+    Raises
+    ------
+    ValueError
+        If a row does not have three columns, or the names are integers
+        and a connection is not.
+    """
+    colours = []
+    chunks = {"names": [], "targets": [], "counts": []}
+    chunk = {"names": [], "targets": [], "counts": []}
+
+    def flush():
+        for key, values in chunk.items():
+            chunks[key].append(np.array(values, dtype=np.int64 if key == "counts" else str))
+            values.clear()
+
+    file = open(path, newline="") if isinstance(path, str) else path
+    try:
+        for number, row in enumerate(csv.reader(file), start=1):
+            if not row:
+                continue
+            if len(row) != 3:
+                raise ValueError(f"Invalid CSV row {number}. Must have a name, a colour and connections.")
+            chunk["names"].append(row[0])
+            colours.append(row[1])
+            connections = [name.strip() for name in row[2].split(",")]
+            connections = [name for name in connections if name]
+            chunk["targets"].extend(connections)
+            chunk["counts"].append(len(connections))
+            if len(chunk["names"]) == chunk_rows:
+                flush()
+        flush()
+    finally:
+        file.close() if isinstance(path, str) else None
+
+    names, targets, counts = (np.concatenate(chunks[key]) for key in ["names", "targets", "counts"])
+    try:
+        names = names.astype(np.int64)
+    except ValueError:
+        pass
+    else:
+        try:
+            targets = targets.astype(np.int64)
+        except ValueError:
+            raise ValueError("Invalid connection. Must be a node name (an integer, as every name is).") from None
+
+    unique, rows = _labelled_rows(np.concatenate([names, targets]), first_seen=True)
+    name_rows, target_rows = rows[:len(names)], rows[len(names):]
+    source_rows = np.repeat(name_rows, counts)
+    csr = CSRGraph.from_edges(len(unique), source_rows, target_rows)
+    node_colours = [None] * len(unique)
+    for row, colour in zip(name_rows.tolist(), colours):
+        node_colours[row] = colour
+    return CSRGraph(csr.indptr, csr.indices, unique.tolist()), node_colours
+
+
+def write_adjacency_csv(csr, colours, path):
+    """
+    Write a network in the GameGraph CSV format. Each edge is listed
+    once, on the row of the endpoint that comes first, as GameGraph
+    always has.
+
+    Parameters
+    ----------
+    csr : CSRGraph
+        The network.
+    colours : list
+        Colour of each node.
+    path : str or file
+        CSV file to write.
+    """
+    sources, targets = csr.edges()
+    labels = csr.labels
+    # Edges are grouped by source row, in row order
+    bounds = np.searchsorted(sources, np.arange(csr.num_nodes + 1)).tolist()
+    targets = [str(labels[v]) for v in targets.tolist()] if csr._index is not None else targets.astype(str).tolist()
+    file = open(path, "w", newline="") if isinstance(path, str) else path
+    try:
+        writer = csv.writer(file)
+        for start in range(0, csr.num_nodes, WRITE_ROWS):
+            rows = range(start, min(start + WRITE_ROWS, csr.num_nodes))
+            writer.writerows(
+                [labels[u], colours[u], "".join(f"{v}," for v in targets[bounds[u]:bounds[u + 1]])] for u in rows
+            )
+    finally:
+        file.close() if isinstance(path, str) else None
+
+
+def save_csr(csr, path):
+    """
+    Save a network as an uncompressed CSR .npz, which load_csr can
+    memory-map.
+
+    Parameters
+    ----------
+    csr : CSRGraph
+        The network.
+    path : str or file
+        File to write (".npz" is appended to a path without it).
+
+    Raises
+    ------
+    ValueError
+        If the node labels are not all integers or all strings.
+    """
+    arrays = {"indptr": csr.indptr, "indices": csr.indices}
+    if csr._index is not None:
+        arrays["labels"] = np.array(csr.labels)
+        if arrays["labels"].ndim != 1 or arrays["labels"].dtype.kind not in "iuU" or len(
+            {type(label) for label in csr.labels}
+        ) > 1:
+            raise ValueError("Invalid node labels. Must be all integers or all strings.")
+    np.savez(path, **arrays)
+
+
+def load_npz(path, mmap_mode=None):
+    """
+    The arrays of an .npz file. np.load ignores mmap_mode for .npz
+    files, so arrays stored uncompressed (as by np.savez) are mapped here
+    straight from their offsets in the file.
+
+    Parameters
+    ----------
+    path : str
+        The file.
+    mmap_mode : str, optional
+        As for np.load, e.g. "r". None reads the arrays into memory. The
+        default is None.
+
+    Returns
+    -------
+    dict
+        Array name -> array.
+    """
+    if mmap_mode is None:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "r+b" if mmap_mode == "r+" else "rb") as file:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                # Compressed arrays cannot be mapped
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(io.BytesIO(member.read()), allow_pickle=False)
+                continue
+            # The local file header is 30 bytes, then the name and extra
+            # field, then the .npy data
+            file.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(file.read(4), dtype="<u2")
+            file.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            if np.lib.format.read_magic(file) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+            if dtype.hasobject:
+                raise ValueError(f"Invalid array {name}. Must not hold Python objects.")
+            arrays[name] = np.memmap(
+                file, dtype=dtype, mode=mmap_mode, offset=file.tell(), shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return arrays
+
+
+def load_csr(path, mmap_mode=None):
+    """
+    Load a network saved by save_csr.
+
+    Parameters
+    ----------
+    path : str
+        The .npz file.
+    mmap_mode : str, optional
+        "r" maps the CSR arrays from the file instead of reading them,
+        so even very large networks load at once. The default is None,
+        which reads them.
+
+    Returns
+    -------
+    CSRGraph
+        The network.
+    """
+    arrays = load_npz(path, mmap_mode)
+    labels = arrays.get("labels")
+    return CSRGraph(arrays["indptr"], arrays["indices"], None if labels is None else labels.tolist())
@@ -0,0 +1,153 @@
+import numpy as np
+
+from Clash_Of_LLMs.graph.node_state import BLUE, NEUTRAL, RED
+
+# Scale of peer influence, matching `c` in Simulator.influence
+INFLUENCE_SCALE = 1000
+
+
+def switch(alignment):
+    """
+    Vectorised Simulator.switch: Blue becomes Red, anything else Blue.
+    """
+    return np.where(alignment == BLUE, RED, BLUE).astype(np.int8)
+
+
+def message_influence_kernel(alignment, uncertainty, team, potency):
+    """
+    Apply the Simulator.message_influence rules to many nodes at once.
+    Every branch of the scalar rule is evaluated on whole arrays and the
+    result for each node is picked with np.select.
+
+    Parameters
+    ----------
+    alignment : numpy.ndarray
+        Alignment codes of the receiving nodes.
+    uncertainty : numpy.ndarray
+        Uncertainties of the receiving nodes.
+    team : int or numpy.ndarray
+        Alignment code of the message team (RED or BLUE).
+    potency : float or numpy.ndarray
+        Potency of the message.
+
+    Returns
+    -------
+    new_alignment : numpy.ndarray
+        Alignment codes after the message.
+    new_uncertainty : numpy.ndarray
+        Uncertainties after the message.
+    alienate : numpy.ndarray
+        Boolean mask of nodes the message alienates.
+    """
+    A = np.asarray(alignment)
+    U = np.asarray(uncertainty, dtype=float)
+    T = np.asarray(team)
+    Q = np.asarray(potency, dtype=float)
+    A, U, T, Q = np.broadcast_arrays(A, U, T, Q)
+
+    opposed = A != T
+    red_message = opposed & (T == RED)
+    neutral = opposed & ~red_message & (A == NEUTRAL)
+    contested = opposed & ~red_message & ~neutral
+    certain = U >= 0
+    moderate = ~certain & (-0.5 < U)
+    entrenched = ~certain & ~moderate
+
+    # -U, the divisor of the rules for unsure (negative U) nodes. np.select
+    # evaluates every rule for every node, so it is 1 for the others
+    # rather than 0 or a tiny U. A tiny negative U still overflows to
+    # inf, as in the scalar rule
+    divisor = np.where(certain, 1.0, -U)
+
+    with np.errstate(divide="ignore", over="ignore", invalid="ignore"):
+        # Opposing nodes flip when a potent message meets an unsure node
+        flip = contested & certain & ((Q >= 0.5) | ((U + Q) > 1.0))
+        flipped_uncertainty = np.where(
+            Q >= 0.5, (9 - Q * 10 - (U * 2)) / 10, 2.0 - (U + Q)
+        )
+        new_uncertainty = np.select(
+            [
+                red_message,
+                neutral,
+                flip,
+                contested & certain,
+                contested & moderate,
+                contested & entrenched,
+                certain & (Q >= 0.5),
+                certain,
+                moderate,
+            ],
+            [
+                U,
+                0.5,
+                flipped_uncertainty,
+                U,
+                U + (Q / 2),
+                U + (10 * Q) / (100 * divisor),
+                (5 - (Q * 10) + (U * 5)) / 10,
+                U - (2 * Q / 5),
+                U - (Q / 3),
+            ],
+            default=U - np.maximum((10 * Q) / (30 * divisor) - 0.34, 0),
+        )
+
+    new_alignment = np.select([neutral, flip], [T, switch(A)], default=A).astype(np.int8)
+    alienate = red_message & (U * Q * 10 <= -1)
+    return new_alignment, new_uncertainty, alienate
+
+
+def influence_kernel(sup_alignment, sup_uncertainty, inf_alignment, inf_uncertainty):
+    """
+    Apply the Simulator.influence rules to many (superior, inferior)
+    pairs at once. The rate at which the inferior node's uncertainty
+    moves depends only on the two uncertainties, so it is computed once
+    and applied towards the superior node for matching alignments and
+    away from it for opposing alignments.
+
+    Parameters
+    ----------
+    sup_alignment, sup_uncertainty : numpy.ndarray
+        Alignment codes and uncertainties of the superior nodes.
+    inf_alignment, inf_uncertainty : numpy.ndarray
+        Alignment codes and uncertainties of the inferior nodes.
+
+    Returns
+    -------
+    new_alignment : numpy.ndarray
+        Alignment codes of the inferior nodes after influence.
+    new_uncertainty : numpy.ndarray
+        Uncertainties of the inferior nodes after influence.
+    """
+    A1 = np.asarray(sup_alignment)
+    U1 = np.asarray(sup_uncertainty, dtype=float)
+    A2 = np.asarray(inf_alignment)
+    U2 = np.asarray(inf_uncertainty, dtype=float)
+    A1, U1, A2, U2 = np.broadcast_arrays(A1, U1, A2, U2)
+    c = INFLUENCE_SCALE
+
+    # Fraction of the uncertainty difference that is transferred
+    rate = np.select(
+        [
+            (U2 >= 0) & (U1 >= 0),
+            (U2 >= 0) & (U1 > -0.5),
+            U2 >= 0,
+            (U2 > -0.5) & (U1 > -0.5),
+            U2 > -0.5,
+        ],
+        [c / 5, c / 4, c / 3, c / 10, c / 5],
+        default=c / 10,
+    )
+    shift = (U2 - U1) / rate
+
+    same = A1 == A2
+    neutral = ~same & (A2 == NEUTRAL)
+    opposed = ~same & ~neutral
+    flip = opposed & (U2 >= 0) & (U2 + shift > 1)
+
+    new_uncertainty = np.select(
+        [same, neutral, flip],
+        [U2 - shift, 0.5, 2 - (U2 + shift)],
+        default=U2 + shift,
+    )
+    new_alignment = np.select([neutral, flip], [A1, switch(A2)], default=A2).astype(np.int8)
+    return new_alignment, new_uncertainty
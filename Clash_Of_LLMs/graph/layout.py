@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Bump when the layout algorithm changes, so cached layouts are redone
+LAYOUT_VERSION = 1
+# Largest graph laid out with exact all-pairs repulsion
+EXACT_MAX_NODES = 500
+
+
+def default_cache_dir():
+    """
+    Layout cache directory: $CLASH_LAYOUT_CACHE, or
+    ~/.cache/clash_of_llms/layouts.
+    """
+    return os.environ.get(
+        "CLASH_LAYOUT_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "clash_of_llms", "layouts"),
+    )
+
+
+def layout_key(csr, network_type, params, seed):
+    """
+    Content address of a layout: a hash of the network description
+    (type, parameters and seed) and of the CSR arrays themselves, so a
+    changed generator never serves a stale layout.
+
+    Returns
+    -------
+    str
+        Hex digest.
+    """
+    description = json.dumps(
+        {
+            "version": LAYOUT_VERSION,
+            "network_type": network_type,
+            "params": params,
+            "seed": seed,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha256(description.encode())
+    digest.update(np.ascontiguousarray(csr.indptr, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(csr.indices, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    """
+    On-disk cache of node positions, one .npy file per layout key.
+
+    Attributes
+    ----------
+    directory : str
+        Cache directory, created on first write.
+    hits, misses : int
+        Lookup counters.
+
+    Methods
+    -------
+    get(key)
+        Cached positions for a key, or None.
+    put(key, positions)
+        Store positions for a key.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = default_cache_dir() if directory is None else directory
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key):
+        try:
+            positions = np.load(self.path(key), allow_pickle=False)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return positions
+
+    def put(self, key, positions):
+        """
+        Store positions, writing atomically so concurrent readers never
+        see a partial file. Failures to write are ignored, as the cache
+        is only an optimisation.
+        """
+        filename = self.path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{filename}.{os.getpid()}.tmp", "wb") as f:
+                np.save(f, positions)
+            os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+        except OSError:
+            pass
+
+
+def _repulsion_exact(positions, k):
+    """
+    Fruchterman-Reingold repulsion k^2 / d between every pair of nodes.
+    """
+    dx = positions[:, 0, None] - positions[None, :, 0]
+    dy = positions[:, 1, None] - positions[None, :, 1]
+    weight = dx * dx + dy * dy
+    np.fill_diagonal(weight, np.inf)
+    np.maximum(weight, 1e-12, out=weight)
+    np.divide(k * k, weight, out=weight)
+    return np.column_stack([(dx * weight).sum(axis=1), (dy * weight).sum(axis=1)])
+
+
+class _MeshRepulsion:
+    """
+    Particle-mesh approximation of the all-pairs repulsion: node counts
+    are binned on a grid, convolved with the repulsion kernel by FFT, and
+    each node takes the force at its cell. Costs O(n + G^2 log G) per
+    iteration instead of O(n^2).
+    """
+
+    def __init__(self, grid_size, k):
+        self.grid_size = G = grid_size
+        h = 1.0 / G
+        offsets = np.fft.fftfreq(2 * G, 1.0 / (2 * G)) * h  # Cell offsets, wrapped
+        dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+        distance2 = dx * dx + dy * dy
+        distance2[0, 0] = np.inf  # No force within a cell
+        self.kernel_x = np.fft.rfft2(k * k * dx / distance2)
+        self.kernel_y = np.fft.rfft2(k * k * dy / distance2)
+
+    def __call__(self, positions):
+        G = self.grid_size
+        cells = np.minimum((positions * G).astype(np.int64), G - 1)
+        flat = cells[:, 0] * G + cells[:, 1]
+        density = np.zeros((2 * G, 2 * G))
+        density[:G, :G] = np.bincount(flat, minlength=G * G).reshape(G, G)
+        density = np.fft.rfft2(density)
+        shape = (2 * G, 2 * G)
+        force_x = np.fft.irfft2(density * self.kernel_x, shape)[:G, :G].ravel()
+        force_y = np.fft.irfft2(density * self.kernel_y, shape)[:G, :G].ravel()
+        return np.column_stack([force_x[flat], force_y[flat]])
+
+
+def force_layout(csr, iterations=50, seed=None, method="auto", grid_size=None):
+    """
+    Fruchterman-Reingold force layout on the CSR arrays. Edges pull their
+    endpoints together with force d^2 / k and all nodes push each other
+    apart with force k^2 / d, with k = 1 / sqrt(n) in a unit square.
+    Repulsion is exact for small graphs, and approximated on a grid by
+    FFT (particle-mesh) for large ones, so a step costs O(n + m).
+
+    Parameters
+    ----------
+    csr : CSRGraph
+        The network.
+    iterations : int, optional
+        Number of cooling steps. The default is 50.
+    seed : int, optional
+        Seed for the starting positions.
+    method : str, optional
+        "exact", "mesh" or "auto" (exact up to EXACT_MAX_NODES nodes).
+        The default is "auto".
+    grid_size : int, optional
+        Mesh cells per side. The default is about sqrt(n), at most 256.
+
+    Returns
+    -------
+    numpy.ndarray
+        (n, 2) positions, centred and scaled into [-1, 1].
+    """
+    if method not in ["auto", "exact", "mesh"]:
+        raise ValueError("Invalid layout method. Must be 'auto', 'exact' or 'mesh'.")
+    n = csr.num_nodes
+    rng = np.random.default_rng(seed)
+    positions = rng.random((n, 2))
+    if n <= 1:
+        return np.zeros((n, 2))
+
+    k = 1.0 / np.sqrt(n)
+    if method == "exact" or (method == "auto" and n <= EXACT_MAX_NODES):
+        repulsion = lambda positions: _repulsion_exact(positions, k)
+    else:
+        grid_size = grid_size or int(np.clip(np.sqrt(n), 8, 256))
+        repulsion = _MeshRepulsion(grid_size, k)
+
+    sources, targets = csr.edges()
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        displacement = repulsion(positions)
+        delta = positions[targets] - positions[sources]
+        pull = delta * (np.linalg.norm(delta, axis=1) / k)[:, None]
+        for axis in range(2):
+            displacement[:, axis] += np.bincount(sources, pull[:, axis], minlength=n)
+            displacement[:, axis] -= np.bincount(targets, pull[:, axis], minlength=n)
+
+        # Move each node at most the current temperature
+        length = np.maximum(np.linalg.norm(displacement, axis=1), 1e-12)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        np.clip(positions, 0.0, 1.0 - 1e-9, out=positions)
+        temperature -= cooling
+
+    positions -= positions.mean(axis=0)
+    scale = np.abs(positions).max()
+    return positions / scale if scale > 0 else positions
+
+
+def cached_layout(csr, network_type, params, seed, cache=None, **kwargs):
+    """
+    Layout of a network, read from the cache when the same network has
+    been laid out before.
+
+    Parameters
+    ----------
+    csr : CSRGraph
+        The network.
+    network_type, params, seed
+        Description of the network (see layout_key). Layouts of unseeded
+        networks are not cached.
+    cache : LayoutCache, optional
+        The cache. The default is a LayoutCache in default_cache_dir().
+    **kwargs
+        Passed on to force_layout.
+
+    Returns
+    -------
+    numpy.ndarray
+        (n, 2) positions.
+    """
+    cache = LayoutCache() if cache is None else cache
+    key = None if seed is None else layout_key(csr, network_type, {**params, **kwargs}, seed)
+    positions = None if key is None else cache.get(key)
+    if positions is None or positions.shape != (csr.num_nodes, 2):
+        positions = force_layout(csr, seed=seed, **kwargs)
+        if key is not None:
+            cache.put(key, positions)
+    return positions
@@ -0,0 +1,337 @@
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+
+# Alignment codes stored in NodeState.alignment
+NEUTRAL = 0
+RED = 1
+BLUE = 2
+ALIGNMENTS = ("Neutral", "Red", "Blue")
+ALIGNMENT_CODES = {name: code for code, name in enumerate(ALIGNMENTS)}
+
+ATTRIBUTES = ("alignment", "susceptibility", "uncertainty", "alienated")
+
+
+class NodeState:
+    """
+    Struct-of-arrays store for the per-node simulation state. Replaces
+    the networkx attribute dicts with one compact array per attribute,
+    indexed by node row (see CSRGraph).
+
+    Attributes
+    ----------
+    num_nodes : int
+        Number of nodes in the store.
+    alignment : numpy.ndarray
+        int8 alignment code for each node (see ALIGNMENTS).
+    uncertainty : numpy.ndarray
+        Uncertainty of each node.
+    susceptibility : numpy.ndarray
+        Susceptibility of each node.
+    alienated : numpy.ndarray
+        Bit-packed alienated flags, eight nodes per byte.
+    dirty : numpy.ndarray
+        Boolean mask of nodes whose alignment or uncertainty changed
+        since the last green influence sweep.
+    counts : numpy.ndarray
+        Live number of nodes with each alignment code.
+    num_alienated : int
+        Live number of alienated nodes.
+    generation : int
+        Incremented by every method that changes the state (including
+        moved, which code writing the arrays directly calls), so readers
+        can tell cheaply whether it has changed.
+
+    Methods
+    -------
+    get_alignment(node) / set_alignment(node, value)
+        Read or write the alignment of a node by name.
+    get_uncertainty(node) / set_uncertainty(node, value)
+        Read or write the uncertainty of a node.
+    get_susceptibility(node) / set_susceptibility(node, value)
+        Read or write the susceptibility of a node.
+    is_alienated(node) / set_alienated(node, value)
+        Read or write the alienated flag of a node.
+    alienated_mask()
+        Unpack the alienated flags into a boolean array.
+    count(alignment) / count_alienated()
+        Read the live population counters.
+    recount()
+        Reset the live counters from a full scan.
+    moved(old, new)
+        Update the counters for alignment changes made directly to the
+        alignment array.
+    attach(G, labels)
+        Serve ``G.nodes[n]`` from this store.
+    """
+
+    __slots__ = (
+        "num_nodes",
+        "alignment",
+        "uncertainty",
+        "susceptibility",
+        "alienated",
+        "dirty",
+        "counts",
+        "num_alienated",
+        "generation",
+        "extra",
+    )
+
+    def __init__(self, num_nodes, dtype=np.float64):
+        self.num_nodes = num_nodes
+        self.alignment = np.full(num_nodes, NEUTRAL, dtype=np.int8)
+        self.uncertainty = np.zeros(num_nodes, dtype=dtype)
+        self.susceptibility = np.zeros(num_nodes, dtype=dtype)
+        self.alienated = np.zeros((num_nodes + 7) // 8, dtype=np.uint8)
+        self.dirty = np.ones(num_nodes, dtype=bool)
+        self.counts = np.array([num_nodes, 0, 0], dtype=np.int64)
+        self.num_alienated = 0
+        self.generation = 0
+        # Attributes set through the networkx view that have no array
+        self.extra = {}
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the state arrays.
+        """
+        return (
+            self.alignment.nbytes
+            + self.uncertainty.nbytes
+            + self.susceptibility.nbytes
+            + self.alienated.nbytes
+        )
+
+    def get_alignment(self, node):
+        return ALIGNMENTS[self.alignment[node]]
+
+    def set_alignment(self, node, value):
+        old = self.alignment[node]
+        self.alignment[node] = ALIGNMENT_CODES[value]
+        self.counts[old] -= 1
+        self.counts[self.alignment[node]] += 1
+        self.dirty[node] = True
+        self.generation += 1
+
+    def get_uncertainty(self, node):
+        return float(self.uncertainty[node])
+
+    def set_uncertainty(self, node, value):
+        self.uncertainty[node] = value
+        self.dirty[node] = True
+        self.generation += 1
+
+    def get_susceptibility(self, node):
+        return float(self.susceptibility[node])
+
+    def set_susceptibility(self, node, value):
+        self.susceptibility[node] = value
+        self.generation += 1
+
+    def is_alienated(self, node):
+        return bool(self.alienated[node >> 3] & (1 << (node & 7)))
+
+    def set_alienated(self, node, value=True):
+        if bool(value) == self.is_alienated(node):
+            return
+        if value:
+            self.alienated[node >> 3] |= 1 << (node & 7)
+            self.num_alienated += 1
+        else:
+            self.alienated[node >> 3] &= ~(1 << (node & 7)) & 0xFF
+            self.num_alienated -= 1
+        self.generation += 1
+
+    def set_alienated_many(self, nodes):
+        """
+        Set the alienated flag of every node in an array of rows.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        bits = (1 << (nodes & 7)).astype(np.uint8)
+        self.num_alienated += int(np.count_nonzero(self.alienated[nodes >> 3] & bits == 0))
+        np.bitwise_or.at(self.alienated, nodes >> 3, bits)
+        self.generation += 1
+
+    def alienated_mask(self):
+        return np.unpackbits(
+            self.alienated, count=self.num_nodes, bitorder="little"
+        ).astype(bool)
+
+    def set_alienated_mask(self, mask):
+        self.alienated = np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+        self.num_alienated = int(np.count_nonzero(mask))
+        self.generation += 1
+
+    def count(self, alignment):
+        """
+        Number of nodes with a given alignment ('Red', 'Blue' or
+        'Neutral'), read from the live counters.
+        """
+        return int(self.counts[ALIGNMENT_CODES[alignment]])
+
+    def count_alienated(self):
+        return self.num_alienated
+
+    def scan_counts(self):
+        """
+        Count alignments and alienated nodes with a full scan.
+
+        Returns
+        -------
+        counts : numpy.ndarray
+            Number of nodes with each alignment code.
+        alienated : int
+            Number of alienated nodes.
+        """
+        counts = np.bincount(self.alignment, minlength=len(ALIGNMENTS)).astype(np.int64)
+        return counts, int(np.count_nonzero(self.alienated_mask()))
+
+    def recount(self):
+        self.counts, self.num_alienated = self.scan_counts()
+
+    def moved(self, old, new):
+        """
+        Update the counters after alignment codes ``old`` were replaced by
+        ``new``, for scalars or arrays of codes. Called after any direct
+        change to the arrays, even one that leaves the alignments as
+        they were.
+        """
+        self.generation += 1
+        if np.ndim(old) == 0:
+            if old != new:
+                self.counts[old] -= 1
+                self.counts[new] += 1
+        else:
+            self.counts += np.bincount(new, minlength=len(ALIGNMENTS))
+            self.counts -= np.bincount(old, minlength=len(ALIGNMENTS))
+
+    def attach(self, G, labels=None):
+        """
+        Replace the node attribute dicts of ``G`` with views onto this
+        store, so existing ``G.nodes[n]["alignment"]`` style callers keep
+        working without a dict per node.
+
+        Parameters
+        ----------
+        G : networkx.Graph
+            Graph whose nodes are stored here, in row order.
+        labels : list, optional
+            Node label for each row. The default is the node order of G.
+        """
+        labels = list(G.nodes) if labels is None else labels
+        G._node = NodeAttributeTable(self, labels, G._adj)
+
+    def get(self, node, key):
+        if key == "alignment":
+            return self.get_alignment(node)
+        if key == "uncertainty":
+            return self.get_uncertainty(node)
+        if key == "susceptibility":
+            return self.get_susceptibility(node)
+        if key == "alienated":
+            return self.is_alienated(node)
+        return self.extra[node][key]
+
+    def set(self, node, key, value):
+        if key == "alignment":
+            self.set_alignment(node, value)
+        elif key == "uncertainty":
+            self.set_uncertainty(node, value)
+        elif key == "susceptibility":
+            self.set_susceptibility(node, value)
+        elif key == "alienated":
+            self.set_alienated(node, value)
+        else:
+            self.extra.setdefault(node, {})[key] = value
+
+
+class NodeAttributes(MutableMapping):
+    """
+    Dict-like view of one node's attributes in a NodeState.
+    """
+
+    __slots__ = ("_state", "_node")
+
+    def __init__(self, state, node):
+        self._state = state
+        self._node = node
+
+    def __getitem__(self, key):
+        try:
+            return self._state.get(self._node, key)
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        self._state.set(self._node, key, value)
+
+    def __delitem__(self, key):
+        extra = self._state.extra.get(self._node, {})
+        if key not in extra:
+            raise KeyError(key)
+        del extra[key]
+
+    def __iter__(self):
+        yield from ATTRIBUTES
+        yield from self._state.extra.get(self._node, {})
+
+    def __len__(self):
+        return len(ATTRIBUTES) + len(self._state.extra.get(self._node, {}))
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class NodeAttributeTable(Mapping):
+    """
+    Stand-in for ``G._node`` that maps node labels to NodeAttributes
+    views, created on demand. The nodes are those of the store, so
+    adding or removing a node (e.g. G.add_node, or G.add_edge to a new
+    node) raises a ValueError: install a new network instead (see
+    Simulator.set_network).
+    """
+
+    def __init__(self, state, labels, adj=None):
+        self._state = state
+        self._labels = labels
+        # networkx adds a new node to G._adj before G._node
+        self._adj = adj
+        if list(labels) == list(range(len(labels))):
+            self._index = None
+        else:
+            self._index = {label: i for i, label in enumerate(labels)}
+
+    def __getitem__(self, label):
+        if self._index is None:
+            if not isinstance(label, (int, np.integer)) or not 0 <= label < len(self._labels):
+                raise KeyError(label)
+            return NodeAttributes(self._state, int(label))
+        return NodeAttributes(self._state, self._index[label])
+
+    def __contains__(self, label):
+        try:
+            self[label]
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __setitem__(self, label, attributes):
+        if self._adj is not None and label not in self and not self._adj.get(label, True):
+            del self._adj[label]
+        raise ValueError(
+            f"Invalid change to node {label!r}. The nodes of a game are fixed; "
+            "set a new network with Simulator.set_network."
+        )
+
+    def __delitem__(self, label):
+        self[label] = None
+
+    def __iter__(self):
+        return iter(self._labels)
+
+    def __len__(self):
+        return len(self._labels)
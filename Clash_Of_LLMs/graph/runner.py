@@ -0,0 +1,103 @@
+from Clash_Of_LLMs.graph.message import Message
+
+
+def to_message(item):
+    """
+    Build a Message from a scripted message. Scripts give the team, the
+    potency and optionally the content, either as a Message, a dict with
+    those keys or a (team, potency[, content]) tuple. The potency is
+    written into the content in the "Potency = x" form that
+    Simulator.set_message parses, as the LLM replies are.
+
+    Returns
+    -------
+    team : str
+        The team sending the message.
+    message : Message object
+        The message, ready for Simulator.set_message.
+    """
+    if isinstance(item, Message):
+        return item.team, item
+    if isinstance(item, dict):
+        team, potency, content = item["team"], item["potency"], item.get("content", "")
+    else:
+        team, potency, content = (tuple(item) + ("",))[:3]
+    message = Message(team=team, potency=0.0,
+                      content=f"{content} Potency = {float(potency)}".strip(),
+                      active_nodes=[], steps_remaining=0)
+    return team, message
+
+
+def game_over(stats):
+    """
+    End conditions of the game: Blue has run out of energy, or every
+    node has been alienated.
+    """
+    return stats["BlueEnergy"] <= 0 or stats["AlienatedPercentage"] >= 100
+
+
+def advance(simulator, delta=False, since=None, fields=None):
+    """
+    Play the next turn with the message that is already set, and apply
+    the end conditions, as the /get_update route does.
+
+    Parameters
+    ----------
+    simulator : Simulator
+        The game to advance.
+    delta, since, fields : optional
+        Return a delta update instead of the full graph (see
+        Simulator.step_simulation).
+
+    Returns
+    -------
+    status : str
+        "running", or "finished" once the game has ended.
+    update : dict
+        The result of Simulator.step_simulation.
+    stats : dict or None
+        Stats after the turn, or None if no turn was played.
+    """
+    update = simulator.step_simulation(delta=delta, since=since, fields=fields)
+    if not update or update["status"] != "running":
+        return "finished", update or {}, None
+    stats = simulator.get_stats()
+    if game_over(stats):
+        return "finished", update, stats
+    return "running", update, stats
+
+
+def iter_game(simulator, messages):
+    """
+    Play a scripted game at full speed, one message per turn, until the
+    script runs out or the game ends.
+
+    Parameters
+    ----------
+    simulator : Simulator
+        The game to play.
+    messages : iterable
+        Scripted messages (see to_message).
+
+    Yields
+    ------
+    dict
+        Stats after each turn (see Simulator.get_stats), with the "Turn"
+        and "Step" reached.
+    """
+    for item in messages:
+        team, message = to_message(item)
+        simulator.set_message(team, message)
+        status, _, stats = advance(simulator)
+        if stats is not None:
+            yield {"Turn": simulator.turns_completed, "Step": simulator.current_step, **stats}
+        if status == "finished":
+            break
+
+
+def play_game(simulator, messages):
+    """
+    Play a scripted game (see iter_game) and return the stats of every
+    turn as a list.
+    """
+    return list(iter_game(simulator, messages))
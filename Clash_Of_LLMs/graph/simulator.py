@@ -4,12 +4,29 @@ from matplotlib.animation import FuncAnimation
 import networkx as nx
 from pyvis.network import Network
 import numpy as np
-import random
+import heapq
 
 
 import requests
 
+from Clash_Of_LLMs.graph.csr import CSRGraph
+from Clash_Of_LLMs.graph.delta import DeltaTracker
+from Clash_Of_LLMs.graph.ensemble import Ensemble
+from Clash_Of_LLMs.graph.frames import FrameStore, StateHistory
+from Clash_Of_LLMs.graph.generators import generate
+from Clash_Of_LLMs.graph.kernels import influence_kernel, message_influence_kernel
+from Clash_Of_LLMs.graph.layout import LayoutCache, cached_layout
 from Clash_Of_LLMs.graph.message import Message
+from Clash_Of_LLMs.graph import snapshot as snapshots
+from Clash_Of_LLMs.graph.node_state import (
+    ALIGNMENT_CODES,
+    ALIGNMENTS,
+    ATTRIBUTES,
+    BLUE,
+    NEUTRAL,
+    RED,
+    NodeState,
+)
 
 # Debugging and Animation Settings (for developers)
 debugging = True
@@ -50,13 +67,53 @@ class Simulator:
     autoplay_delay : float, optional
         Delay between steps in autoplay mode (seconds). The default is
         1.0.
-    random_seed : int, optional
-        Random seed for reproducibility. The default is 42.
+    random_seed : int or numpy.random.SeedSequence, optional
+        Random seed for reproducibility. The default is 42. Each
+        Simulator owns independent random streams spawned from this
+        seed, so simulators never share random state. Pass the children
+        of ``SeedSequence(seed).spawn(n)`` to run n independent,
+        reproducible games in parallel threads or processes.
     current_message : Message object
         The current message being propogated.
     use_random_start_alignments : bool, optional
         Whether to use randomised alignments when starting. The default
         is False.
+    diffusion_engine : str, optional
+        Engine used to spread active messages. "loop" walks the networkx
+        graph one edge at a time, "csr" expands each frontier with
+        batched NumPy operations over a CSR adjacency. The default is
+        "loop".
+    green_influence_mode : str, optional
+        "incremental" only re-evaluates edges touching nodes whose
+        alignment or uncertainty changed since the last sweep, "full"
+        evaluates every edge on every sweep. Both give identical
+        results. The default is "incremental".
+    fuse_green_influence : bool, optional
+        Whether peer influence runs once per step after all active
+        messages have spread. When False, it runs after each active
+        message, as in earlier versions. The default is True.
+    check_counters : bool, optional
+        Whether to cross-check the live population counters against a
+        full scan every time stats are read (for debugging). The default
+        is False.
+    graph_generator : str, optional
+        "networkx" builds networks with the networkx generators, "native"
+        with the generators in graph.generators, which write CSR arrays
+        directly in O(n + m) and scale to millions of nodes. With
+        "native", the networkx graph G is only built if it is used. The
+        "stochastic_block" and "configuration" network types are always
+        native. The default is "networkx".
+    layout_cache : LayoutCache, optional
+        On-disk cache of node positions. The default is a LayoutCache in
+        $CLASH_LAYOUT_CACHE or ~/.cache/clash_of_llms/layouts.
+    record_frames : bool or FrameStore, optional
+        Whether to record the alignments at every step in ``frames``
+        (for animate_frames and replays). True records in a new
+        FrameStore. The default is False, which records nothing.
+    record_history : bool or StateHistory, optional
+        Whether to keep checkpoints of the full node state, so any past
+        step can be fetched with get_step_data. True records in a new
+        StateHistory. The default is False.
 
     Methods
     -------
@@ -98,7 +155,15 @@ class Simulator:
         steps_per_turn=2,
         autoplay=True,
         autoplay_delay=1.0,
-        animate=True
+        animate=True,
+        diffusion_engine="loop",
+        green_influence_mode="incremental",
+        fuse_green_influence=True,
+        check_counters=False,
+        graph_generator="networkx",
+        layout_cache=None,
+        record_frames=False,
+        record_history=False
     ):
         """
         Initialize the simulator with parameters.
@@ -109,8 +174,7 @@ class Simulator:
         self.network_type = network_type
         self.edge_probability = edge_probability
         self.random_seed = random_seed
-        random.seed(self.random_seed)
-        np.random.seed(self.random_seed)
+        self.seed_rng(random_seed)
         self.use_random_start_alignments = use_random_start_alignments
         # Simulation parameters
         self.source_activation_rate = source_activation_rate
@@ -126,6 +190,25 @@ class Simulator:
         self.autoplay_delay = autoplay_delay
         # Debugging and Animation
         self.animate = animate
+        # Diffusion engine
+        if diffusion_engine not in ["loop", "csr"]:
+            raise ValueError("Invalid diffusion engine. Must be 'loop' or 'csr'.")
+        self.diffusion_engine = diffusion_engine
+        if green_influence_mode not in ["incremental", "full"]:
+            raise ValueError("Invalid green influence mode. Must be 'incremental' or 'full'.")
+        self.green_influence_mode = green_influence_mode
+        self.fuse_green_influence = fuse_green_influence
+        self.check_counters = check_counters
+        if graph_generator not in ["networkx", "native"]:
+            raise ValueError("Invalid graph generator. Must be 'networkx' or 'native'.")
+        self.graph_generator = graph_generator
+        self.network_params = {}
+        self.layout_cache = LayoutCache() if layout_cache is None else layout_cache
+        self.green_influence_stats = {
+            "sweeps": 0,
+            "edges_evaluated": 0,
+            "edges_skipped": 0,
+        }
 
         # INITIALIZE DYNAMIC ATTRIBUTES
         # Simulation state
@@ -136,16 +219,49 @@ class Simulator:
         self.active_messages = []
         self.current_message = None
         self.history = [{"Red": 0, "Blue": 0, "Neutral": self.num_nodes}]
-        self.frames = []  # Store graph data frame at each step
-        
-        
-        self.G = self.create_network()
+        # Alignments at each step, when a consumer asks for them
+        self.frames = None
+        self.record_frames(record_frames)
+        # Full node state at each step, for rewinding
+        self.checkpoints = None
+        self.record_history(record_history)
+
+        self.set_network(self.create_network())
         self.initialize_node_attributes()
         
         # INITIALIZE CURRENT MESSAGES
         self.current_messages = {"Red": None, "Blue": None}
 
 
+    def seed_rng(self, random_seed):
+        """
+        Create the random streams of the simulator from a seed. Node
+        attributes, source node selection and message spreading each get
+        their own numpy Generator, so the draws of one never shift the
+        others.
+
+        Parameters
+        ----------
+        random_seed : int, numpy.random.SeedSequence or None
+            Seed for the streams. None seeds from fresh OS entropy.
+        """
+        if isinstance(random_seed, np.random.SeedSequence):
+            # Copy, as spawning advances the caller's sequence
+            self.seed_sequence = np.random.SeedSequence(
+                random_seed.entropy,
+                spawn_key=random_seed.spawn_key,
+                pool_size=random_seed.pool_size,
+            )
+            # networkx generators take an integer seed
+            self.network_seed = int(random_seed.generate_state(1)[0])
+        else:
+            self.seed_sequence = np.random.SeedSequence(random_seed)
+            self.network_seed = random_seed
+        attribute_seed, source_seed, spread_seed = self.seed_sequence.spawn(3)
+        self.attribute_rng = np.random.default_rng(attribute_seed)
+        self.source_rng = np.random.default_rng(source_seed)
+        self.spread_rng = np.random.default_rng(spread_seed)
+
     def set_message(self, team, message):
         """
         Set the message for a given team.
@@ -196,20 +312,124 @@ class Simulator:
         self.active_messages.append(message)
             
 
+    @property
+    def G(self):
+        """
+        The network as a networkx graph. Networks generated natively are
+        only converted when G is first used.
+        """
+        if self._G is None:
+            self._G = self.csr.to_networkx()
+            if hasattr(self, "state"):
+                self.state.attach(self._G, self.csr.labels)
+        return self._G
+
+    @G.setter
+    def G(self, G):
+        self.set_network(G)
+
+    @property
+    def positions(self):
+        """
+        (num_nodes, 2) array of node positions in [-1, 1], in CSR order.
+        Computed on first use with a force layout on the CSR arrays, and
+        kept in the layout cache so the same network is never laid out
+        twice.
+        """
+        if self._positions is None:
+            self._positions = cached_layout(
+                self.csr,
+                self.network_type,
+                self.network_params,
+                self.network_seed,
+                cache=self.layout_cache,
+            )
+        return self._positions
+
+    @property
+    def pos(self):
+        """
+        Node positions for plotting, as a networkx layout dict.
+        """
+        return dict(zip(self.csr.labels, self.positions))
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory held by the network and node state, counting
+        G (when built) at about what networkx uses per node and edge.
+        """
+        total = self.csr.indptr.nbytes + self.csr.indices.nbytes
+        if hasattr(self, "state"):
+            total += self.state.nbytes + self.state.dirty.nbytes
+            # Change versions and snapshot of the delta tracker
+            total += sum(versions.nbytes for versions in self.delta.node_version.values())
+            total += self.state.nbytes
+        if self._positions is not None:
+            total += self._positions.nbytes
+        if self._G is not None:
+            total += 220 * self.csr.num_nodes + 145 * self.csr.num_edges
+        if self.frames is not None:
+            total += self.frames.nbytes
+        if self.checkpoints is not None:
+            total += self.checkpoints.nbytes
+        return total
+
+    def set_network(self, network):
+        """
+        Install a new network.
+
+        Parameters
+        ----------
+        network : networkx.Graph or CSRGraph
+            The network. A CSRGraph is used as is, and G is built from
+            it when first needed.
+        """
+        if isinstance(network, CSRGraph):
+            self._G = None
+            self.csr = network
+        else:
+            self._G = network
+            self.csr = CSRGraph.from_networkx(network)
+            if hasattr(self, "state") and self.state.num_nodes == self.csr.num_nodes:
+                self.state.attach(network, self.csr.labels)
+        self._positions = None
+
+    def use_native_generator(self, network_type):
+        return self.graph_generator == "native" or network_type in ["stochastic_block", "configuration"]
+
     def create_network(self):
         """
         Create a network with specified topology and parameters.
-        return: networkx graph
+        return: networkx graph, or CSRGraph for native generators
         """
+        # Record the parameters used, as the layout cache is keyed by them
+        self.network_params = {
+            "er_probability": self.edge_probability,
+            "ba_connections": 2,
+            "ws_neighbours": 4,
+            "ws_rewire_probability": 0.1,
+            **{
+                key: self.network_params.get(key)
+                for key in ["block_sizes", "block_probabilities", "degrees"]
+            },
+        }
+        if self.use_native_generator(self.network_type):
+            return generate(
+                self.network_type,
+                self.num_nodes,
+                seed=self.network_seed,
+                **self.network_params,
+            )
         if self.network_type == "erdos_renyi":
             G = nx.erdos_renyi_graph(
-                self.num_nodes, self.edge_probability, seed=self.random_seed
+                self.num_nodes, self.edge_probability, seed=self.network_seed
             )
         elif self.network_type == "barabasi_albert":
-            G = nx.barabasi_albert_graph(self.num_nodes, 2, seed=self.random_seed)
+            G = nx.barabasi_albert_graph(self.num_nodes, 2, seed=self.network_seed)
         elif self.network_type == "watts_strogatz":
             G = nx.watts_strogatz_graph(
-                self.num_nodes, 4, 0.1, seed=self.random_seed
+                self.num_nodes, 4, 0.1, seed=self.network_seed
             )
         return G
 
@@ -221,7 +441,10 @@ class Simulator:
         er_probability=0.05,
         ba_connections=2,
         ws_neighbours=4,
-        ws_rewire_probability=0.1
+        ws_rewire_probability=0.1,
+        block_sizes=None,
+        block_probabilities=None,
+        degrees=None
     ):
         """
         Create a network with specified topology and parameters.
@@ -242,6 +465,13 @@ class Simulator:
             Number of watts strogatz graph neigbour edges in the graph.
         ws_rewire_probability : float
             Probability of watts strogatz graph edge rewiring.
+        block_sizes : list, optional
+            Number of nodes in each block of a stochastic block model.
+        block_probabilities : list, optional
+            Matrix of stochastic block model edge probabilities between
+            blocks.
+        degrees : list, optional
+            Degree sequence of a configuration model graph.
         """
         # print("network_type:", network_type,
         #      "uncertainty", uncertainty,
@@ -251,28 +481,45 @@ class Simulator:
         #      "ws_neighbours", ws_neighbours,
         #      "ws_rewire_probability", ws_rewire_probability)
         
-        if network_type == "erdos_renyi":
-            G = nx.erdos_renyi_graph(n, er_probability, seed=self.random_seed)
+        if self.use_native_generator(network_type):
+            G = generate(
+                network_type,
+                n,
+                seed=self.network_seed,
+                er_probability=er_probability,
+                ba_connections=ba_connections,
+                ws_neighbours=ws_neighbours,
+                ws_rewire_probability=ws_rewire_probability,
+                block_sizes=block_sizes,
+                block_probabilities=block_probabilities,
+                degrees=degrees,
+            )
+        elif network_type == "erdos_renyi":
+            G = nx.erdos_renyi_graph(n, er_probability, seed=self.network_seed)
         elif network_type == "barabasi_albert":
-            G = nx.barabasi_albert_graph(n, ba_connections, seed=self.random_seed)
+            G = nx.barabasi_albert_graph(n, ba_connections, seed=self.network_seed)
         elif network_type == "watts_strogatz":
-            G = nx.watts_strogatz_graph(n, ws_neighbours, ws_rewire_probability, seed=self.random_seed)
+            G = nx.watts_strogatz_graph(n, ws_neighbours, ws_rewire_probability, seed=self.network_seed)
         else:
-            G = nx.erdos_renyi_graph(n, er_probability, seed=self.random_seed)
+            G = nx.erdos_renyi_graph(n, er_probability, seed=self.network_seed)
 
-        self.G = G
-        self.num_nodes = n
+        self.set_network(G)
+        self.num_nodes = self.csr.num_nodes
         self.edge_probability = er_probability if er_probability is not None else 0.05
         self.network_type = network_type
+        self.network_params = {
+            "er_probability": er_probability,
+            "ba_connections": ba_connections,
+            "ws_neighbours": ws_neighbours,
+            "ws_rewire_probability": ws_rewire_probability,
+            "block_sizes": block_sizes,
+            "block_probabilities": block_probabilities,
+            "degrees": degrees,
+        }
 
         # Reinitalize node attributes with new uncertainty
         self.uncertainty = uncertainty
         self.initialize_node_attributes(uncertainty=self.uncertainty)
-
-        k_value = 3 / np.sqrt(self.num_nodes)
-        self.pos = nx.spring_layout(
-            self.G, k=0.1, iterations=1000, seed=self.random_seed
-        )
         return G
 
     def initialize_node_attributes(self, uncertainty=2.0):
@@ -280,21 +527,30 @@ class Simulator:
         initialize the nodes with random susceptibility and current
         alignment.
         """
-        for node in self.G.nodes:
-            self.G.nodes[node]["susceptibility"] = np.random.uniform(0.0, 1.0)
-            self.G.nodes[node]["alienated"] = False
-            if self.use_random_start_alignments:
-                self.G.nodes[node]["alignment"] = np.random.choice(["Red", "Blue"])
-                self.G.nodes[node]["uncertainty"] = np.random.uniform(
-                    -(uncertainty), uncertainty
-                )
-            else:
-                self.G.nodes[node]["alignment"] = "Neutral"
-                self.G.nodes[node]["uncertainty"] = uncertainty
+        n = self.csr.num_nodes
+        self.state = NodeState(n)
+        rng = self.attribute_rng
+        self.state.susceptibility[:] = rng.uniform(0.0, 1.0, n)
+        if self.use_random_start_alignments:
+            self.state.alignment[:] = rng.choice([RED, BLUE], n)
+            self.state.uncertainty[:] = rng.uniform(-(uncertainty), uncertainty, n)
+        else:
+            self.state.alignment[:] = NEUTRAL
+            self.state.uncertainty[:] = uncertainty
+        self.state.recount()
+        self.delta = DeltaTracker(self.state)
+        # Frames of the previous nodes no longer apply
+        self.frames.clear() if self.frames is not None else None
+        if self.checkpoints is not None:
+            self.checkpoints.clear()
+            self.checkpoints.record(0, self.state)
+
+        # Serve self.G.nodes[node] from the state arrays (a natively
+        # generated G is attached when it is built)
+        if self._G is not None:
+            self.state.attach(self._G, self.csr.labels)
+
 
-            # ? Do I need to initialize an 'activated' attribute here?
-        
-        
     def activate_source_nodes(self, team, message):
         """
         Activate initial nodes for a given team with the message.
@@ -317,184 +573,474 @@ class Simulator:
         num_initial = int(self.source_activation_rate * self.num_nodes)
 
         # Select nodes to activate
-        source_nodes = random.sample(list(self.G.nodes), num_initial)
+        rows = self.source_rng.choice(self.csr.num_nodes, num_initial, replace=False)
+        source_nodes = [self.csr.labels[row] for row in rows.tolist()]
 
         # Activate nodes
-        for node in source_nodes:
+        for row in rows.tolist():
             # ? Is an 'activated' attribute necessary?
-            self.G.nodes[node]["alignment"] = team
+            self.state.set_alignment(row, team)
         print(f"Source nodes activated: {len(source_nodes)}") if debugging else None
 
         return source_nodes
 
 
     def message_influence(self, node, message):
-        U = self.G.nodes[node]["uncertainty"]
+        self._message_influence_row(self.csr.row(node), message)
+
+    def _message_influence_row(self, node, message):
+        state = self.state
+        U = state.uncertainty[node]
         Q = message.potency
-        A = self.G.nodes[node]["alignment"]
-        T = message.team
-        # print(f"NODE {node} BEFORE message_influence A: {A} U: {U} T: {T} Q: {Q} Alienated?: {self.G.nodes[node]['alienated']}")
-        if A != message.team:
-            if message.team == "Red":
+        A = state.alignment[node]
+        T = ALIGNMENT_CODES[message.team]
+        # print(f"NODE {node} BEFORE message_influence A: {A} U: {U} T: {T} Q: {Q} Alienated?: {state.is_alienated(node)}")
+        if A != T:
+            if T == RED:
                 alienation_threshold = (
                     -1
                 )  # Q = 0.1 can only alienate U = -1.0; Q = 1 can alienate U < -1.0
                 if U * Q * 10 <= alienation_threshold:
-                    self.G.nodes[node]["alienated"] = True
-            elif A == "Neutral":
-                self.G.nodes[node]["uncertainty"] = 0.5
-                self.G.nodes[node]["alignment"] = message.team
+                    state.set_alienated(node)
+            elif A == NEUTRAL:
+                state.uncertainty[node] = 0.5
+                state.alignment[node] = T
             elif U >= 0:
                 if Q >= 0.5:
-                    self.G.nodes[node]["alignment"] = self.switch(node)
-                    self.G.nodes[node]["uncertainty"] = (
+                    state.alignment[node] = self._switch_row(node)
+                    state.uncertainty[node] = (
                         9 - Q * 10 - (U * 2)
                     ) / 10  # -0.3 < U < 0.4 range for nodes
                 else:
                     if (U + Q) > 1.0:
-                        self.G.nodes[node]["alignment"] = self.switch(node)
-                        self.G.nodes[node]["uncertainty"] = 2.0 - (
+                        state.alignment[node] = self._switch_row(node)
+                        state.uncertainty[node] = 2.0 - (
                             U + Q
                         )  # 0.5 < U < 1.0 range for nodes
             elif -0.5 < U:
-                self.G.nodes[node]["uncertainty"] += (
+                state.uncertainty[node] = U + (
                     Q / 2
                 )  # -0.5 < U < 0.5 range for nodes
             else:
                 # nodes closer to U = -1.0 will resist potent messages more
-                self.G.nodes[node]["uncertainty"] += (10 * Q) / (
+                state.uncertainty[node] = U + (10 * Q) / (
                     100 * -(U)
                 )  # -1.0 < U < -0.3 range for nodes
         else:
             if U >= 0:
                 if Q >= 0.5:
-                    self.G.nodes[node]["uncertainty"] = (
+                    state.uncertainty[node] = (
                         5 - (Q * 10) + (U * 5)
                     ) / 10  # -0.5 < U < 0.5 range for nodes
                 else:
-                    self.G.nodes[node]["uncertainty"] = U - (
+                    state.uncertainty[node] = U - (
                         2 * Q / 5
                     )  # -0.2 < U < 0.8 range for nodes
             elif -0.5 < U:
-                self.G.nodes[node]["uncertainty"] = U - (
+                state.uncertainty[node] = U - (
                     Q / 3
                 )  # -0.8 < U < -0.5 range for nodes
             else:
                 # nodes closer to U = -1.0 will be harder to make them more certain than they already are.
-                self.G.nodes[node]["uncertainty"] = U - max(
+                state.uncertainty[node] = U - max(
                     (10 * Q) / (30 * (-U)) - 0.34, 0
                 )  # -1.0 < U < -0.5 range for nodes
-        # print(f"NODE {node} AFTER message_influence A: {self.G.nodes[node]['alignment']} U: {self.G.nodes[node]['uncertainty']} Alienated?: {self.G.nodes[node]['alienated']} ")
+        if state.alignment[node] != A or state.uncertainty[node] != U:
+            state.moved(A, state.alignment[node])
+            state.dirty[node] = True
+        # print(f"NODE {node} AFTER message_influence A: {state.get_alignment(node)} U: {state.uncertainty[node]} Alienated?: {state.is_alienated(node)} ")
+
+    def message_influence_many(self, nodes, message):
+        """
+        Apply message_influence to many nodes at once using the
+        vectorised kernel. Equivalent to calling message_influence on
+        each node, as the rule only reads the node it updates.
+
+        Parameters
+        ----------
+        nodes : numpy.ndarray
+            Unique row indices (see CSRGraph) of the receiving nodes.
+        message : Message object
+            The message being received.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        state = self.state
+        old_alignment = state.alignment[nodes]
+        old_uncertainty = state.uncertainty[nodes]
+        alignment, uncertainty, alienate = message_influence_kernel(
+            old_alignment,
+            old_uncertainty,
+            ALIGNMENT_CODES[message.team],
+            message.potency,
+        )
+        state.alignment[nodes] = alignment
+        state.uncertainty[nodes] = uncertainty
+        state.moved(old_alignment, alignment)
+        state.dirty[nodes[(alignment != old_alignment) | (uncertainty != old_uncertainty)]] = True
+        state.set_alienated_many(nodes[alienate])
+
+    def influence_many(self, sup_nodes, inf_nodes):
+        """
+        Apply influence to many (superior, inferior) pairs at once using
+        the vectorised kernel. All pairs read the state as it was before
+        the call, so each inferior node may appear only once.
+
+        Parameters
+        ----------
+        sup_nodes : numpy.ndarray
+            Row indices of the superior (more certain) nodes.
+        inf_nodes : numpy.ndarray
+            Unique row indices of the inferior nodes.
+        """
+        sup_nodes = np.asarray(sup_nodes, dtype=np.int64)
+        inf_nodes = np.asarray(inf_nodes, dtype=np.int64)
+        if len(np.unique(inf_nodes)) != len(inf_nodes):
+            raise ValueError("Inferior nodes must be unique.")
+        state = self.state
+        old_alignment = state.alignment[inf_nodes]
+        old_uncertainty = state.uncertainty[inf_nodes]
+        alignment, uncertainty = influence_kernel(
+            state.alignment[sup_nodes],
+            state.uncertainty[sup_nodes],
+            old_alignment,
+            old_uncertainty,
+        )
+        state.alignment[inf_nodes] = alignment
+        state.uncertainty[inf_nodes] = uncertainty
+        state.moved(old_alignment, alignment)
+        state.dirty[inf_nodes[(alignment != old_alignment) | (uncertainty != old_uncertainty)]] = True
 
     def switch(self, node):
-        if self.G.nodes[node]["alignment"] == "Blue":
-            return "Red"
-        return "Blue"
+        return ALIGNMENTS[self._switch_row(self.csr.row(node))]
+
+    def _switch_row(self, node):
+        if self.state.alignment[node] == BLUE:
+            return RED
+        return BLUE
     
 
-    def green_influence(self):
-        for node in self.G.nodes:
-            for neighbor in self.G.neighbors(node):
-                if (
-                    self.G.nodes[node]["uncertainty"]
-                    < self.G.nodes[neighbor]["uncertainty"]
-                ):
-                    self.influence(node, neighbor)
-                    
+    def green_influence(self, mode=None):
+        """
+        Let every node influence its less certain neighbours, visiting
+        nodes and their neighbours in graph order.
+
+        Parameters
+        ----------
+        mode : str, optional
+            "incremental" or "full" (see green_influence_mode). The
+            default is the mode the simulator was created with.
+        """
+        mode = self.green_influence_mode if mode is None else mode
+        if mode == "full":
+            evaluated = self.green_influence_full()
+        else:
+            evaluated = self.green_influence_incremental()
+
+        self.green_influence_stats["sweeps"] += 1
+        self.green_influence_stats["edges_evaluated"] += evaluated
+        self.green_influence_stats["edges_skipped"] += len(self.csr.indices) - evaluated
+
+    def green_influence_full(self):
+        """
+        Evaluate every edge in both directions.
+
+        Returns
+        -------
+        int
+            Number of edge evaluations.
+        """
+        uncertainty = self.state.uncertainty
+        U = uncertainty.tolist()
+        indptr = self.csr.indptr.tolist()
+        indices = self.csr.indices
+        self.state.dirty[:] = False
+        for node in range(self.csr.num_nodes):
+            # Influencing one neighbour never changes this node or the
+            # other neighbours, so the comparisons can be made up front
+            U1 = U[node]
+            for neighbor in [
+                neighbor
+                for neighbor in indices[indptr[node] : indptr[node + 1]].tolist()
+                if U1 < U[neighbor]
+            ]:
+                self._influence_rows(node, neighbor)
+                U[neighbor] = uncertainty[neighbor]
+        return len(indices)
+
+    def green_influence_incremental(self):
+        """
+        Evaluate only the edges with at least one dirty endpoint. An edge
+        between two clean nodes was already evaluated with the same
+        alignments and uncertainties and left them unchanged, so it would
+        do nothing again. Nodes are visited in the same order as the full
+        sweep, and nodes that change during the sweep become dirty for
+        the rest of it, so the result is identical to green_influence_full.
+
+        Returns
+        -------
+        int
+            Number of edge evaluations.
+        """
+        state = self.state
+        uncertainty = state.uncertainty
+        U = uncertainty.tolist()
+        indptr = self.csr.indptr
+        indices = self.csr.indices
+
+        # Nodes changed before this sweep; changes made during the sweep
+        # are recorded in state.dirty for the next one
+        dirty_nodes = np.flatnonzero(state.dirty)
+        active = state.dirty.tolist()
+        state.dirty[:] = False
+        _, adjacent = self.csr.gather(dirty_nodes)
+        queue = np.union1d(dirty_nodes, adjacent).tolist()  # Sorted, so a valid heap
+        queued = np.zeros(self.csr.num_nodes, dtype=bool)
+        queued[queue] = True
+
+        evaluated = 0
+        while queue:
+            node = heapq.heappop(queue)
+            neighbors = indices[indptr[node] : indptr[node + 1]].tolist()
+            if not active[node]:
+                neighbors = [neighbor for neighbor in neighbors if active[neighbor]]
+            evaluated += len(neighbors)
+            U1 = U[node]
+            for neighbor in [neighbor for neighbor in neighbors if U1 < U[neighbor]]:
+                self._influence_rows(node, neighbor)
+                U[neighbor] = uncertainty[neighbor]
+                if state.dirty[neighbor] and not active[neighbor]:
+                    # Edges of the changed node that are still ahead in
+                    # the sweep must now be evaluated
+                    active[neighbor] = True
+                    for later in [neighbor, *self.csr.neighbors(neighbor).tolist()]:
+                        if later > node and not queued[later]:
+                            queued[later] = True
+                            heapq.heappush(queue, later)
+        return evaluated
+
 
     def influence(self, sup_node, inf_node):
-        A1 = self.G.nodes[sup_node]["alignment"]
-        U1 = self.G.nodes[sup_node]["uncertainty"]
-        A2 = self.G.nodes[inf_node]["alignment"]
-        U2 = self.G.nodes[inf_node]["uncertainty"]
+        self._influence_rows(self.csr.row(sup_node), self.csr.row(inf_node))
+
+    def _influence_rows(self, sup_node, inf_node):
+        state = self.state
+        A1 = state.alignment[sup_node]
+        U1 = state.uncertainty[sup_node]
+        A2 = state.alignment[inf_node]
+        U2 = state.uncertainty[inf_node]
         c = 1000
         # print(f"BEFORE: NODE {sup_node} A = {A1} U = {U1} influences NODE {inf_node} A = {A2} U = {U2}")
         if A1 == A2:
             if U2 >= 0:
                 if U1 >= 0:
-                    self.G.nodes[inf_node]["uncertainty"] = U2 - (U2 - U1) / (
+                    state.uncertainty[inf_node] = U2 - (U2 - U1) / (
                         c / 5
                     )  # Change of unceratinty is 20% of the difference in uncertainty
                 elif U1 > -0.5:
-                    self.G.nodes[inf_node]["uncertainty"] = U2 - (U2 - U1) / (
+                    state.uncertainty[inf_node] = U2 - (U2 - U1) / (
                         c / 4
                     )  # Change of unceratinty is 25% of the difference in uncertainty
                 else:
-                    self.G.nodes[inf_node]["uncertainty"] = U2 - (U2 - U1) / (
+                    state.uncertainty[inf_node] = U2 - (U2 - U1) / (
                         c / 3
                     )  # Change of unceratinty is 33.33% of the difference in uncertainty
             elif U2 > -0.5:
                 if U1 > -0.5:
-                    self.G.nodes[inf_node]["uncertainty"] = U2 - (U2 - U1) / (
+                    state.uncertainty[inf_node] = U2 - (U2 - U1) / (
                         c / 10
                     )  # Change of unceratinty is 10% of the difference in uncertainty
                 else:
-                    self.G.nodes[inf_node]["uncertainty"] = U2 - (U2 - U1) / (
+                    state.uncertainty[inf_node] = U2 - (U2 - U1) / (
                         c / 5
                     )  # Change of unceratinty is 20% of the difference in uncertainty
             else:
-                self.G.nodes[inf_node]["uncertainty"] = U2 - (U2 - U1) / (
+                state.uncertainty[inf_node] = U2 - (U2 - U1) / (
                     c / 10
                 )  # Change of unceratinty is 10% of the difference in uncertainty
-        elif A2 == "Neutral":
-            self.G.nodes[inf_node]["uncertainty"] = 0.5
-            self.G.nodes[inf_node]["alignment"] = A1
+        elif A2 == NEUTRAL:
+            state.uncertainty[inf_node] = 0.5
+            state.alignment[inf_node] = A1
         else:
             if U2 >= 0:
                 if U1 >= 0:
                     if U2 + (U2 - U1) / (c / 5) > 1:
-                        self.G.nodes[inf_node]["alignment"] = self.switch(inf_node)
-                        self.G.nodes[inf_node]["uncertainty"] = 2 - (
+                        state.alignment[inf_node] = self._switch_row(inf_node)
+                        state.uncertainty[inf_node] = 2 - (
                             U2 + (U2 - U1) / (c / 5)
                         )
                     else:
-                        self.G.nodes[inf_node]["uncertainty"] = U2 + (U2 - U1) / (
+                        state.uncertainty[inf_node] = U2 + (U2 - U1) / (
                             c / 5
                         )  # Change of unceratinty is 20% of the difference in uncertainty
                 elif U1 > -0.5:
                     if U2 + (U2 - U1) / (c / 4) > 1:
-                        self.G.nodes[inf_node]["alignment"] = self.switch(inf_node)
-                        self.G.nodes[inf_node]["uncertainty"] = 2 - (
+                        state.alignment[inf_node] = self._switch_row(inf_node)
+                        state.uncertainty[inf_node] = 2 - (
                             U2 + (U2 - U1) / (c / 4)
                         )
                     else:
-                        self.G.nodes[inf_node]["uncertainty"] = U2 + (U2 - U1) / (
+                        state.uncertainty[inf_node] = U2 + (U2 - U1) / (
                             c / 4
                         )  # Change of unceratinty is 25% of the difference in uncertainty
                 else:
                     if U2 + (U2 - U1) / (c / 3) > 1:
-                        self.G.nodes[inf_node]["alignment"] = self.switch(inf_node)
-                        self.G.nodes[inf_node]["uncertainty"] = 2 - (
+                        state.alignment[inf_node] = self._switch_row(inf_node)
+                        state.uncertainty[inf_node] = 2 - (
                             U2 + (U2 - U1) / (c / 3)
                         )
                     else:
-                        self.G.nodes[inf_node]["uncertainty"] = U2 + (U2 - U1) / (
+                        state.uncertainty[inf_node] = U2 + (U2 - U1) / (
                             c / 3
                         )  # Change of unceratinty is 33.33% of the difference in uncertainty
             elif U2 > -0.5:
                 if U1 > -0.5:
-                    self.G.nodes[inf_node]["uncertainty"] = U2 + (U2 - U1) / (
+                    state.uncertainty[inf_node] = U2 + (U2 - U1) / (
                         c / 10
                     )  # Change of unceratinty is 10% of the difference in uncertainty
                 else:
-                    self.G.nodes[inf_node]["uncertainty"] = U2 + (U2 - U1) / (
+                    state.uncertainty[inf_node] = U2 + (U2 - U1) / (
                         c / 5
                     )  # Change of unceratinty is 20% of the difference in uncertainty
             else:
-                self.G.nodes[inf_node]["uncertainty"] = U2 + (U2 - U1) / (
+                state.uncertainty[inf_node] = U2 + (U2 - U1) / (
                     c / 10
                 )  # Change of unceratinty is 10% of the difference in uncertainty
+        if state.alignment[inf_node] != A2 or state.uncertainty[inf_node] != U2:
+            state.moved(A2, state.alignment[inf_node])
+            state.dirty[inf_node] = True
         # print(f"AFTER: NODE {sup_node} A = {A1} U = {U1} influences NODE {inf_node} A = {A2} U = {U2}")
 
     def energy_lost(self, potency):
         return (10*potency/3)**2.1
 
 
+    def spread_message_loop(self, active_message):
+        """
+        Spread a single active message one step by walking the networkx
+        graph edge by edge.
+
+        Parameters
+        ----------
+        active_message : Message object
+            The message to spread.
+
+        Returns
+        -------
+        new_active_nodes : set
+            Nodes that were influenced by the message this step.
+        """
+        team = active_message.team
+        team_code = ALIGNMENT_CODES[team]
+        state = self.state
+        current_active_nodes = active_message.active_nodes
+        new_active_nodes = set()
+        rng = self.spread_rng
+
+        for current_node in current_active_nodes:
+            for neighbor in self.G.neighbors(current_node):
+                row = self.csr.row(neighbor)
+                if (
+                    state.is_alienated(row)
+                    and team == "Red"
+                ):
+                    continue
+                if (
+                    neighbor in current_active_nodes
+                    or neighbor in new_active_nodes
+                ):
+                    continue
+
+                susceptibility = state.susceptibility[row]
+                influence_probability = (
+                    self.base_influence_prob
+                    * active_message.potency
+                    * susceptibility
+                )
+
+                if state.alignment[row] != team_code:
+                    influence_probability *= 0.8  # Reduce influence probability for nodes with opposite alignment
+
+                if rng.random() < influence_probability:
+                    old = state.get_alignment(row)
+                    self._message_influence_row(row, active_message)
+                    """ message_influence handles whether a
+                    green agent swaps alignments given exposure
+                    to the message """
+                    # self.G.nodes[neighbor]['alignment'] = team
+                    new_active_nodes.add(neighbor)
+                    if state.get_alignment(row) != old:
+                        (
+                            print(
+                                f"Node {neighbor} influenced by node {current_node}, and changes to {state.get_alignment(row)} alignment from {old}."
+                            )
+                            if debugging
+                            else None
+                        )
+
+        return new_active_nodes
+
+    def spread_message_csr(self, active_message):
+        """
+        Spread a single active message one step using batched NumPy
+        operations over the CSR adjacency. Every edge leaving the
+        frontier is gathered at once, edges into alienated (for Red) or
+        already active nodes are masked out, and one Bernoulli trial is
+        drawn per remaining edge. A neighbour is influenced if any of its
+        trials succeeds, which matches the per-edge loop where a
+        neighbour is retried by each active node until it is influenced.
+
+        Parameters
+        ----------
+        active_message : Message object
+            The message to spread.
+
+        Returns
+        -------
+        new_active_nodes : set
+            Nodes that were influenced by the message this step.
+        """
+        team = active_message.team
+        state = self.state
+        labels = self.csr.labels
+        frontier = self.csr.rows(active_message.active_nodes)
+        _, targets = self.csr.gather(frontier)
+
+        # Mask out neighbours that are already active for this message
+        is_active = np.zeros(self.csr.num_nodes, dtype=bool)
+        is_active[frontier] = True
+        targets = targets[~is_active[targets]]
+        candidates, position = np.unique(targets, return_inverse=True)
+
+        probability = (
+            self.base_influence_prob
+            * active_message.potency
+            * state.susceptibility[candidates]
+        )
+        # Reduce influence probability for nodes with opposite alignment
+        probability[state.alignment[candidates] != ALIGNMENT_CODES[team]] *= 0.8
+        if team == "Red":
+            probability[state.alienated_mask()[candidates]] = 0.0
+
+        # One Bernoulli trial per edge into each candidate
+        trials = self.spread_rng.random(len(position)) < probability[position]
+        winners = np.unique(candidates[position[trials]])
+
+        old = state.alignment[winners]
+        self.message_influence_many(winners, active_message)
+        if debugging:
+            for node in winners[state.alignment[winners] != old].tolist():
+                print(
+                    f"Node {labels[node]} influenced, and changes to {state.get_alignment(node)} alignment."
+                )
+
+        return {labels[node] for node in winners.tolist()}
+
     def spread_active_messages(self):
         """
         Spread the active messages to neighboring nodes through the
         network. If a node is influenced, it adopts the alignment of the
-        message, and becomes active for the next turn.
+        message, and becomes active for the next turn. Peer influence
+        then runs once for the step (see fuse_green_influence).
         """
         new_active_messages = []
         for active_message in self.active_messages:
@@ -510,49 +1056,13 @@ class Simulator:
                     else None
                 )
 
-                new_active_nodes = set()
-
-                for current_node in current_active_nodes:
-                    for neighbor in self.G.neighbors(current_node):
-                        if (
-                            self.G.nodes[neighbor]["alienated"] == True
-                            and team == "Red"
-                        ):
-                            continue
-                        if (
-                            neighbor in current_active_nodes
-                            or neighbor in new_active_nodes
-                        ):
-                            continue
-
-                        susceptibility = self.G.nodes[neighbor]["susceptibility"]
-                        influence_probability = (
-                            self.base_influence_prob
-                            * active_message.potency
-                            * susceptibility
-                        )
+                if self.diffusion_engine == "csr":
+                    new_active_nodes = self.spread_message_csr(active_message)
+                else:
+                    new_active_nodes = self.spread_message_loop(active_message)
 
-                        if self.G.nodes[neighbor]["alignment"] != team:
-                            influence_probability *= 0.8  # Reduce influence probability for nodes with opposite alignment
-
-                        if random.random() < influence_probability:
-                            old = self.G.nodes[neighbor]["alignment"]
-                            self.message_influence(neighbor, active_message)
-                            """ message_influence handles whether a
-                            green agent swaps alignments given exposure
-                            to the message """
-                            # self.G.nodes[neighbor]['alignment'] = team
-                            new_active_nodes.add(neighbor)
-                            if self.G.nodes[neighbor]["alignment"] != old:
-                                (
-                                    print(
-                                        f"Node {neighbor} influenced by node {current_node}, and changes to {self.G.nodes[neighbor]['alignment']} alignment from {old}."
-                                    )
-                                    if debugging
-                                    else None
-                                )
-
-                self.green_influence()
+                if not self.fuse_green_influence:
+                    self.green_influence()
                 # Update active nodes for the message
                 active_message.active_nodes = new_active_nodes
                 active_message.steps_remaining -= 1
@@ -564,6 +1074,8 @@ class Simulator:
                     if debugging
                     else None
                 )
+        if self.fuse_green_influence and new_active_messages:
+            self.green_influence()
         # Update active messages
         self.active_messages = new_active_messages
 
@@ -582,7 +1094,7 @@ class Simulator:
         self.history = [{"Red": 0, "Blue": 0, "Neutral": self.num_nodes}]
 
         # RECREATE NETWORK AND REINITIALIZE NODES
-        self.G = self.create_network()
+        self.set_network(self.create_network())
         self.initialize_node_attributes()
 
         self.current_messages = {"Red": None, "Blue": None}
@@ -593,9 +1105,20 @@ class Simulator:
         print("### SIMULATION INITIALIZED\n.\n.\n.")
         
 
-    def step_simulation(self):
+    def step_simulation(self, delta=False, since=None, fields=None):
         """
         Perform a single step of the simulation,
+
+        Parameters
+        ----------
+        delta : bool, optional
+            Return only the nodes changed since version ``since`` (see
+            get_graph_delta) instead of the full graph. The default is
+            False.
+        since : int, optional
+            Graph version held by the client.
+        fields : list, optional
+            Node attributes the client follows (see get_graph_delta).
         """
         print("\n### SIMULATION STEP ###") if debugging else None
         self.num_steps = self.num_turns * self.steps_per_turn
@@ -605,14 +1128,18 @@ class Simulator:
 
         if self.turns_completed < self.num_turns:
             if self.current_step % self.steps_per_turn == 0:
+                self.delta.mark_changed()
                 # Start a new turn
-                print(f"\n--- {self.current_team} Team's Turn ---")
+                print(f"\n--- {self.current_team} Team's Turn ---") if debugging else None
                 self.introduce_message(team=self.current_team)
                 for _ in range(self.steps_per_turn):
                     print(f"\nStep {self.current_step + 1}") if debugging else None
                     self.spread_active_messages()
                     self.update_stats()
-                    self.get_frame_data(self.current_step + 1)
+                    if self.frames is not None:
+                        self.frames.record(self.current_step + 1, self.state.alignment)
+                    if self.checkpoints is not None:
+                        self.checkpoints.record(self.current_step + 1, self.state)
                     self.current_step += 1
 
                 # Switch teams
@@ -623,7 +1150,7 @@ class Simulator:
 
                 self.turns_completed += 1
 
-                graph_data = self.get_graph_data()
+                graph_data = self.get_graph_delta(since, fields) if delta else self.get_graph_data()
                 return {
                     "status": "running",
                     "data": graph_data,
@@ -650,6 +1177,70 @@ class Simulator:
     
         return {"graph": self.get_graph_data(), "stats": self.get_stats(), "status": "started"}
 
+    def snapshot(self, file):
+        """
+        Save the game mid-run to a single .npz file: the network as CSR
+        arrays, the node state arrays, the active and current messages,
+        the random stream states, the history, metrics and blue energy.
+        Recorded frames and checkpoints are not saved.
+
+        Parameters
+        ----------
+        file : str or file
+            Path (".npz" is appended if missing) or binary file to write.
+        """
+        snapshots.snapshot(self, file)
+
+    @classmethod
+    def restore(cls, file, layout_cache=None, record_frames=False, record_history=False):
+        """
+        Load a game saved by snapshot. It continues exactly as the saved
+        game would have, without rebuilding the network or drawing new
+        node attributes.
+
+        Parameters
+        ----------
+        file : str or file
+            Path or binary file written by snapshot.
+        layout_cache : LayoutCache, optional
+            As for Simulator.
+        record_frames, record_history : bool, FrameStore or StateHistory, optional
+            As for Simulator, recording from the restored step on. The
+            defaults are False.
+
+        Returns
+        -------
+        Simulator
+            The restored game.
+
+        Raises
+        ------
+        ValueError
+            If the file was not written by snapshot.
+        """
+        return snapshots.restore(cls, file, layout_cache, record_frames, record_history)
+
+    def fork(self, record_frames=None, record_history=None):
+        """
+        Branch the game in memory, e.g. to play out a what-if. The fork
+        shares the network (CSR arrays, networkx adjacency and positions)
+        with this game, as a game never changes its network, and gets its
+        own copy of the node state, messages and random streams, so
+        playing either game leaves the other untouched.
+
+        Parameters
+        ----------
+        record_frames, record_history : bool, optional
+            Whether the fork records frames or checkpoints, from the fork
+            step on. The defaults are to record what this game records.
+
+        Returns
+        -------
+        Simulator
+            The fork.
+        """
+        return snapshots.fork(self, record_frames, record_history)
+
 
     def initialize_metrics(self):
         """
@@ -660,48 +1251,137 @@ class Simulator:
             "Blue": {"believers_gained": 0, "believers_lost": 0},
         }
         self.history = [{"Red": 0, "Blue": 0, "Neutral": self.num_nodes}]
-        self.frames = []  # Store graph data frame at each step
+        self.frames.clear() if self.frames is not None else None
 
 
-    def get_graph_data(self):
+    def get_graph_data(self, positions=False):
         """
         Serialize the graph data for the current state of the simulation
         to a JSON-serializable format. This data will be used to update
         the visualisation of the network on the client side.
 
+        Parameters
+        ----------
+        positions : bool, optional
+            Include "x" and "y" canvas coordinates for each node, so the
+            browser can skip its physics stabilisation. The default is
+            False.
+
         Returns
         -------
         dict
-            Dictionary containing the graph data.
-        """
-        nodes = [
-            {
-                "id": node,
-                "alignment": self.G.nodes[node]["alignment"],
-                "susceptibility": self.G.nodes[node]["susceptibility"],
-                "uncertainty": self.G.nodes[node]["uncertainty"],
-                "alienated": self.G.nodes[node]["alienated"],
-            }
-            for node in self.G.nodes
+            Dictionary containing the graph data. Its "version" is that
+            of the last commit (see get_graph_delta), or None if the game
+            has been played since without one, as the nodes cannot then
+            be matched to a version (a delta since None is a full
+            resync). Only deltas commit, as committing compares every
+            node.
+        """
+        nodes = self._node_data()
+        if positions:
+            # Spread nodes over a canvas that grows with the network
+            coordinates = np.round(self.positions * 40 * np.sqrt(self.num_nodes), 1)
+            for node, (x, y) in zip(nodes, coordinates.tolist()):
+                node["x"] = x
+                node["y"] = y
+        labels = self.csr.labels
+        sources, targets = self.csr.edges()
+        edges = [
+            {"from": labels[source], "to": labels[target]}
+            for source, target in zip(sources.tolist(), targets.tolist())
         ]
-        edges = [{"from": source, "to": target} for source, target in self.G.edges]
-        return {"nodes": nodes, "edges": edges}
+        version = None if self.delta.pending else self.delta.version
+        return {"nodes": nodes, "edges": edges, "version": version}
+
+    def get_graph_delta(self, since=None, fields=None):
+        """
+        Serialize only the nodes whose alignment, uncertainty,
+        susceptibility or alienated flag changed since a version of the
+        graph the client already holds. The topology never changes
+        during a game, so edges are only sent with a full resync.
+
+        Parameters
+        ----------
+        since : int, optional
+            The "version" of the last graph data or delta the client
+            applied. If it is missing, unknown, or from an earlier
+            network, another process or a restarted server, the full
+            graph is sent instead.
+        fields : list, optional
+            Node attributes the client follows. Only nodes where one of
+            them changed are sent, with only those attributes. Uncertainty
+            drifts on most nodes every turn, so a client that only shows
+            alignments should ask for ["alignment"]. The default is all
+            attributes.
 
+        Returns
+        -------
+        dict
+            Dictionary with the changed "nodes", the new "version", and
+            "full", which is True for a full resync (that also holds the
+            "edges").
+        """
+        fields = ATTRIBUTES if fields is None else tuple(fields)
+        if any(field not in ATTRIBUTES for field in fields):
+            raise ValueError(f"Invalid field. Must be one of {', '.join(ATTRIBUTES)}.")
+        version = self.delta.commit() if self.delta.pending else self.delta.version
+        changed = self.delta.changed_since(since, fields)
+        if changed is None:
+            return {**self.get_graph_data(), "full": True}
+        return {"nodes": self._node_data(changed, fields), "version": version, "full": False}
+
+    def _node_data(self, rows=None, fields=ATTRIBUTES, state=None):
+        """
+        Node dicts sent to the client, for the given node rows (default
+        all nodes) and attributes, of the current state or another.
+        """
+        state = self.state if state is None else state
+        labels = self.csr.labels
+        if rows is None:
+            rows = slice(None)
+            node_labels = labels
+        else:
+            node_labels = [labels[row] for row in rows.tolist()]
+        columns = {
+            "alignment": lambda: [ALIGNMENTS[code] for code in state.alignment[rows].tolist()],
+            "susceptibility": lambda: state.susceptibility[rows].tolist(),
+            "uncertainty": lambda: state.uncertainty[rows].tolist(),
+            "alienated": lambda: state.alienated_mask()[rows].tolist(),
+        }
+        values = [columns[field]() for field in fields]
+        return [
+            {"id": node, **dict(zip(fields, node_values))}
+            for node, *node_values in zip(node_labels, *values)
+        ]
+
+
+    def verify_counters(self):
+        """
+        Check the live population counters against a full scan of the
+        node state.
+
+        Raises
+        ------
+        AssertionError
+            If the counters have drifted from the node state.
+        """
+        counts, alienated = self.state.scan_counts()
+        if not np.array_equal(counts, self.state.counts) or alienated != self.state.num_alienated:
+            raise AssertionError(
+                f"Population counters out of sync: counted {counts.tolist()} "
+                f"(alienated {alienated}), tracked {self.state.counts.tolist()} "
+                f"(alienated {self.state.num_alienated})."
+            )
 
     def update_stats(self):
         """
         Update the metrics for the simulation, recording the number of believers
         gained and lost for each team. Prints the metrics to the console.
         """
-        red_believers = sum(
-            [1 for node in self.G.nodes if self.G.nodes[node]["alignment"] == "Red"]
-        )
-        blue_believers = sum(
-            [1 for node in self.G.nodes if self.G.nodes[node]["alignment"] == "Blue"]
-        )
-        alienated = sum(
-            [1 for node in self.G.nodes if self.G.nodes[node]["alienated"] == True]
-        )
+        self.verify_counters() if self.check_counters else None
+        red_believers = self.state.count("Red")
+        blue_believers = self.state.count("Blue")
+        alienated = self.state.count_alienated()
         neutral = self.num_nodes - red_believers - blue_believers
 
         last_entry = self.history[-1]
@@ -732,16 +1412,11 @@ class Simulator:
         dict
             Dictionary containing the current stats.
         """
-        red_believers = sum(
-            1 for node in self.G.nodes if self.G.nodes[node]["alignment"] == "Red"
-        )
-        blue_believers = sum(
-            1 for node in self.G.nodes if self.G.nodes[node]["alignment"] == "Blue"
-        )
+        self.verify_counters() if self.check_counters else None
+        red_believers = self.state.count("Red")
+        blue_believers = self.state.count("Blue")
         neutral = self.num_nodes - red_believers - blue_believers
-        alienated = sum(
-            [1 for node in self.G.nodes if self.G.nodes[node]["alienated"] == True]
-        )
+        alienated = self.state.count_alienated()
 
         red_percentage = (
             red_believers / self.num_nodes * 100 if self.num_nodes > 0 else 0
@@ -781,6 +1456,32 @@ class Simulator:
 
         return stats
 
+    def run_ensemble(self, messages, num_replicas=100, quantiles=(0.05, 0.5, 0.95), **kwargs):
+        """
+        Estimate the effect of a scripted message sequence by playing it
+        in many independent replicas of the current game at once (see
+        Ensemble). The simulator itself is not changed.
+
+        Parameters
+        ----------
+        messages : list
+            (team, potency) pairs, one per turn.
+        num_replicas : int, optional
+            Number of replicas. The default is 100.
+        quantiles : tuple, optional
+            Quantiles to report. The default is (0.05, 0.5, 0.95).
+        **kwargs
+            Passed on to Ensemble.
+
+        Returns
+        -------
+        dict
+            Per-step mean and quantile curves of the Red, Blue, Neutral
+            and Alienated counts (see Ensemble.summary).
+        """
+        ensemble = Ensemble(self, num_replicas=num_replicas, **kwargs)
+        return ensemble.play(messages, quantiles=quantiles)
+
     def plot_stats(self):
         """
         Plot the metrics of the simulation. (Believers over time)
@@ -805,34 +1506,127 @@ class Simulator:
         plt.show()
 
 
-    def get_frame_data(self, turn):
+    def record_frames(self, frames=True):
+        """
+        Start (or stop) recording the alignments at every step.
+
+        Parameters
+        ----------
+        frames : bool or FrameStore, optional
+            True records in a new FrameStore, a FrameStore records in it
+            (e.g. one that spills to disk for long games), False stops
+            recording and drops the frames. The default is True.
+
+        Returns
+        -------
+        FrameStore or None
+            The frames.
+        """
+        if self.frames is not None and frames is not self.frames:
+            self.frames.close()
+        self.frames = FrameStore() if frames is True else (None if frames is False else frames)
+        return self.frames
+
+    def record_history(self, history=True):
+        """
+        Start (or stop) keeping checkpoints of the full node state, from
+        the current step on.
+
+        Parameters
+        ----------
+        history : bool or StateHistory, optional
+            True records in a new StateHistory, a StateHistory records in
+            it, False stops recording and drops the history. The default
+            is True.
+
+        Returns
+        -------
+        StateHistory or None
+            The history.
+        """
+        if self.checkpoints is not None and history is not self.checkpoints:
+            self.checkpoints.close()
+        self.checkpoints = StateHistory() if history is True else (None if history is False else history)
+        if self.checkpoints is not None and hasattr(self, "state"):
+            self.checkpoints.clear()
+            self.checkpoints.record(self.current_step, self.state)
+        return self.checkpoints
+
+    def get_step_data(self, step, fields=None):
+        """
+        The node state at a past step of the game, rebuilt from the
+        nearest checkpoint (see StateHistory) in a time that does not
+        grow with the length of the game.
+
+        Parameters
+        ----------
+        step : int
+            The step, from the first recorded step to current_step.
+        fields : list, optional
+            Node attributes to include (see node_state.ATTRIBUTES). The
+            default is all of them.
+
+        Returns
+        -------
+        dict
+            The "step", its "nodes" and its "stats" (the population
+            counts).
+
+        Raises
+        ------
+        ValueError
+            If the step was not recorded, a field is invalid, or history
+            is not recorded.
+        """
+        if self.checkpoints is None:
+            raise ValueError("Invalid simulator. Must record history (record_history=True) to fetch past steps.")
+        fields = ATTRIBUTES if fields is None else tuple(fields)
+        if any(field not in ATTRIBUTES for field in fields):
+            raise ValueError(f"Invalid field. Must be one of {', '.join(ATTRIBUTES)}.")
+        steps = self.checkpoints.steps
+        if step not in self.checkpoints:
+            raise ValueError(f"Invalid step. Must be a recorded step from {steps[0] if steps else 0} to {self.current_step}.")
+        state = self.checkpoints.state_at(step)
+        return {
+            "step": step,
+            "nodes": self._node_data(fields=fields, state=state),
+            "stats": {
+                "Red": int(state.counts[RED]),
+                "Blue": int(state.counts[BLUE]),
+                "Neutral": int(state.counts[NEUTRAL]),
+                "Alienated": int(state.num_alienated),
+            },
+        }
+
+    def get_frame_data(self, turn, alignment=None):
         """
-        Collect data for visualisation on website UI, and for animation frames
-        for testing. Append the data to the frames list.
+        Collect data for visualisation on website UI, and for animation
+        frames for testing.
 
         Parameters
         ----------
         turn : int
             The turn number.
+        alignment : numpy.ndarray, optional
+            Alignment codes of the nodes, e.g. a recorded frame. The
+            default is the current alignments.
 
         Returns
         -------
         frame : dict
             Dictionary containing data for the current turn.
         """
-        color_map = {"Red": "red", "Blue": "blue", "Neutral": "grey"}
-        node_colors = [
-            color_map[self.G.nodes[node]["alignment"]] for node in self.G.nodes
-        ]
-        frame = {"turn": turn, "node_colors": node_colors}
-        self.frames.append(frame)
-
-        return frame
+        alignment = self.state.alignment if alignment is None else alignment
+        color_map = np.array(["grey", "red", "blue"])  # Indexed by alignment code
+        node_colors = color_map[alignment].tolist()
+        return {"turn": turn, "node_colors": node_colors}
 
     def animate_frames(self):
         """
         Animate the frames of the simulation.
         """
+        if self.frames is None:
+            raise ValueError("Invalid frames. Must record frames (record_frames=True) to animate them.")
         fig, ax = plt.subplots(figsize=(15, 15))
         ax.set_title("Information Diffusion Simulation")
         ax.axis("off")
@@ -853,7 +1647,10 @@ class Simulator:
         anim = FuncAnimation(
             fig,
             update,
-            frames=self.frames,
+            frames=[
+                self.get_frame_data(step, alignment)
+                for step, alignment in zip(self.frames.steps, self.frames)
+            ],
             interval=1000 * self.autoplay_delay,
             repeat=True,
         )
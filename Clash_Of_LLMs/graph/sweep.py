@@ -0,0 +1,301 @@
+import glob
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.message import Message
+from Clash_Of_LLMs.graph.runner import play_game
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+# Final stats recorded for every run
+RESULT_COLUMNS = ("Red", "Blue", "Neutral", "Alienated", "BlueEnergy")
+MANIFEST = "sweep.json"
+
+
+def grid_design(space):
+    """
+    Full factorial design.
+
+    Parameters
+    ----------
+    space : dict
+        Simulator parameter name to a list of values.
+
+    Returns
+    -------
+    list
+        One dict of parameters per point.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def _scale(value, u):
+    """
+    Map uniform draws in [0, 1) onto a parameter: a (low, high) tuple is
+    a range (integers if both ends are), a list is a set of choices.
+    """
+    if isinstance(value, tuple):
+        low, high = value
+        if isinstance(low, int) and isinstance(high, int):
+            return (low + np.floor(u * (high - low + 1))).astype(int).tolist()
+        return (low + u * (high - low)).tolist()
+    return [value[i] for i in np.floor(u * len(value)).astype(int).tolist()]
+
+
+def random_design(space, num_points, random_seed=None):
+    """
+    Design with independent uniform draws for every parameter.
+
+    Parameters
+    ----------
+    space : dict
+        Simulator parameter name to a (low, high) tuple or a list of
+        choices.
+    num_points : int
+        Number of points.
+    random_seed : int, optional
+        Seed for the draws.
+
+    Returns
+    -------
+    list
+        One dict of parameters per point.
+    """
+    rng = np.random.default_rng(random_seed)
+    columns = {name: _scale(value, rng.random(num_points)) for name, value in space.items()}
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def latin_hypercube_design(space, num_points, random_seed=None):
+    """
+    Latin hypercube design: the range of every parameter is split into
+    num_points equal strata and each stratum is sampled exactly once.
+
+    Parameters
+    ----------
+    space : dict
+        Simulator parameter name to a (low, high) tuple or a list of
+        choices.
+    num_points : int
+        Number of points.
+    random_seed : int, optional
+        Seed for the draws.
+
+    Returns
+    -------
+    list
+        One dict of parameters per point.
+    """
+    rng = np.random.default_rng(random_seed)
+    columns = {}
+    for name, value in space.items():
+        u = (rng.permutation(num_points) + rng.random(num_points)) / num_points
+        columns[name] = _scale(value, u)
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def _script(messages):
+    """
+    Scripted messages as JSON-friendly dicts.
+    """
+    script = []
+    for item in messages:
+        if isinstance(item, Message):
+            item = {"team": item.team, "potency": item.potency, "content": item.content}
+        elif not isinstance(item, dict):
+            item = dict(zip(("team", "potency", "content"), item))
+        script.append({"content": "", **item})
+    return script
+
+
+def _run_chunk(tasks, messages, simulator_kwargs, random_seed):
+    """
+    Play every run of a chunk (in a worker process) and return the
+    results as columns.
+    """
+    simulator_module.debugging = False
+    rows = []
+    for task_id, point, replicate, params in tasks:
+        seed = np.random.SeedSequence(random_seed, spawn_key=(task_id,))
+        simulator = Simulator(random_seed=seed, **{**simulator_kwargs, **params})
+        turns = play_game(simulator, messages)
+        final = turns[-1] if turns else simulator.get_stats()
+        rows.append({
+            "task_id": task_id,
+            "point": point,
+            "replicate": replicate,
+            **params,
+            "Turns": simulator.turns_completed,
+            "Steps": simulator.current_step,
+            **{column: final[column] for column in RESULT_COLUMNS},
+        })
+    return {name: np.array([row[name] for row in rows]) for name in rows[0]}
+
+
+def _write_chunk(path, index, columns):
+    """
+    Write a chunk of results atomically, so a crash never leaves a
+    partial chunk behind.
+    """
+    filename = os.path.join(path, f"chunk-{index:06d}.npz")
+    with open(filename + ".tmp", "wb") as f:
+        np.savez(f, **columns)
+    os.replace(filename + ".tmp", filename)
+
+
+def load_sweep(path):
+    """
+    Load the results of a sweep, complete or not.
+
+    Parameters
+    ----------
+    path : str
+        Sweep directory.
+
+    Returns
+    -------
+    dict
+        Column name to an array with one entry per finished run, ordered
+        by task_id.
+    """
+    chunks = []
+    for filename in sorted(glob.glob(os.path.join(path, "chunk-*.npz"))):
+        with np.load(filename, allow_pickle=False) as chunk:
+            chunks.append({name: chunk[name] for name in chunk.files})
+    if not chunks:
+        return {}
+    columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+    order = np.argsort(columns["task_id"], kind="stable")
+    return {name: column[order] for name, column in columns.items()}
+
+
+def run_sweep(
+    design,
+    messages,
+    path,
+    replicates=1,
+    random_seed=0,
+    max_workers=None,
+    chunk_size=None,
+    **simulator_kwargs
+):
+    """
+    Play a scripted game for every point of a design across a pool of
+    worker processes. Runs are grouped into chunks, and the results of
+    each chunk are written to the sweep directory as a columnar .npz
+    file as soon as it finishes. Calling run_sweep again with the same
+    arguments resumes an interrupted sweep, skipping finished runs.
+
+    Every run is seeded from (random_seed, task_id) alone, so results do
+    not depend on the number of workers, the chunking or resuming.
+
+    Parameters
+    ----------
+    design : list
+        One dict of Simulator parameters per point (see grid_design,
+        random_design and latin_hypercube_design). The values of each
+        parameter must be all numbers or all strings.
+    messages : list
+        Scripted messages played in every run (see runner.to_message).
+    path : str
+        Sweep directory.
+    replicates : int, optional
+        Number of runs per point. The default is 1.
+    random_seed : int, optional
+        Root seed of the sweep. The default is 0.
+    max_workers : int, optional
+        Number of worker processes. The default is the number of CPUs.
+    chunk_size : int, optional
+        Runs per chunk. The default gives each worker about four chunks.
+    **simulator_kwargs
+        Simulator parameters shared by every point.
+
+    Returns
+    -------
+    dict
+        All results of the sweep (see load_sweep).
+
+    Raises
+    ------
+    ValueError
+        If the points set different parameters, a parameter's values
+        are not all numbers or all strings, or the sweep directory holds
+        a different sweep.
+    Exception
+        The first error of a chunk that failed, raised once every other
+        chunk has finished and been written.
+    """
+    design = [dict(point) for point in design]
+    if any(point.keys() != design[0].keys() for point in design[1:]):
+        raise ValueError("Invalid design. Every point must set the same parameters.")
+    for name in design[0] if design else []:
+        # Results are saved as plain arrays, which load_sweep reads
+        # without unpickling: each parameter is one column of numbers
+        # or one of strings
+        values = [point[name] for point in design]
+        if not (all(isinstance(value, (int, float, np.number, np.bool_)) for value in values)
+                or all(isinstance(value, str) for value in values)):
+            raise ValueError(f"Invalid design. Parameter {name} must be all numbers or all strings.")
+    os.makedirs(path, exist_ok=True)
+
+    # Refuse to mix the results of different sweeps in one directory
+    manifest = {
+        "design": design,
+        "messages": _script(messages),
+        "replicates": replicates,
+        "random_seed": random_seed,
+        "simulator_kwargs": simulator_kwargs,
+    }
+    manifest = json.loads(json.dumps(manifest))
+    manifest_path = os.path.join(path, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) != manifest:
+                raise ValueError(f"Sweep directory {path} holds a different sweep.")
+    else:
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    done = set(load_sweep(path).get("task_id", np.empty(0, dtype=int)).tolist())
+    tasks = [
+        (point * replicates + replicate, point, replicate, params)
+        for point, params in enumerate(design)
+        for replicate in range(replicates)
+        if point * replicates + replicate not in done
+    ]
+    if tasks:
+        max_workers = max_workers or os.cpu_count() or 1
+        chunk_size = chunk_size or -(-len(tasks) // (4 * max_workers))
+        # Number new chunks after the existing ones
+        existing = glob.glob(os.path.join(path, "chunk-*.npz"))
+        first = max((int(os.path.basename(f)[6:12]) for f in existing), default=-1) + 1
+        chunks = [tasks[i : i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _run_chunk, chunk, manifest["messages"], simulator_kwargs, random_seed
+                )
+                for chunk in chunks
+            ]
+            # Keep every chunk that finishes, even after another fails,
+            # so resuming only replays the failed runs
+            failures = []
+            index = first
+            for future in as_completed(futures):
+                try:
+                    columns = future.result()
+                except Exception as e:
+                    failures.append(e)
+                    continue
+                _write_chunk(path, index, columns)
+                index += 1
+        if failures:
+            raise failures[0]
+
+    return load_sweep(path)
@@ -0,0 +1,122 @@
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.csr import CSRGraph
+from Clash_Of_LLMs.graph.message import Message
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+class TestCSRGraph(unittest.TestCase):
+    def test_matches_networkx_adjacency(self):
+        """
+        Rows and neighbour lists follow the networkx iteration order.
+        """
+        G = nx.watts_strogatz_graph(40, 4, 0.3, seed=1)
+        csr = CSRGraph.from_networkx(G)
+        self.assertEqual(csr.num_nodes, G.number_of_nodes())
+        self.assertEqual(csr.num_edges, G.number_of_edges())
+        for node in G.nodes:
+            self.assertEqual(list(csr.neighbors(node)), list(G.neighbors(node)))
+
+    def test_relabelled_nodes(self):
+        """
+        Non-integer labels are mapped to row indices.
+        """
+        G = nx.relabel_nodes(nx.path_graph(4), {0: "a", 1: "b", 2: "c", 3: "d"})
+        csr = CSRGraph.from_networkx(G)
+        self.assertEqual(list(csr.rows(["c", "a"])), [2, 0])
+        self.assertEqual(list(csr.neighbors(1)), [0, 2])
+
+    def test_gather(self):
+        """
+        Gathering a frontier returns one pair per outgoing edge.
+        """
+        G = nx.star_graph(5)
+        csr = CSRGraph.from_networkx(G)
+        sources, targets = csr.gather(np.array([0, 3]))
+        self.assertEqual(list(sources), [0] * 5 + [3])
+        self.assertEqual(list(targets), [1, 2, 3, 4, 5, 0])
+
+
+class TestCSRDiffusion(unittest.TestCase):
+    trials = 3000
+
+    def setUp(self):
+        self.simulator = Simulator(num_nodes=30, network_type="erdos_renyi",
+                                   edge_probability=0.15, base_influence_prob=0.9)
+        self.message = Message(team="Blue", potency=0.9, content="",
+                               active_nodes={0, 1, 2}, steps_remaining=2)
+        self.initial = {node: dict(data) for node, data in self.simulator.G.nodes(data=True)}
+
+    def expected_probabilities(self):
+        """
+        Probability that each node is influenced in one step: one trial
+        per active neighbour, so 1 - (1 - p) ** k.
+        """
+        G = self.simulator.G
+        expected = np.zeros(G.number_of_nodes())
+        for node in G.nodes:
+            if node in self.message.active_nodes:
+                continue
+            k = sum(1 for n in G.neighbors(node) if n in self.message.active_nodes)
+            p = self.simulator.base_influence_prob * self.message.potency \
+                * self.initial[node]["susceptibility"]
+            if self.initial[node]["alignment"] != self.message.team:
+                p *= 0.8
+            expected[node] = 1 - (1 - p) ** k
+        return expected
+
+    def influence_frequencies(self, spread):
+        counts = np.zeros(self.simulator.G.number_of_nodes())
+        for _ in range(self.trials):
+            for node, data in self.initial.items():
+                self.simulator.G.nodes[node].update(data)
+            for node in spread(self.message):
+                counts[node] += 1
+        return counts / self.trials
+
+    def test_engines_match_expected_probabilities(self):
+        """
+        Both engines influence each node with the same probability.
+        """
+        expected = self.expected_probabilities()
+        self.assertGreater(expected.max(), 0.2)
+        loop = self.influence_frequencies(self.simulator.spread_message_loop)
+        csr = self.influence_frequencies(self.simulator.spread_message_csr)
+        tolerance = 4 * np.sqrt(0.25 / self.trials)
+        np.testing.assert_allclose(loop, expected, atol=tolerance)
+        np.testing.assert_allclose(csr, expected, atol=tolerance)
+
+    def test_csr_engine_is_reproducible(self):
+        """
+        A fixed seed gives the same game with the CSR engine.
+        """
+        results = []
+        for _ in range(2):
+            simulator = Simulator(num_nodes=60, diffusion_engine="csr")
+            for team in ["Red", "Blue", "Red"]:
+                simulator.set_message(team, Message(team=team, potency=0.0,
+                                                    content="Potency = 0.7",
+                                                    active_nodes=[], steps_remaining=0))
+                simulator.step_simulation()
+            results.append([data["alignment"] for _, data in simulator.G.nodes(data=True)])
+        self.assertEqual(results[0], results[1])
+
+    def test_invalid_engine(self):
+        with self.assertRaises(ValueError):
+            Simulator(num_nodes=10, diffusion_engine="gpu")
+
+
+if __name__ == "__main__":
+    unittest.main()
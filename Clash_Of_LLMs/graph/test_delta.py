@@ -0,0 +1,149 @@
+import io
+import os
+import subprocess
+import sys
+import unittest
+from contextlib import redirect_stdout
+
+from Clash_Of_LLMs import app, routes
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.delta import DeltaTracker
+from Clash_Of_LLMs.graph.node_state import NodeState
+from Clash_Of_LLMs.graph.runner import to_message
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+class TestDeltaTracker(unittest.TestCase):
+    def test_changed_since(self):
+        state = NodeState(20)
+        tracker = DeltaTracker(state)
+        start = tracker.version
+        self.assertEqual(list(tracker.changed_since(start)), [])
+
+        state.set_alignment(3, "Red")
+        state.set_uncertainty(5, 0.25)
+        first = tracker.commit()
+        state.set_alienated(17)
+        second = tracker.commit()
+        self.assertEqual(list(tracker.changed_since(start)), [3, 5, 17])
+        self.assertEqual(list(tracker.changed_since(first)), [17])
+        self.assertEqual(list(tracker.changed_since(second)), [])
+        self.assertEqual(list(tracker.changed_since(start, ["alignment"])), [3])
+
+        # Unknown versions need a full resync
+        self.assertIsNone(tracker.changed_since(None))
+        self.assertIsNone(tracker.changed_since(start - 1))
+        self.assertIsNone(tracker.changed_since(second + 1))
+        self.assertIsNone(DeltaTracker(state).changed_since(second))
+
+
+class TestGraphDelta(unittest.TestCase):
+    def apply(self, nodes, data):
+        for node in data["nodes"]:
+            nodes.setdefault(node["id"], {}).update(node)
+
+    def test_delta_matches_full_graph(self):
+        simulator = Simulator(num_nodes=200, edge_probability=0.03)
+        full = simulator.get_graph_data()
+        nodes = {node["id"]: node for node in full["nodes"]}
+        version = full["version"]
+        for item in [("Red", 0.7), ("Blue", 0.5), ("Red", 0.9)]:
+            simulator.set_message(*to_message(item))
+            data = simulator.step_simulation(delta=True, since=version)["data"]
+            self.assertFalse(data["full"])
+            self.assertNotIn("edges", data)
+            self.apply(nodes, data)
+            version = data["version"]
+        self.assertEqual(list(nodes.values()), simulator.get_graph_data()["nodes"])
+
+    def test_fields(self):
+        simulator = Simulator(num_nodes=100)
+        version = simulator.get_graph_data()["version"]
+        simulator.set_message(*to_message(("Red", 0.8)))
+        data = simulator.step_simulation(delta=True, since=version, fields=["alignment"])["data"]
+        self.assertTrue(all(set(node) == {"id", "alignment"} for node in data["nodes"]))
+        self.assertTrue(all(node["alignment"] == "Red" for node in data["nodes"]))
+        self.assertEqual(len(data["nodes"]), simulator.state.count("Red"))
+        with self.assertRaises(ValueError):
+            simulator.get_graph_delta(version, ["colour"])
+
+    def test_full_resync(self):
+        simulator = Simulator(num_nodes=50)
+        version = simulator.get_graph_data()["version"]
+        simulator.restart_simulation()
+        data = simulator.get_graph_delta(version)
+        self.assertTrue(data["full"])
+        self.assertEqual(len(data["nodes"]), 50)
+        self.assertEqual(len(data["edges"]), simulator.csr.num_edges)
+        self.assertTrue(simulator.get_graph_delta(None)["full"])
+
+    def test_full_graph_does_not_commit(self):
+        simulator = Simulator(num_nodes=50)
+        version = simulator.get_graph_data()["version"]
+        self.assertEqual(simulator.get_graph_data()["version"], version)
+        self.assertEqual(simulator.delta.version, version)
+
+        # A game played without deltas has no version until one commits
+        simulator.set_message(*to_message(("Red", 0.8)))
+        full = simulator.step_simulation()["data"]
+        self.assertIsNone(full["version"])
+        self.assertTrue(simulator.get_graph_delta(full["version"])["full"])
+        data = simulator.get_graph_delta(version)
+        self.assertFalse(data["full"])
+        self.assertEqual(len(data["nodes"]), simulator.state.count("Red"))
+        self.assertEqual(simulator.get_graph_data()["version"], data["version"])
+
+    def test_changes_outside_steps(self):
+        simulator = Simulator(num_nodes=50)
+        version = simulator.get_graph_data()["version"]
+        self.assertIsNotNone(version)
+        # Through the networkx view, and through the state's setters
+        simulator.G.nodes[0]["alignment"] = "Red"
+        self.assertIsNone(simulator.get_graph_data()["version"])
+        data = simulator.get_graph_delta(version)
+        self.assertEqual(data["nodes"], [{"id": 0, **simulator.G.nodes[0]}])
+        simulator.state.set_alienated(7)
+        simulator.state.set_susceptibility(9, 0.125)
+        self.assertEqual([node["id"] for node in simulator.get_graph_delta(data["version"])["nodes"]], [7, 9])
+
+    def test_versions_of_other_processes(self):
+        code = (
+            "from Clash_Of_LLMs.graph import simulator\n"
+            "simulator.debugging = False\n"
+            "print(simulator.Simulator(num_nodes=20).get_graph_data()['version'])\n"
+        )
+        environ = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+        result = subprocess.run([sys.executable, "-c", code], env=environ, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        version = int(result.stdout.split()[-1])
+        simulator = Simulator(num_nodes=20)
+        self.assertLess(simulator.delta.version, 2**53)
+        self.assertTrue(simulator.get_graph_delta(version)["full"])
+
+
+class TestGetUpdateDelta(unittest.TestCase):
+    def test_get_update_since(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-get-update-delta")
+        game.set_simulator(Simulator(num_nodes=30, edge_probability=0.2))
+        headers = {"X-Game-Id": game.game_id}
+        version = client.get("/initial_graph", headers=headers).get_json()["graph"]["version"]
+        client.post("/submit_user_message", json={"message": "Potency = 0.6", "team": "red"}, headers=headers)
+        with redirect_stdout(io.StringIO()):
+            update = client.get(f"/get_update?since={version}&fields=alignment", headers=headers).get_json()
+            self.assertEqual(client.get("/get_update?fields=colour", headers=headers).status_code, 400)
+        self.assertFalse(update["data"]["full"])
+        self.assertGreater(update["data"]["version"], version)
+        self.assertTrue(all(node["alignment"] == "Red" for node in update["data"]["nodes"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.ensemble import METRICS, Ensemble
+from Clash_Of_LLMs.graph.node_state import ALIGNMENT_CODES, BLUE, RED
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+MESSAGES = [("Red", 0.8), ("Blue", 0.5), ("Red", 1.0), ("Blue", 0.9)]
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+class TestEnsemble(unittest.TestCase):
+    def test_spread_matches_expected_probabilities(self):
+        """
+        One diffusion step influences each node with probability
+        1 - (1 - p) ** k in every replica.
+        """
+        simulator = Simulator(num_nodes=30, network_type="erdos_renyi",
+                              edge_probability=0.15, base_influence_prob=0.9)
+        ensemble = Ensemble(simulator, num_replicas=3000, random_seed=1)
+        active = np.zeros((3000, 30), dtype=bool)
+        active[:, [0, 1, 2]] = True
+        influenced = ensemble.spread("Blue", 0.9, active)
+
+        state = simulator.state
+        expected = np.zeros(30)
+        for node in range(3, 30):
+            k = np.isin(simulator.csr.neighbors(node), [0, 1, 2]).sum()
+            p = 0.9 * 0.9 * state.susceptibility[node] * 0.8
+            expected[node] = 1 - (1 - p) ** k
+        self.assertGreater(expected.max(), 0.2)
+        np.testing.assert_allclose(influenced.mean(axis=0), expected,
+                                   atol=4 * np.sqrt(0.25 / 3000))
+
+    def test_sweep_matches_serial_rule(self):
+        """
+        On a single edge, the synchronous sweep is exact whenever the
+        serial sweep influences only one of the two nodes.
+        """
+        simulator = Simulator(num_nodes=2, network_type="erdos_renyi", edge_probability=1.0)
+        ensemble = Ensemble(simulator, num_replicas=500, random_seed=2)
+        rng = np.random.default_rng(3)
+        ensemble.alignment[:] = rng.integers(0, 3, (500, 2))
+        ensemble.uncertainty[:] = rng.uniform(-1.0, 1.0, (500, 2))
+        start = (ensemble.alignment.copy(), ensemble.uncertainty.copy())
+        ensemble.green_influence()
+
+        compared = 0
+        for replica in range(500):
+            simulator.state.alignment[:] = start[0][replica]
+            simulator.state.uncertainty[:] = start[1][replica]
+            simulator.green_influence(mode="full")
+            if np.all(simulator.state.uncertainty != start[1][replica]):
+                continue
+            compared += 1
+            np.testing.assert_array_equal(ensemble.alignment[replica], simulator.state.alignment)
+            np.testing.assert_array_equal(ensemble.uncertainty[replica], simulator.state.uncertainty)
+        self.assertGreater(compared, 400)
+
+    def test_sweep_visits_neighbours_in_csr_order(self):
+        simulator = Simulator(num_nodes=60, network_type="watts_strogatz")
+        csr = simulator.csr
+        # Rewired edges leave neighbour lists out of index order
+        self.assertTrue(any(np.any(np.diff(csr.neighbors(node)) < 0) for node in range(60)))
+        ensemble = Ensemble(simulator, num_replicas=2, random_seed=1)
+        for rank, (inferiors, superiors) in enumerate(ensemble._sweep_rounds):
+            for inferior, superior in zip(inferiors.tolist(), superiors.tolist()):
+                self.assertEqual(csr.neighbors(inferior)[rank], superior)
+
+    def test_play(self):
+        """
+        Playing a game gives per-step curves for every metric and leaves
+        the simulator untouched.
+        """
+        simulator = Simulator(num_nodes=200, use_random_start_alignments=True)
+        before = simulator.state.alignment.copy()
+        summary = simulator.run_ensemble(MESSAGES, num_replicas=64, random_seed=4)
+        np.testing.assert_array_equal(simulator.state.alignment, before)
+
+        steps = len(MESSAGES) * simulator.steps_per_turn + 1
+        self.assertEqual(set(summary), set(METRICS))
+        for curves in summary.values():
+            self.assertEqual(set(curves), {"mean", 0.05, 0.5, 0.95})
+            for curve in curves.values():
+                self.assertEqual(curve.shape, (steps,))
+            self.assertTrue(np.all(curves[0.05] <= curves[0.95]))
+        total = summary["Red"]["mean"] + summary["Blue"]["mean"] + summary["Neutral"]["mean"]
+        np.testing.assert_allclose(total, 200)
+        self.assertEqual(summary["Red"]["mean"][0], np.count_nonzero(before == RED))
+
+        again = simulator.run_ensemble(MESSAGES, num_replicas=64, random_seed=4)
+        np.testing.assert_array_equal(again["Blue"]["mean"], summary["Blue"]["mean"])
+
+    def test_replicas_are_independent(self):
+        simulator = Simulator(num_nodes=100)
+        ensemble = Ensemble(simulator, num_replicas=50, random_seed=5, resample_attributes=True)
+        self.assertEqual(len({row.tobytes() for row in ensemble.susceptibility}), 50)
+        ensemble.play_turn("Blue", 0.7)
+        self.assertGreater(len(set(ensemble.history["Blue"][-1].tolist())), 1)
+        self.assertTrue(np.all(ensemble.alignment[ensemble.alignment != BLUE]
+                               == ALIGNMENT_CODES["Neutral"]))
+
+    def test_invalid_arguments(self):
+        simulator = Simulator(num_nodes=20)
+        with self.assertRaises(ValueError):
+            Ensemble(simulator, num_replicas=0)
+        with self.assertRaises(ValueError):
+            Ensemble(simulator, num_replicas=2).play_turn("Green", 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
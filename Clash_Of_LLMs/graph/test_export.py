@@ -0,0 +1,155 @@
+import io
+import json
+import threading
+import unittest
+
+import numpy as np
+
+from Clash_Of_LLMs import app, export, routes
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.node_state import ALIGNMENTS
+from Clash_Of_LLMs.graph.runner import to_message
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def played(turns, **options):
+    """
+    A game with a few turns played, and the stats of each turn.
+    """
+    simulator = Simulator(num_nodes=40, **options)
+    stats_table = []
+    for turn in range(turns):
+        simulator.set_message(*to_message((["Red", "Blue"][turn % 2], [0.9, 0.4, 0.7][turn % 3])))
+        simulator.step_simulation()
+        stats_table.append(simulator.get_stats())
+    return simulator, stats_table
+
+
+def concatenated_csv(stats_table):
+    """
+    The CSV download as it was built before it was streamed.
+    """
+    csv_content = "sep=|\nTurn|Team|Message|Potency|Red Alignment|Blue Alignment|Neutral Alignment|Red Influence|Blue Energy\n"
+    turn_counter = 2
+    total_pop = stats_table[0]["Red"] + stats_table[0]["Blue"] + stats_table[0]["Neutral"]
+    for entry in stats_table:
+        csv_content += f"{turn_counter//2}|{entry['CurrentTeam']}|{entry['CurrentMessageContent']}|{entry['CurrentPotency']}|{entry['Red']}/{total_pop} ({entry['RedPercentage']}%)|{entry['Blue']}/{total_pop} ({entry['BluePercentage']}%)|{entry['Neutral']}/{total_pop} ({entry['NeutralPercentage']}%)|{total_pop - entry['Alienated']}/{total_pop} ({100 - entry['AlienatedPercentage']}%)|{entry['BlueEnergy']}\n"
+        turn_counter += 1
+    return csv_content
+
+
+class TestStatsExport(unittest.TestCase):
+    def test_csv_format_unchanged(self):
+        _, stats_table = played(5)
+        self.assertEqual("".join(export.stats_csv(stats_table)), concatenated_csv(stats_table))
+
+    def test_ndjson(self):
+        _, stats_table = played(3)
+        columns, batches = export.stats_batches(stats_table)
+        rows = [json.loads(line) for line in "".join(export.write(columns, batches, "ndjson")).splitlines()]
+        self.assertEqual([row["turn"] for row in rows], [1, 1, 2])
+        self.assertEqual(rows[1]["team"], "Blue")
+        self.assertIsInstance(rows[0]["red"], int)
+        self.assertEqual(rows[2]["potency"], 0.7)
+        self.assertEqual(list(rows[0]), [name for name, _ in columns])
+
+        with self.assertRaises(ValueError):
+            export.write(columns, batches, "xlsx")
+
+    def test_routes(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-export")
+        headers = {"X-Game-Id": game.game_id}
+        self.assertEqual(client.get("/download_csv", headers=headers).get_data(as_text=True), "Nothing to download")
+        _, game.stats_table[:] = played(2)
+        response = client.get("/download_csv", headers=headers)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.get_data(as_text=True), concatenated_csv(game.stats_table))
+        response = client.get("/export?format=ndjson", headers=headers)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 2)
+        for query in ["format=xlsx", "table=nodes", "table=trajectories&fields=colour"]:
+            self.assertEqual(client.get(f"/export?{query}", headers=headers).status_code, 400)
+        routes.sessions.remove(game.game_id)
+
+
+class TestTrajectoryExport(unittest.TestCase):
+    def test_trajectories(self):
+        simulator, _ = played(3, record_history=True)
+        history = simulator.checkpoints
+        columns, batches = export.trajectory_batches(history, simulator.csr.labels, ["alignment", "alienated"])
+        self.assertEqual([name for name, _ in columns], ["step", "node", "alignment", "alienated"])
+        batches = list(batches)
+        self.assertEqual(len(batches), 7)
+        for batch, step in zip(batches, history.steps):
+            state = history.state_at(step)
+            self.assertEqual(batch["alignment"].tolist(), [ALIGNMENTS[code] for code in state.alignment])
+            np.testing.assert_array_equal(batch["alienated"], state.alienated_mask())
+            self.assertEqual(batch["step"][0], step)
+
+        lines = "".join(export.write(*export.trajectory_batches(history, simulator.csr.labels), "csv")).splitlines()
+        self.assertEqual(lines[0], "step,node,alignment,susceptibility,uncertainty,alienated")
+        self.assertEqual(len(lines), 1 + 7 * 40)
+        with self.assertRaises(ValueError):
+            export.trajectory_batches(history, simulator.csr.labels, ["colour"])
+
+    def test_restart_ends_export(self):
+        simulator, _ = played(3, record_history=True)
+        lock = threading.RLock()
+        _, batches = export.trajectory_batches(simulator.checkpoints, simulator.csr.labels, lock=lock)
+        next(batches)
+        simulator.restart_simulation()
+        self.assertEqual(list(batches), [])
+
+    def test_route(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-export-trajectories")
+        headers = {"X-Game-Id": game.game_id}
+        client.post("/submit_user_message", json={"message": "Potency = 0.8", "team": "red"}, headers=headers)
+        client.get("/get_update", headers=headers)
+        response = client.get("/export?table=trajectories&format=ndjson&fields=alignment", headers=headers)
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        num_nodes = game.simulator.num_nodes
+        self.assertEqual(len(rows), 3 * num_nodes)
+        self.assertEqual(rows[-1], {"step": 2, "node": num_nodes - 1, "alignment": rows[-1]["alignment"]})
+        routes.sessions.remove(game.game_id)
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class TestArrowExport(unittest.TestCase):
+    def test_parquet_and_arrow(self):
+        import pyarrow.parquet as pq
+
+        simulator, stats_table = played(4, record_history=True)
+        for format in ["parquet", "arrow"]:
+            columns, batches = export.trajectory_batches(simulator.checkpoints, simulator.csr.labels)
+            data = b"".join(export.write(columns, batches, format))
+            if format == "parquet":
+                table = pq.read_table(io.BytesIO(data))
+            else:
+                table = pyarrow.ipc.open_stream(data).read_all()
+            self.assertEqual(table.num_rows, 9 * 40)
+            self.assertEqual(str(table.schema.field("uncertainty").type), "double")
+            self.assertEqual(str(table.schema.field("alienated").type), "bool")
+            final = table.slice(8 * 40).to_pydict()
+            np.testing.assert_array_equal(final["uncertainty"], simulator.state.uncertainty)
+
+        table = pq.read_table(io.BytesIO(b"".join(export.write(*export.stats_batches(stats_table), "parquet"))))
+        self.assertEqual(table.column("red").to_pylist(), [entry["Red"] for entry in stats_table])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from Clash_Of_LLMs import app, routes
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.frames import FrameStore, StateHistory
+from Clash_Of_LLMs.graph.node_state import ATTRIBUTES
+from Clash_Of_LLMs.graph.runner import to_message
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def random_walk(num_frames, num_nodes, seed=0):
+    """
+    Alignments that change on a few nodes per frame.
+    """
+    rng = np.random.default_rng(seed)
+    alignment = np.zeros(num_nodes, dtype=np.int8)
+    frames = []
+    for _ in range(num_frames):
+        changed = rng.choice(num_nodes, size=5, replace=False)
+        alignment[changed] = rng.integers(0, 3, size=5)
+        frames.append(alignment.copy())
+    return frames
+
+
+class TestFrameStore(unittest.TestCase):
+    def test_random_access(self):
+        frames = random_walk(100, 500)
+        store = FrameStore(keyframe_interval=10)
+        for step, alignment in enumerate(frames, start=1):
+            store.record(step, alignment)
+        self.assertEqual(len(store), 100)
+        for index in [0, 9, 10, 55, 99, -1]:
+            np.testing.assert_array_equal(store[index], frames[index])
+        np.testing.assert_array_equal(store.frame(42), frames[41])
+        self.assertEqual(len(list(store)), 100)
+        for recorded, alignment in zip(store, frames):
+            np.testing.assert_array_equal(recorded, alignment)
+        # Keyframes and deltas take far less than a full copy per step
+        self.assertLess(store.nbytes, 100 * 500 / 3)
+        with self.assertRaises(KeyError):
+            store.frame(101)
+        with self.assertRaises(IndexError):
+            store[100]
+
+    def test_spill(self):
+        frames = random_walk(80, 300, seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            store = FrameStore(keyframe_interval=16, max_memory=500, spill_dir=directory)
+            for step, alignment in enumerate(frames):
+                store.record(step, alignment)
+                if step == 20:
+                    self.assertTrue(store.spilled)
+                    np.testing.assert_array_equal(store.frame(3), frames[3])
+            self.assertLess(store.nbytes, 500)
+            for step in [0, 15, 16, 47, 79]:
+                np.testing.assert_array_equal(store.frame(step), frames[step])
+            store.clear()
+            store.record(0, frames[5])
+            np.testing.assert_array_equal(store[0], frames[5])
+            store.close()
+
+
+class TestSimulatorFrames(unittest.TestCase):
+    def play(self, simulator):
+        for item in [("Red", 0.9), ("Blue", 0.5), ("Red", 0.7)]:
+            simulator.set_message(*to_message(item))
+            simulator.step_simulation()
+
+    def test_off_by_default(self):
+        simulator = Simulator(num_nodes=50)
+        self.play(simulator)
+        self.assertIsNone(simulator.frames)
+        with self.assertRaises(ValueError):
+            simulator.animate_frames()
+
+    def test_record_frames(self):
+        simulator = Simulator(num_nodes=50, record_frames=True)
+        alignments = []
+        for item in [("Red", 0.9), ("Blue", 0.5), ("Red", 0.7)]:
+            simulator.set_message(*to_message(item))
+            simulator.step_simulation()
+            alignments.append(simulator.state.alignment.copy())
+        self.assertEqual(simulator.frames.steps, [1, 2, 3, 4, 5, 6])
+        for turn, alignment in enumerate(alignments):
+            np.testing.assert_array_equal(simulator.frames.frame(2 * turn + 2), alignment)
+        colors = simulator.get_frame_data(6, simulator.frames.frame(6))["node_colors"]
+        self.assertEqual(colors, simulator.get_frame_data(6)["node_colors"])
+
+        simulator.restart_simulation()
+        self.assertEqual(len(simulator.frames), 0)
+        simulator.record_frames(False)
+        self.assertIsNone(simulator.frames)
+
+
+class TestStateHistory(unittest.TestCase):
+    def play(self, simulator, turns):
+        """
+        Play turns, returning a copy of the state after each step.
+        """
+        states = {0: {field: getattr(simulator.state, field).copy() for field in ATTRIBUTES}}
+        for turn in range(turns):
+            simulator.set_message(*to_message((["Red", "Blue"][turn % 2], [0.9, 0.4, 0.7][turn % 3])))
+            simulator.step_simulation()
+            states[simulator.current_step] = {field: getattr(simulator.state, field).copy() for field in ATTRIBUTES}
+        return states
+
+    def test_state_at(self):
+        simulator = Simulator(num_nodes=200, num_turns=40, record_history=StateHistory(keyframe_interval=8))
+        states = self.play(simulator, 30)
+        history = simulator.checkpoints
+        self.assertEqual(history.steps, list(range(61)))
+        for step in [0, 7, 8, 9, 34, 60]:
+            state = history.state_at(step)
+            for field in ATTRIBUTES:
+                if step in states:
+                    np.testing.assert_array_equal(getattr(state, field), states[step][field])
+        self.assertEqual(state.counts.tolist(), simulator.state.counts.tolist())
+        # Alignment and alienated flags are mostly deltas; uncertainty
+        # changes on most nodes, so it is mostly keyframes
+        self.assertLess(history.nbytes, 61 * simulator.state.nbytes * 0.6)
+        self.assertLess(history.stores["alignment"].nbytes, 61 * 200 / 2)
+
+    def test_get_step_data(self):
+        simulator = Simulator(num_nodes=60, record_history=True)
+        self.play(simulator, 3)
+        data = simulator.get_step_data(4, fields=["alignment", "alienated"])
+        self.assertEqual(data["step"], 4)
+        self.assertEqual(set(data["nodes"][0]), {"id", "alignment", "alienated"})
+        self.assertEqual(data["stats"]["Red"] + data["stats"]["Blue"] + data["stats"]["Neutral"], 60)
+        self.assertEqual(simulator.get_step_data(6)["nodes"], simulator.get_graph_data()["nodes"])
+        self.assertTrue(all(node["alignment"] == "Neutral" for node in simulator.get_step_data(0)["nodes"]))
+        for step, fields in [(7, None), (-1, None), (2, ["colour"])]:
+            with self.assertRaises(ValueError):
+                simulator.get_step_data(step, fields)
+        with self.assertRaises(ValueError):
+            Simulator(num_nodes=10).get_step_data(0)
+
+        simulator.restart_simulation()
+        self.assertEqual(simulator.checkpoints.steps, [0])
+
+    def test_get_step_route(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-get-step")
+        headers = {"X-Game-Id": game.game_id}
+        client.post("/submit_user_message", json={"message": "Potency = 0.8", "team": "red"}, headers=headers)
+        client.get("/get_update", headers=headers)
+        response = client.get("/get_step?step=1&fields=alignment", headers=headers).get_json()
+        self.assertEqual(response["current_step"], 2)
+        self.assertEqual(response["data"]["nodes"], game.simulator.get_step_data(1, ["alignment"])["nodes"])
+        self.assertEqual(client.get("/get_step?step=3", headers=headers).status_code, 400)
+        self.assertEqual(client.get("/get_step", headers=headers).status_code, 400)
+        routes.sessions.remove(game.game_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
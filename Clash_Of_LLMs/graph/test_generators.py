@@ -0,0 +1,137 @@
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from Clash_Of_LLMs.graph import generators
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.csr import CSRGraph
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def edge_set(csr):
+    sources, targets = csr.edges()
+    return set(zip(sources.tolist(), targets.tolist()))
+
+
+class TestCSRFromEdges(unittest.TestCase):
+    def test_round_trip(self):
+        csr = CSRGraph.from_edges(5, [3, 0, 1, 3, 4], [1, 2, 0, 1, 4])
+        self.assertEqual(csr.num_edges, 4)
+        self.assertEqual(list(csr.neighbors(1)), [0, 3])
+        G = csr.to_networkx()
+        self.assertEqual(list(G.nodes), [0, 1, 2, 3, 4])
+        self.assertEqual(sorted(map(sorted, G.edges)), [[0, 1], [0, 2], [1, 3], [4, 4]])
+        back = CSRGraph.from_networkx(G)
+        np.testing.assert_array_equal(back.indptr, csr.indptr)
+        np.testing.assert_array_equal(back.indices, csr.indices)
+
+
+class TestGenerators(unittest.TestCase):
+    def check_simple(self, csr):
+        rows = np.repeat(np.arange(csr.num_nodes), csr.degrees())
+        self.assertFalse(np.any(rows == csr.indices))
+        self.assertEqual(len(edge_set(csr)), len(csr.indices) // 2)
+
+    def test_erdos_renyi(self):
+        complete = generators.erdos_renyi(20, 1.0, np.random.default_rng(0))
+        self.assertEqual(complete.num_edges, 190)
+
+        n, p = 2000, 0.01
+        csr = generators.erdos_renyi(n, p, np.random.default_rng(1))
+        self.check_simple(csr)
+        expected = p * n * (n - 1) / 2
+        self.assertLess(abs(csr.num_edges - expected), 5 * np.sqrt(expected))
+        again = generators.erdos_renyi(n, p, np.random.default_rng(1))
+        np.testing.assert_array_equal(again.indices, csr.indices)
+
+    def test_barabasi_albert(self):
+        csr = generators.barabasi_albert(5000, 3, np.random.default_rng(2))
+        self.check_simple(csr)
+        degrees = csr.degrees()
+        self.assertTrue(np.all(degrees >= 1))
+        self.assertGreater(csr.num_edges, 0.95 * 3 * 5000)
+        # Preferential attachment gives hubs far above the mean degree
+        self.assertGreater(degrees.max(), 10 * degrees.mean())
+        with self.assertRaises(ValueError):
+            generators.barabasi_albert(3, 3, np.random.default_rng(0))
+
+    def test_watts_strogatz(self):
+        lattice = generators.watts_strogatz(30, 4, 0.0, np.random.default_rng(3))
+        self.assertEqual(edge_set(lattice), edge_set(CSRGraph.from_networkx(nx.watts_strogatz_graph(30, 4, 0.0))))
+
+        csr = generators.watts_strogatz(1000, 6, 0.3, np.random.default_rng(3))
+        self.check_simple(csr)
+        self.assertEqual(csr.num_edges, 3000)
+        self.assertNotEqual(edge_set(csr), edge_set(generators.watts_strogatz(1000, 6, 0.0, np.random.default_rng(0))))
+
+    def test_stochastic_block(self):
+        csr = generators.stochastic_block([300, 200], [[0.1, 0.005], [0.005, 0.2]],
+                                          np.random.default_rng(4))
+        self.check_simple(csr)
+        sources, targets = csr.edges()
+        within_first = np.count_nonzero((sources < 300) & (targets < 300)) / (300 * 299 / 2)
+        within_second = np.count_nonzero((sources >= 300) & (targets >= 300)) / (200 * 199 / 2)
+        between = np.count_nonzero((sources < 300) & (targets >= 300)) / (300 * 200)
+        self.assertAlmostEqual(within_first, 0.1, delta=0.01)
+        self.assertAlmostEqual(within_second, 0.2, delta=0.02)
+        self.assertAlmostEqual(between, 0.005, delta=0.002)
+        with self.assertRaises(ValueError):
+            generators.stochastic_block([2, 2], [[0.1, 0.2], [0.3, 0.1]], np.random.default_rng(0))
+
+    def test_configuration(self):
+        degrees = np.random.default_rng(5).integers(1, 6, 1000)
+        degrees[0] += degrees.sum() % 2
+        csr = generators.configuration(degrees, np.random.default_rng(5))
+        self.check_simple(csr)
+        self.assertTrue(np.all(csr.degrees() <= degrees))
+        self.assertGreater(csr.degrees().sum(), 0.98 * degrees.sum())
+        with self.assertRaises(ValueError):
+            generators.configuration([1, 1, 1], np.random.default_rng(0))
+
+
+class TestSimulatorNetworks(unittest.TestCase):
+    def test_native_networks(self):
+        """
+        Native networks are built as CSR arrays, and G is only built
+        when it is used.
+        """
+        simulator = Simulator(num_nodes=500, graph_generator="native", diffusion_engine="csr")
+        self.assertIsNone(simulator._G)
+        self.assertEqual(simulator.csr.num_edges, 1000)
+        simulator.state.set_alignment(3, "Red")
+        self.assertEqual(simulator.G.nodes[3]["alignment"], "Red")
+        self.assertEqual(simulator.G.number_of_edges(), 1000)
+
+        for network_type in generators.NETWORK_TYPES:
+            simulator.create_network_custom(network_type=network_type, n=300, er_probability=0.02)
+            self.assertEqual(simulator.num_nodes, 300)
+            self.assertEqual(len(simulator.get_graph_data()["edges"]), simulator.csr.num_edges)
+
+    def test_new_types_without_native_generator(self):
+        simulator = Simulator(num_nodes=50)
+        simulator.create_network_custom(network_type="stochastic_block", n=40,
+                                        block_sizes=[10, 30],
+                                        block_probabilities=[[0.5, 0.0], [0.0, 0.1]])
+        self.assertEqual(simulator.num_nodes, 40)
+        sources, targets = simulator.csr.edges()
+        self.assertFalse(np.any((sources < 10) & (targets >= 10)))
+        simulator.initialize_simulation()
+        self.assertEqual(simulator.num_nodes, 40)
+
+    def test_graph_data_edges_follow_networkx(self):
+        simulator = Simulator(num_nodes=60)
+        edges = [(edge["from"], edge["to"]) for edge in simulator.get_graph_data()["edges"]]
+        self.assertEqual(edges, list(simulator.G.edges))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from Clash_Of_LLMs.graph import graph_io
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.csr import CSRGraph
+from Clash_Of_LLMs.graph.simulator import Simulator
+from Clash_Of_LLMs.plot import GameGraph, undecidedColour
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def row_by_row_csv(graph):
+    """
+    The CSV GameGraph.exportGraphAsCSV wrote before it wrote in bulk.
+    """
+    rows = {}
+    for nodeName, data in graph.nodes.items():
+        rows[nodeName] = [nodeName, data["color"], ""]
+    for (nodeSource, nodeDestination), _ in graph.edges.items():
+        rows[nodeSource][2] += f"{nodeDestination},"
+    file = io.StringIO(newline="")
+    csv.writer(file).writerows(rows.values())
+    return file.getvalue()
+
+
+def edges(graph):
+    return sorted(tuple(sorted(edge)) for edge in graph.edges)
+
+
+class TestAdjacencyCSV(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "graph.csv")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, text):
+        with open(self.path, "w") as file:
+            file.write(text)
+
+    def test_export_format_unchanged(self):
+        graph = GameGraph()
+        graph.createSmallWorldGraph(60)
+        graph.graph.add_edge(5, 5)
+        self.assertTrue(graph.exportGraphAsCSV(self.path))
+        with open(self.path, newline="") as file:
+            self.assertEqual(file.read(), row_by_row_csv(graph.graph))
+
+        imported = GameGraph()
+        self.assertTrue(imported.importCSVGraph(self.path))
+        self.assertEqual(list(imported.graph.nodes), list(graph.graph.nodes))
+        self.assertEqual(edges(imported.graph), edges(graph.graph))
+        self.assertEqual(imported.graph.nodes[7]["color"], graph.graph.nodes[7]["color"])
+
+    def test_names_and_connections_are_one_node(self):
+        self.write('1,red,"2,3,4,"\n2,blue,"1,"\n3,grey,"4,"\n4,red,"3,1"\n')
+        graph = GameGraph()
+        self.assertTrue(graph.importCSVGraph(self.path))
+        # Row by row, names were strings and connections ints: 8 nodes
+        self.assertEqual(list(graph.graph.nodes), [1, 2, 3, 4])
+        self.assertEqual(edges(graph.graph), [(1, 2), (1, 3), (1, 4), (3, 4)])
+        self.assertEqual(graph.graph.nodes[2]["color"], "blue")
+
+        self.write('alice,red,"bob,carol,"\nbob,blue,"alice,"\n')
+        self.assertTrue(graph.importCSVGraph(self.path))
+        self.assertEqual(list(graph.graph.nodes), ["alice", "bob", "carol"])
+        self.assertEqual(graph.graph.nodes["carol"]["color"], undecidedColour)
+        self.assertEqual(graph.graph.number_of_edges(), 2)
+
+    def test_chunks(self):
+        G = nx.gnm_random_graph(500, 2000, seed=3)
+        for node in G:
+            G.nodes[node]["color"] = "red"
+        graph = GameGraph()
+        graph.load_external_graph(G)
+        graph.exportGraphAsCSV(self.path)
+        csr, colours = graph_io.read_adjacency_csv(self.path, chunk_rows=7)
+        self.assertEqual(csr.num_edges, 2000)
+        self.assertEqual(colours, ["red"] * 500)
+
+    def test_invalid(self):
+        graph = GameGraph()
+        self.write("1,red\n")
+        self.assertFalse(graph.importCSVGraph(self.path))
+        self.write('1,red,"2,x,"\n')
+        self.assertFalse(graph.importCSVGraph(self.path))
+        self.assertFalse(graph.importCSVGraph(os.path.join(self.directory.name, "missing.csv")))
+
+
+class TestEdgeList(unittest.TestCase):
+    def test_read(self):
+        text = "# crawl\n0 1\n1 0\n1 2 0.5\n2 2\n\n0 1\n3 0\n"
+        csr = graph_io.read_edge_list(io.StringIO(text), chunk_size=8)
+        self.assertIsNone(csr._index)
+        self.assertEqual(csr.num_nodes, 4)
+        self.assertEqual(csr.num_edges, 4)
+        self.assertEqual(csr.neighbors(0).tolist(), [1, 3])
+
+        # Sparse ids are kept as labels
+        csr = graph_io.read_edge_list(io.StringIO("1000000007,5\n5,42\n"), delimiter=",")
+        self.assertEqual(csr.labels, [5, 42, 1000000007])
+        # Ids that are not all integers are strings, even in earlier chunks
+        csr = graph_io.read_edge_list(io.StringIO("1 2\n2 3\n3 a\n"), chunk_size=4)
+        self.assertEqual(csr.labels, ["1", "2", "3", "a"])
+        with self.assertRaises(ValueError):
+            graph_io.read_edge_list(io.StringIO("1\n"))
+
+    def test_round_trip(self):
+        G = nx.barabasi_albert_graph(300, 3, seed=2)
+        G = nx.relabel_nodes(G, {node: f"user{node}" for node in G})
+        file = io.StringIO()
+        graph_io.write_edge_list(CSRGraph.from_networkx(G), file, delimiter="\t")
+        csr = graph_io.read_edge_list(io.StringIO(file.getvalue()), delimiter="\t")
+        self.assertEqual(edges(csr.to_networkx()), edges(G))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "edges.txt")
+            graph = GameGraph()
+            graph.load_external_graph(G)
+            self.assertTrue(graph.exportEdgeList(path))
+            imported = GameGraph()
+            self.assertTrue(imported.importEdgeList(path))
+        self.assertEqual(edges(imported.graph), edges(G))
+        self.assertEqual(imported.graph.nodes["user0"]["color"], undecidedColour)
+
+
+class TestCSRFile(unittest.TestCase):
+    def test_mmap(self):
+        csr = graph_io.read_edge_list(io.StringIO("0 1\n1 2\n2 0\n2 3\n"))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph")
+            graph_io.save_csr(csr, path)
+            for mmap_mode in [None, "r"]:
+                loaded = graph_io.load_csr(path + ".npz", mmap_mode=mmap_mode)
+                np.testing.assert_array_equal(loaded.indptr, csr.indptr)
+                np.testing.assert_array_equal(loaded.indices, csr.indices)
+            self.assertIsInstance(graph_io.load_npz(path + ".npz", "r")["indices"], np.memmap)
+
+            # A mapped network runs a game as is
+            simulator = Simulator(num_nodes=4, diffusion_engine="csr")
+            simulator.set_network(graph_io.load_csr(path + ".npz", mmap_mode="r"))
+            simulator.initialize_node_attributes()
+            self.assertEqual(simulator.get_stats()["Neutral"], 4)
+
+            G = nx.relabel_nodes(nx.path_graph(5), {node: f"n{node}" for node in range(5)})
+            graph = GameGraph()
+            graph.load_external_graph(G)
+            self.assertTrue(graph.exportCSRGraph(path))
+            imported = GameGraph()
+            self.assertTrue(imported.importCSRGraph(path + ".npz", mmapMode="r"))
+            self.assertEqual(list(imported.graph.nodes), list(G.nodes))
+            self.assertEqual(edges(imported.graph), edges(G))
+
+            with self.assertRaises(ValueError):
+                graph_io.save_csr(CSRGraph.from_networkx(nx.Graph([(1, "a")])), path)
+
+
+if __name__ == "__main__":
+    unittest.main()
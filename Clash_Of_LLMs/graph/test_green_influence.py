@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.message import Message
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def play(simulator, potencies):
+    for turn, potency in enumerate(potencies):
+        team = ["Red", "Blue"][turn % 2]
+        simulator.set_message(team, Message(team=team, potency=0.0,
+                                            content=f"Potency = {potency}",
+                                            active_nodes=[], steps_remaining=0))
+        simulator.step_simulation()
+
+
+class TestIncrementalGreenInfluence(unittest.TestCase):
+    def assertSameState(self, a, b):
+        np.testing.assert_array_equal(a.state.alignment, b.state.alignment)
+        np.testing.assert_array_equal(a.state.uncertainty, b.state.uncertainty)
+        np.testing.assert_array_equal(a.state.alienated, b.state.alienated)
+
+    def test_matches_full_sweep(self):
+        """
+        Incremental and full sweeps give identical games.
+        """
+        for kwargs in [{}, {"use_random_start_alignments": True}]:
+            games = []
+            for mode in ["full", "incremental"]:
+                simulator = Simulator(num_nodes=300, green_influence_mode=mode, **kwargs)
+                simulator.initialize_node_attributes(uncertainty=0.5)
+                play(simulator, [0.8, 0.6, 0.3, 0.9, 1.0, 0.2])
+                games.append(simulator)
+            self.assertSameState(*games)
+
+    def test_skips_clean_edges(self):
+        """
+        Edges between nodes that have not changed are skipped.
+        """
+        simulator = Simulator(num_nodes=200)
+        simulator.initialize_node_attributes(uncertainty=0.5)
+        simulator.green_influence()
+        self.assertEqual(simulator.green_influence_stats["edges_skipped"], 0)
+
+        # Nothing changed since the last sweep
+        simulator.green_influence()
+        stats = simulator.green_influence_stats
+        self.assertEqual(stats["sweeps"], 2)
+        self.assertEqual(stats["edges_skipped"], len(simulator.csr.indices))
+
+        # Only the edges around one changed node are evaluated
+        simulator.G.nodes[10]["uncertainty"] = 0.1
+        reference = Simulator(num_nodes=200, green_influence_mode="full")
+        reference.initialize_node_attributes(uncertainty=0.5)
+        reference.G.nodes[10]["uncertainty"] = 0.1
+        simulator.green_influence()
+        reference.green_influence()
+        self.assertSameState(simulator, reference)
+        self.assertLess(stats["edges_evaluated"], 2 * len(simulator.csr.indices))
+
+    def test_full_fallback(self):
+        simulator = Simulator(num_nodes=50)
+        simulator.green_influence(mode="full")
+        simulator.green_influence(mode="full")
+        self.assertEqual(simulator.green_influence_stats["edges_skipped"], 0)
+
+
+class TestFusedGreenInfluence(unittest.TestCase):
+    def sweeps_per_step(self, fuse):
+        simulator = Simulator(num_nodes=100, fuse_green_influence=fuse)
+        for team in ["Red", "Blue"]:
+            simulator.set_message(team, Message(team=team, potency=0.0,
+                                                content="Potency = 0.5",
+                                                active_nodes=[], steps_remaining=0))
+            simulator.introduce_message(team)
+        simulator.spread_active_messages()
+        self.assertEqual(len(simulator.active_messages), 2)
+        return simulator.green_influence_stats["sweeps"]
+
+    def test_one_sweep_per_step(self):
+        """
+        Overlapping messages share a single peer influence sweep, unless
+        the per-message compatibility mode is selected.
+        """
+        self.assertEqual(self.sweeps_per_step(fuse=True), 1)
+        self.assertEqual(self.sweeps_per_step(fuse=False), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import itertools
+import unittest
+import warnings
+
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.kernels import influence_kernel, message_influence_kernel
+from Clash_Of_LLMs.graph.message import Message
+from Clash_Of_LLMs.graph.node_state import ALIGNMENT_CODES, ALIGNMENTS
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+# Dense grid of uncertainties, including every threshold used by the rules
+UNCERTAINTIES = np.unique(np.concatenate([
+    np.linspace(-1.5, 2.5, 81),
+    [-1.0, -0.5, -0.34, 0.0, 0.5, 0.6, 1.0],
+    np.nextafter([-0.5, 0.0], -np.inf),
+]))
+POTENCIES = np.unique(np.concatenate([np.linspace(0.0, 1.0, 21), [0.05, 0.35, 0.65]]))
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+class TestMessageInfluenceKernel(unittest.TestCase):
+    def test_matches_scalar_rule(self):
+        """
+        The kernel matches Simulator.message_influence for every
+        (A, U, Q, T) on the grid.
+        """
+        grid = list(itertools.product(ALIGNMENTS, UNCERTAINTIES))
+        simulator = Simulator(num_nodes=len(grid))
+        state = simulator.state
+        A = np.array([ALIGNMENT_CODES[a] for a, _ in grid], dtype=np.int8)
+        U = np.array([u for _, u in grid])
+        nodes = np.arange(len(grid))
+
+        for team, Q in itertools.product(["Red", "Blue"], POTENCIES):
+            message = Message(team=team, potency=float(Q), content="",
+                              active_nodes=set(), steps_remaining=1)
+            state.alignment[:] = A
+            state.uncertainty[:] = U
+            state.alienated[:] = 0
+            for node in nodes:
+                simulator.message_influence(int(node), message)
+            expected = (state.alignment.copy(), state.uncertainty.copy(),
+                        state.alienated_mask())
+
+            # Rules evaluated for nodes they do not apply to raise no
+            # warnings
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", RuntimeWarning)
+                alignment, uncertainty, alienate = message_influence_kernel(
+                    A, U, ALIGNMENT_CODES[team], Q)
+            np.testing.assert_array_equal(alignment, expected[0], err_msg=f"{team} {Q}")
+            np.testing.assert_array_equal(uncertainty, expected[1], err_msg=f"{team} {Q}")
+            np.testing.assert_array_equal(alienate, expected[2], err_msg=f"{team} {Q}")
+
+    def test_message_influence_many(self):
+        simulator = Simulator(num_nodes=50)
+        simulator.state.uncertainty[:] = np.linspace(-1.2, 1.2, 50)
+        simulator.state.alignment[:] = np.arange(50) % 3
+        reference = Simulator(num_nodes=50)
+        reference.state.uncertainty[:] = simulator.state.uncertainty
+        reference.state.alignment[:] = simulator.state.alignment
+        message = Message(team="Red", potency=0.9, content="",
+                          active_nodes=set(), steps_remaining=1)
+
+        nodes = np.arange(0, 50, 2)
+        simulator.message_influence_many(nodes, message)
+        for node in nodes:
+            reference.message_influence(int(node), message)
+        np.testing.assert_array_equal(simulator.state.uncertainty, reference.state.uncertainty)
+        np.testing.assert_array_equal(simulator.state.alienated, reference.state.alienated)
+
+
+class TestInfluenceKernel(unittest.TestCase):
+    def test_matches_scalar_rule(self):
+        """
+        The kernel matches Simulator.influence for every (A1, U1, A2, U2)
+        on the grid.
+        """
+        grid = list(itertools.product(ALIGNMENTS, UNCERTAINTIES, ALIGNMENTS, UNCERTAINTIES))
+        A1, U1, A2, U2 = (np.array(column) for column in zip(*grid))
+        A1 = np.array([ALIGNMENT_CODES[a] for a in A1], dtype=np.int8)
+        A2 = np.array([ALIGNMENT_CODES[a] for a in A2], dtype=np.int8)
+        U1 = U1.astype(float)
+        U2 = U2.astype(float)
+
+        simulator = Simulator(num_nodes=2, network_type="erdos_renyi")
+        state = simulator.state
+        expected_alignment = np.empty_like(A2)
+        expected_uncertainty = np.empty_like(U2)
+        for i in range(len(grid)):
+            state.alignment[:] = (A1[i], A2[i])
+            state.uncertainty[:] = (U1[i], U2[i])
+            simulator.influence(0, 1)
+            expected_alignment[i] = state.alignment[1]
+            expected_uncertainty[i] = state.uncertainty[1]
+
+        alignment, uncertainty = influence_kernel(A1, U1, A2, U2)
+        np.testing.assert_array_equal(alignment, expected_alignment)
+        np.testing.assert_array_equal(uncertainty, expected_uncertainty)
+
+    def test_influence_many_requires_unique_inferiors(self):
+        simulator = Simulator(num_nodes=10)
+        with self.assertRaises(ValueError):
+            simulator.influence_many([0, 1], [2, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
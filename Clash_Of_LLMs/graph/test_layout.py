@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from Clash_Of_LLMs.graph import generators
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.layout import LayoutCache, cached_layout, force_layout, layout_key
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def edge_to_random_length(csr, positions):
+    """
+    Mean edge length over the mean distance between random node pairs.
+    """
+    sources, targets = csr.edges()
+    pairs = np.random.default_rng(0).integers(0, csr.num_nodes, (2000, 2))
+    edge_length = np.linalg.norm(positions[sources] - positions[targets], axis=1).mean()
+    random_length = np.linalg.norm(positions[pairs[:, 0]] - positions[pairs[:, 1]], axis=1).mean()
+    return edge_length / random_length
+
+
+class TestForceLayout(unittest.TestCase):
+    def test_exact_and_mesh(self):
+        for n, method in [(200, "exact"), (5000, "mesh")]:
+            csr = generators.watts_strogatz(n, 4, 0.1, np.random.default_rng(0))
+            positions = force_layout(csr, seed=1, method=method)
+            self.assertEqual(positions.shape, (n, 2))
+            self.assertAlmostEqual(np.abs(positions).max(), 1.0)
+            # Neighbours end up much closer than random pairs
+            self.assertLess(edge_to_random_length(csr, positions), 0.5)
+            np.testing.assert_array_equal(positions, force_layout(csr, seed=1, method=method))
+
+        with self.assertRaises(ValueError):
+            force_layout(csr, method="spring")
+
+    def test_tiny_graphs(self):
+        csr = generators.erdos_renyi(1, 0.5, np.random.default_rng(0))
+        self.assertEqual(force_layout(csr).shape, (1, 2))
+
+
+class TestLayoutCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = LayoutCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cached_layout(self):
+        csr = generators.erdos_renyi(100, 0.05, np.random.default_rng(0))
+        params = {"er_probability": 0.05}
+        positions = cached_layout(csr, "erdos_renyi", params, 3, cache=self.cache)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+        np.testing.assert_array_equal(cached_layout(csr, "erdos_renyi", params, 3, cache=self.cache), positions)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+
+        # A different seed or graph is a different key
+        other = generators.erdos_renyi(100, 0.05, np.random.default_rng(1))
+        self.assertNotEqual(layout_key(csr, "erdos_renyi", params, 3), layout_key(csr, "erdos_renyi", params, 4))
+        self.assertNotEqual(layout_key(csr, "erdos_renyi", params, 3), layout_key(other, "erdos_renyi", params, 3))
+
+        # Unseeded networks are not cached
+        cached_layout(csr, "erdos_renyi", params, None, cache=self.cache)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+
+    def test_simulator_positions(self):
+        simulator = Simulator(num_nodes=40, layout_cache=self.cache)
+        nodes = simulator.get_graph_data(positions=True)["nodes"]
+        self.assertTrue(all("x" in node and "y" in node for node in nodes))
+        self.assertNotIn("x", simulator.get_graph_data()["nodes"][0])
+        self.assertEqual(set(simulator.pos), set(simulator.G.nodes))
+
+        again = Simulator(num_nodes=40, layout_cache=self.cache)
+        np.testing.assert_array_equal(again.positions, simulator.positions)
+        self.assertEqual(self.cache.hits, 1)
+
+        # A new network gets a new layout
+        again.create_network_custom(network_type="barabasi_albert", n=40)
+        self.assertEqual(again.positions.shape, (40, 2))
+        self.assertEqual(self.cache.misses, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
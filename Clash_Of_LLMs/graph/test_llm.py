@@ -0,0 +1,406 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from Clash_Of_LLMs import app, llm, routes
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.simulator import Simulator
+from Clash_Of_LLMs.llm_cache import ResponseCache, response_key
+from Clash_Of_LLMs.llm_local import LocalProviderError, local_message, parse_profile
+from Clash_Of_LLMs.llm_pool import KeyPool, LatencyHistogram, TokenBucket
+
+
+_environ = mock.patch.dict(os.environ, {"CLASH_LLM_CACHE": ""})
+_cache = llm.cache
+
+
+def setUpModule():
+    simulator_module.debugging = False
+    # Calls that finish late are never stored in the developer's cache
+    _environ.start()
+    llm.cache = ResponseCache()
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+    llm.cache = _cache
+    _environ.stop()
+
+
+def echo_complete(model_name, prompt, timeout):
+    time.sleep(0.2)
+    return f"{prompt} Potency = 0.5" if "team" in prompt else "True"
+
+
+def slow_complete(model_name, prompt, timeout):
+    time.sleep(1)
+    return prompt
+
+
+class LLMTestCase(unittest.TestCase):
+    def setUp(self):
+        environ = mock.patch.dict(os.environ, {"CLASH_LLM_CACHE": ""})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.providers = dict(llm.PROVIDERS)
+        llm.PROVIDERS["test-echo"] = echo_complete
+        llm.PROVIDERS["test-slow"] = slow_complete
+        self.cache = llm.cache
+        llm.cache = ResponseCache()
+
+    def tearDown(self):
+        llm.PROVIDERS.clear()
+        llm.PROVIDERS.update(self.providers)
+        llm.cache = self.cache
+
+
+class TestGenerateMany(LLMTestCase):
+    def test_calls_run_concurrently(self):
+        calls = [{"model_name": "test-echo", "prompt": f"team {i}"} for i in range(4)]
+        start = time.perf_counter()
+        results = llm.generate_many(calls)
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual([result.result() for result in results],
+                         [f"team {i} Potency = 0.5" for i in range(4)])
+
+    def test_timeout_and_errors(self):
+        results = llm.generate_many([
+            {"model_name": "test-slow", "prompt": "late"},
+            {"model_name": "test-echo", "prompt": "validate"},
+            {"model_name": "llama", "prompt": "unknown model"},
+        ], timeout=0.5)
+        self.assertIsInstance(results[0].error, TimeoutError)
+        self.assertEqual(results[1].message, "True")
+        self.assertIsInstance(results[2].error, ValueError)
+        with self.assertRaises(TimeoutError):
+            llm.generate("test-slow", "late", timeout=0.1)
+
+    def test_cancel_queued_calls(self):
+        # Queued calls that have not started by the timeout never run
+        started = []
+        block = threading.Event()
+
+        def blocking(model_name, prompt, timeout):
+            started.append(prompt)
+            block.wait(5)
+            return prompt
+
+        llm.PROVIDERS["test-block"] = blocking
+        calls = [{"model_name": "test-block", "prompt": str(i)} for i in range(llm.MAX_WORKERS + 4)]
+        results = llm.generate_many(calls, timeout=0.2)
+        block.set()
+        time.sleep(0.1)
+        self.assertTrue(all(isinstance(result.error, TimeoutError) for result in results))
+        self.assertEqual(len(started), llm.MAX_WORKERS)
+
+
+class TestResponseCache(LLMTestCase):
+    def test_memory_tier(self):
+        cache = ResponseCache(max_entries=2)
+        for key in "abc":
+            cache.put(key, key.upper())
+        # "a" was the least recently used
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), "C")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertNotEqual(response_key("gpt-4o", "hi", 0.9, 150), response_key("gpt-4o", "hi", 2, 150))
+
+    def test_disk_tier_and_ttl(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache", "llm.sqlite")
+            cache = ResponseCache(path=path)
+            # The database is only created when a reply is stored
+            self.assertIsNone(cache.get("key"))
+            self.assertIsNone(cache.stats()["disk_entries"])
+            self.assertFalse(os.path.exists(os.path.dirname(path)))
+            cache.put("key", "reply")
+            self.assertTrue(os.path.exists(path))
+            cache = ResponseCache(path=path)
+            self.assertEqual(cache.get("key"), "reply")
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+
+            expired = ResponseCache(path=path, ttl=0.05)
+            time.sleep(0.1)
+            self.assertIsNone(expired.get("key"))
+
+    def test_generate_uses_cache(self):
+        calls = []
+
+        def counting(model_name, prompt, timeout):
+            calls.append(prompt)
+            return f"reply {len(calls)}"
+
+        llm.PROVIDERS["test-count"] = counting
+        self.assertEqual(llm.generate("test-count", "validate"), "reply 1")
+        self.assertEqual(llm.generate("test-count", "validate"), "reply 1")
+        self.assertEqual(len(calls), 1)
+        # Fresh sampling skips the cache, and replaces the cached reply
+        self.assertEqual(llm.generate("test-count", "validate", fresh=True), "reply 2")
+        self.assertEqual(llm.generate("test-count", "validate"), "reply 2")
+        self.assertEqual(llm.generate("test-count-2", "validate"), "reply 3")
+        # A call that times out is still cached when it completes, in
+        # the cache it was made with
+        with self.assertRaises(TimeoutError):
+            llm.generate("test-slow", "late", timeout=0.1)
+        cache, llm.cache = llm.cache, ResponseCache()
+        time.sleep(1.2)
+        self.assertEqual(llm.cache.stats()["memory_entries"], 0)
+        llm.cache = cache
+        self.assertEqual(llm.generate("test-slow", "late", timeout=0.1), "late")
+
+        stats = app.test_client().get("/llm_cache").get_json()
+        self.assertTrue(stats["enabled"])
+        self.assertEqual(stats["hits"], 3)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class TestKeyPool(unittest.TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        now = bucket.updated
+        self.assertTrue(bucket.take(now))
+        self.assertTrue(bucket.take(now))
+        self.assertFalse(bucket.take(now))
+        self.assertAlmostEqual(bucket.wait_time(now), 0.1)
+        self.assertTrue(bucket.take(now + 0.11))
+
+    def test_clients_are_reused_and_keys_shared(self):
+        built = []
+        pool = KeyPool("Test", ["k1", "k2"], lambda key: built.append(key) or key, rate_per_minute=600)
+        used = [pool.call(lambda client, remaining: client, timeout=1) for _ in range(4)]
+        self.assertEqual(sorted(used), ["k1", "k1", "k2", "k2"])
+        self.assertEqual(built, ["k1", "k2"])
+        self.assertEqual(pool.call(lambda client, remaining: client, timeout=1, preferred="k2"), "k2")
+        self.assertEqual(pool.stats()["latency"]["count"], 5)
+
+    def test_rate_limit(self):
+        pool = KeyPool("Test", ["k1"], lambda key: key, rate_per_minute=60)
+        pool.buckets["k1"] = TokenBucket(rate=10, capacity=1)
+        start = time.perf_counter()
+        for _ in range(3):
+            pool.call(lambda client, remaining: client, timeout=1)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.15)
+        pool.buckets["k1"] = TokenBucket(rate=0.1, capacity=1)
+        pool.call(lambda client, remaining: client, timeout=1)
+        with self.assertRaises(TimeoutError):
+            pool.call(lambda client, remaining: client, timeout=0.5)
+
+    def test_retries(self):
+        pool = KeyPool("Test", ["k1", "k2"], lambda key: key, rate_per_minute=600, backoff=0.01)
+        attempts = []
+
+        def flaky(client, remaining):
+            attempts.append(client)
+            if len(attempts) < 3:
+                raise StatusError(429 if len(attempts) == 1 else 503)
+            return client
+
+        pool.call(flaky, timeout=5, preferred="k1")
+        # A rate-limited key is not retried first
+        self.assertEqual(attempts[:2], ["k1", "k2"])
+        self.assertEqual(pool.latency.snapshot()["retries"], 2)
+
+        def bad_request(client, remaining):
+            attempts.append(client)
+            raise StatusError(400)
+
+        attempts.clear()
+        with self.assertRaises(StatusError):
+            pool.call(bad_request, timeout=5)
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(pool.latency.snapshot()["outcomes"], {"ok": 1, "400": 1})
+
+    def test_histogram(self):
+        histogram = LatencyHistogram(buckets=(0.1, 1.0))
+        for seconds in [0.05, 0.5, 0.7, 3.0]:
+            histogram.observe(seconds)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {"le_0.1": 1, "le_1": 2, "le_inf": 1})
+        self.assertAlmostEqual(snapshot["mean"], 1.0625)
+
+    def test_api_keys(self):
+        environ = {"GEMINI_API_KEY_2": "b", "GEMINI_API_KEY_1": "a", "GEMINI_API_KEY_3": "a", "GEMINI_API_KEY_X": "x"}
+        with mock.patch.dict(os.environ, environ):
+            self.assertEqual(llm.api_keys("GEMINI_API_KEY"), ["a", "b"])
+
+
+class TestLocalProvider(LLMTestCase):
+    def test_messages(self):
+        prompt = "Red Team's turn. Argue in favor of: \"Voting is bad\". You must support and justify this position."
+        message = llm.generate("local", prompt)
+        self.assertEqual(message, local_message(prompt))
+        self.assertIn('"Voting is bad".', message)
+        self.assertTrue(30 <= len(message.split(" ")) <= 40)
+        # As findPotency in game.js parses it
+        potency = float(message.split("=")[1])
+        self.assertTrue(0.1 < potency < 1)
+        self.assertNotEqual(round(potency * 100) % 10, 0)
+        self.assertEqual(llm.generate("local", 'Respond with "True" if it aligns'), "True")
+        # Local replies are never cached
+        self.assertEqual(llm.cache.stats()["memory_entries"], 0)
+
+    def test_profiles(self):
+        self.assertEqual(parse_profile("local?latency=0.2&failure_status=429")["failure_status"], 429)
+        with self.assertRaises(ValueError):
+            parse_profile("local?speed=fast")
+
+        start = time.perf_counter()
+        llm.generate("local?latency=0.2", "team")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+        with self.assertRaises(TimeoutError):
+            llm.generate("local?latency=1", "team", timeout=0.1)
+        # Injected server errors are retried, then raised
+        pool = llm.pool("local")
+        retries, backoff = pool.latency.snapshot()["retries"], pool.backoff
+        pool.backoff = 0.01
+        try:
+            with self.assertRaises(LocalProviderError):
+                llm.generate("local?failure_rate=1&failure_status=503", "team", timeout=30)
+        finally:
+            pool.backoff = backoff
+        self.assertEqual(pool.latency.snapshot()["retries"], retries + pool.retries)
+
+    def test_import_without_api_keys(self):
+        environ = {key: value for key, value in os.environ.items() if "API_KEY" not in key}
+        home = tempfile.TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        environ["HOME"] = home.name
+        environ.pop("CLASH_LLM_CACHE", None)
+        code = (
+            "from Clash_Of_LLMs import app\n"
+            "response = app.test_client().post('/generate_message', json={'model_name': 'local', 'prompt': 'hi'})\n"
+            "assert response.get_json()['message'].startswith(tuple(__import__('Clash_Of_LLMs.llm_local').llm_local.ARGUMENTS))\n"
+            "response = app.test_client().post('/generate_message', json={'model_name': 'gpt-4o-mini', 'prompt': 'hi'})\n"
+            "assert 'API keys' in response.get_json()['error'], response.get_json()\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], env=environ, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        # Importing the app does not create the reply cache on disk
+        self.assertFalse(os.path.exists(os.path.join(home.name, ".cache", "clash_of_llms")))
+
+
+class TestStreaming(LLMTestCase):
+    PROMPT = "Red Team's turn. Argue in favor of: \"Voting is bad\"."
+
+    def test_stream(self):
+        start = time.perf_counter()
+        chunks = llm.stream("local?latency=0.1&token_latency=0.01", self.PROMPT)
+        first = next(chunks)
+        # The first token comes well before the whole reply
+        self.assertLess(time.perf_counter() - start, 0.2)
+        chunks = [first, *chunks]
+        self.assertGreater(time.perf_counter() - start, 0.3)
+        self.assertEqual("".join(chunks), local_message(self.PROMPT))
+
+        with self.assertRaises(TimeoutError):
+            list(llm.stream("local?token_latency=0.1", self.PROMPT, timeout=0.5))
+
+    def test_providers_without_streaming(self):
+        # Sent whole, and cached
+        self.assertEqual(list(llm.stream("test-echo", "team red")), ["team red Potency = 0.5"])
+        self.assertEqual(list(llm.stream("test-echo", "team red")), ["team red Potency = 0.5"])
+        self.assertEqual(llm.cache.hits, 1)
+        with self.assertRaises(ValueError):
+            next(llm.stream("llama", "hi"))
+
+    def test_stream_route(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-stream-message")
+        game.set_simulator(Simulator(num_nodes=20))
+        headers = {"X-Game-Id": game.game_id}
+        response = client.post("/generate_message/stream", headers=headers, json={
+            "model_name": "local?token_latency=0.001", "prompt": self.PROMPT, "team": "red",
+        })
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = [
+            (event.split("\n")[0][len("event: "):], json.loads(event.split("data: ", 1)[1]))
+            for event in response.get_data(as_text=True).strip().split("\n\n")
+        ]
+        self.assertTrue(all(name == "token" for name, _ in events[:-1]))
+        self.assertGreater(len(events), 30)
+        message = local_message(self.PROMPT)
+        self.assertEqual("".join(data["text"] for _, data in events[:-1]), message)
+        self.assertEqual(events[-1], ("done", {"message": message, "team": "red"}))
+        self.assertEqual(game.simulator.current_messages["Red"].content, f"Red message, {message}")
+
+        response = client.post("/generate_message/stream", headers=headers, json={
+            "model_name": "test-slow", "prompt": "late", "team": "blue", "timeout": 0.1,
+        })
+        self.assertIn("event: error", response.get_data(as_text=True))
+        self.assertIsNone(game.simulator.current_messages["Blue"])
+        routes.sessions.remove(game.game_id)
+
+
+class TestGenerateRoutes(LLMTestCase):
+    def test_generate_messages(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-generate-messages")
+        game.set_simulator(Simulator(num_nodes=20))
+        response = client.post("/generate_messages", headers={"X-Game-Id": game.game_id}, json={
+            "requests": [
+                {"model_name": "test-echo", "prompt": "team red", "team": "red"},
+                {"model_name": "test-echo", "prompt": "team blue", "team": "blue"},
+                {"model_name": "test-echo", "prompt": "validate"},
+            ],
+        })
+        results = response.get_json()["results"]
+        self.assertEqual([result.get("message") for result in results],
+                         ["team red Potency = 0.5", "team blue Potency = 0.5", "True"])
+        messages = game.simulator.current_messages
+        self.assertEqual(messages["Red"].content, "Red message, team red Potency = 0.5")
+        self.assertEqual(messages["Blue"].potency, 0.5)
+
+        self.assertEqual(client.post("/generate_messages", json={"requests": []}).status_code, 400)
+        for calls in [["hi"], [{"model_name": "test-echo"}], [{"model_name": 4, "prompt": "team red"}]]:
+            response = client.post("/generate_messages", json={"requests": calls})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("model_name", response.get_json()["message"])
+
+    def test_regenerate(self):
+        # The game sends fresh when it retries a reply it rejected, which
+        # must be a new sample
+        samples = iter(["too short", "a reply of the right length", "False", "True"])
+        llm.PROVIDERS["test-samples"] = lambda model_name, prompt, timeout: next(samples)
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-regenerate")
+        game.set_simulator(Simulator(num_nodes=20))
+        headers = {"X-Game-Id": game.game_id}
+        messages = []
+        for fresh in [False, True]:
+            response = client.post("/generate_message/stream", headers=headers, json={
+                "model_name": "test-samples", "prompt": "team red", "team": "red", "fresh": fresh,
+            })
+            messages.append(json.loads(response.get_data(as_text=True).rsplit("data: ", 1)[1])["message"])
+        self.assertEqual(messages, ["too short", "a reply of the right length"])
+        # The retry's validation prompt quotes the new reply, so it gets
+        # its own verdict, while a repeated prompt is served cached
+        verdicts = [
+            client.post("/generate_message", json={
+                "model_name": "test-samples", "prompt": f"validate: {message}",
+            }).get_json()["message"]
+            for message in messages + messages[:1]
+        ]
+        self.assertEqual(verdicts, ["False", "True", "False"])
+        routes.sessions.remove(game.game_id)
+
+    def test_generate_message_timeout(self):
+        client = app.test_client()
+        response = client.post("/generate_message", json={
+            "model_name": "test-slow", "prompt": "late", "team": "red", "timeout": 0.1,
+        })
+        self.assertEqual(response.status_code, 504)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.message import Message
+from Clash_Of_LLMs.graph.node_state import BLUE, RED, NodeState
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+class TestNodeState(unittest.TestCase):
+    def setUp(self):
+        self.state = NodeState(20)
+
+    def test_alignment_accessors(self):
+        self.state.set_alignment(3, "Red")
+        self.state.set_alignment(4, "Blue")
+        self.assertEqual(self.state.get_alignment(3), "Red")
+        self.assertEqual(self.state.get_alignment(0), "Neutral")
+        self.assertEqual(list(self.state.alignment[3:5]), [RED, BLUE])
+        self.assertEqual(self.state.count("Red"), 1)
+        self.assertEqual(self.state.count("Neutral"), 18)
+
+    def test_packed_alienated_flags(self):
+        """
+        Alienated flags are stored one bit per node.
+        """
+        self.assertEqual(self.state.alienated.nbytes, 3)
+        for node in [0, 7, 8, 19]:
+            self.state.set_alienated(node)
+        self.state.set_alienated(8, False)
+        self.assertTrue(self.state.is_alienated(7))
+        self.assertFalse(self.state.is_alienated(8))
+        self.assertEqual(list(np.flatnonzero(self.state.alienated_mask())), [0, 7, 19])
+        self.assertEqual(self.state.count_alienated(), 3)
+
+    def test_networkx_view(self):
+        """
+        G.nodes[n] reads and writes go through to the arrays.
+        """
+        G = nx.path_graph(20)
+        self.state.attach(G)
+        G.nodes[2]["alignment"] = "Blue"
+        G.nodes[2]["uncertainty"] = 0.25
+        G.nodes[2]["alienated"] = True
+        self.assertEqual(self.state.get_alignment(2), "Blue")
+        self.assertEqual(self.state.uncertainty[2], 0.25)
+        self.assertTrue(self.state.is_alienated(2))
+        self.assertEqual(dict(G.nodes(data=True))[2]["alignment"], "Blue")
+
+        # Attributes without an array are kept alongside the arrays
+        G.nodes[2]["color"] = "blue"
+        self.assertEqual(G.copy().nodes[2]["color"], "blue")
+        self.assertNotIn(20, G.nodes)
+        with self.assertRaises(KeyError):
+            G.nodes[2]["missing"]
+
+    def test_networkx_nodes_are_fixed(self):
+        simulator = Simulator(num_nodes=20)
+        G = simulator.G
+        # Existing nodes can still be updated and connected
+        G.add_node(3, color="red")
+        self.assertEqual(G.nodes[3]["color"], "red")
+        G.add_edge(0, 19)
+        self.assertIn(19, G[0])
+        for change in [lambda: G.add_node(20), lambda: G.add_edge(0, "new"), lambda: G.remove_node(5)]:
+            with self.assertRaisesRegex(ValueError, "set_network"):
+                change()
+        self.assertEqual(len(G), 20)
+        self.assertEqual(len(G._adj), 20)
+
+
+class TestSimulatorNodeState(unittest.TestCase):
+    def test_stats_and_graph_data(self):
+        simulator = Simulator(num_nodes=40)
+        simulator.G.nodes[0]["alignment"] = "Red"
+        simulator.G.nodes[1]["alignment"] = "Blue"
+        simulator.G.nodes[1]["alienated"] = True
+        stats = simulator.get_stats()
+        self.assertEqual((stats["Red"], stats["Blue"], stats["Neutral"]), (1, 1, 38))
+        self.assertEqual(stats["Alienated"], 1)
+
+        nodes = simulator.get_graph_data()["nodes"]
+        self.assertEqual(nodes[1], {
+            "id": 1,
+            "alignment": "Blue",
+            "susceptibility": simulator.G.nodes[1]["susceptibility"],
+            "uncertainty": 2.0,
+            "alienated": True,
+        })
+        self.assertIs(type(nodes[1]["uncertainty"]), float)
+        self.assertEqual(simulator.get_frame_data(1)["node_colors"][:3], ["red", "blue", "grey"])
+
+    def test_counters_track_games(self):
+        """
+        The live counters match a full scan after every step, for both
+        diffusion engines and green influence modes.
+        """
+        for kwargs in [{}, {"diffusion_engine": "csr", "green_influence_mode": "full"},
+                       {"use_random_start_alignments": True}]:
+            simulator = Simulator(num_nodes=150, check_counters=True, **kwargs)
+            simulator.initialize_node_attributes(uncertainty=0.5)
+            for turn, potency in enumerate([0.9, 0.4, 1.0, 0.7, 0.2, 0.95]):
+                team = ["Red", "Blue"][turn % 2]
+                simulator.set_message(team, Message(team=team, potency=0.0,
+                                                    content=f"Potency = {potency}",
+                                                    active_nodes=[], steps_remaining=0))
+                simulator.step_simulation()
+                simulator.get_stats()
+            self.assertGreater(simulator.state.count_alienated() + simulator.state.count("Red"), 0)
+
+    def test_counter_drift_is_detected(self):
+        simulator = Simulator(num_nodes=20, check_counters=True)
+        simulator.state.alignment[3] = RED
+        with self.assertRaises(AssertionError):
+            simulator.get_stats()
+        simulator.state.recount()
+        self.assertEqual(simulator.get_stats()["Red"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
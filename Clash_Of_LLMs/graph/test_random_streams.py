@@ -0,0 +1,82 @@
+import random
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.message import Message
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+POTENCIES = [0.8, 0.6, 0.3, 0.9, 1.0, 0.2]
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def play_turn(simulator, turn):
+    team = ["Red", "Blue"][turn % 2]
+    simulator.set_message(team, Message(team=team, potency=0.0,
+                                        content=f"Potency = {POTENCIES[turn]}",
+                                        active_nodes=[], steps_remaining=0))
+    simulator.step_simulation()
+
+
+def play(random_seed, **kwargs):
+    simulator = Simulator(num_nodes=200, random_seed=random_seed,
+                          use_random_start_alignments=True, **kwargs)
+    for turn in range(len(POTENCIES)):
+        play_turn(simulator, turn)
+    return snapshot(simulator)
+
+
+def snapshot(simulator):
+    state = simulator.state
+    return (state.alignment.tobytes(), state.uncertainty.tobytes(),
+            state.alienated.tobytes(), tuple(simulator.G.edges))
+
+
+class TestRandomStreams(unittest.TestCase):
+    def test_interleaved_simulators(self):
+        """
+        Stepping two simulators in turn gives the same games as running
+        each on its own.
+        """
+        for engine in ["loop", "csr"]:
+            expected = [play(seed, diffusion_engine=engine) for seed in [1, 2]]
+            simulators = [Simulator(num_nodes=200, random_seed=seed, diffusion_engine=engine,
+                                    use_random_start_alignments=True) for seed in [1, 2]]
+            for turn in range(len(POTENCIES)):
+                for simulator in simulators:
+                    play_turn(simulator, turn)
+            self.assertEqual([snapshot(s) for s in simulators], expected)
+
+    def test_threads_are_reproducible(self):
+        """
+        Games seeded from spawned SeedSequences are bit-identical across
+        threads and runs, and independent of each other.
+        """
+        seeds = np.random.SeedSequence(7).spawn(4)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            first = list(executor.map(lambda seed: play(seed, diffusion_engine="csr"), seeds))
+            second = list(executor.map(lambda seed: play(seed, diffusion_engine="csr"), seeds))
+        self.assertEqual(first, second)
+        self.assertEqual(len({game[:3] for game in first}), 4)
+
+    def test_global_state_untouched(self):
+        random.seed(3)
+        np.random.seed(3)
+        expected = (random.random(), np.random.random())
+        random.seed(3)
+        np.random.seed(3)
+        play(5)
+        self.assertEqual((random.random(), np.random.random()), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
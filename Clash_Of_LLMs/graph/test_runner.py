@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from Clash_Of_LLMs import app, routes
+from Clash_Of_LLMs import run
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.runner import play_game, to_message
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+SCENARIO = {
+    "seed": 7,
+    "simulator": {"steps_per_turn": 2},
+    "network": {"network_type": "erdos_renyi", "n": 80, "uncertainty": 0.5, "er_probability": 0.08},
+    "messages": [
+        {"team": "Red", "potency": 0.8, "content": "Vote Red"},
+        {"team": "Blue", "potency": 0.4},
+        {"team": "Red", "potency": 1.0},
+    ],
+}
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+class TestRunner(unittest.TestCase):
+    def test_to_message(self):
+        team, message = to_message(("Blue", 0.3))
+        self.assertEqual(team, "Blue")
+        self.assertEqual(message.content, "Potency = 0.3")
+        simulator = Simulator(num_nodes=20)
+        simulator.set_message(team, message)
+        self.assertEqual(message.potency, 0.3)
+
+    def test_play_game(self):
+        rows = play_game(Simulator(num_nodes=60), [("Red", 0.8), ("Blue", 0.5), ("Red", 0.9)])
+        self.assertEqual([row["Turn"] for row in rows], [1, 2, 3])
+        self.assertEqual([row["Step"] for row in rows], [2, 4, 6])
+        self.assertEqual(rows[1]["CurrentTeam"], "Blue")
+        self.assertLess(rows[1]["BlueEnergy"], 70)
+
+    def test_blue_energy_ends_game(self):
+        rows = play_game(Simulator(num_nodes=60), [("Red", 0.5), ("Blue", 1.0)] * 10)
+        self.assertLessEqual(rows[-1]["BlueEnergy"], 0)
+        self.assertLess(len(rows), 20)
+
+
+class TestRunCommand(unittest.TestCase):
+    def run_command(self, *args):
+        with tempfile.TemporaryDirectory() as path:
+            scenario = os.path.join(path, "scenario.json")
+            with open(scenario, "w") as f:
+                json.dump(SCENARIO, f)
+            out = io.StringIO()
+            with redirect_stdout(out), redirect_stderr(io.StringIO()):
+                self.assertEqual(run.main([scenario, *args]), 0)
+            return out.getvalue()
+
+    def test_csv_and_jsonl(self):
+        rows = list(csv.DictReader(io.StringIO(self.run_command())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["CurrentMessageContent"], "Red message, Vote Red Potency = 0.8")
+        self.assertEqual(sum(int(rows[2][key]) for key in ["Red", "Blue", "Neutral"]), 80)
+
+        lines = self.run_command("--format", "jsonl").splitlines()
+        self.assertEqual([json.loads(line)["Red"] for line in lines], [int(row["Red"]) for row in rows])
+
+    def test_seed_override(self):
+        self.assertEqual(self.run_command("--seed", "3"), self.run_command("--seed", "3"))
+        self.assertNotEqual(self.run_command("--seed", "3"), self.run_command())
+
+    def test_invalid_scenario(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"messages": [{"team": "Green", "potency": 0.5}]}, f)
+        try:
+            with self.assertRaises(ValueError):
+                run.load_scenario(f.name)
+        finally:
+            os.remove(f.name)
+
+
+class TestGetUpdateRoute(unittest.TestCase):
+    def test_get_update(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-get-update")
+        game.set_simulator(Simulator(num_nodes=10, edge_probability=0.5))
+        headers = {"X-Game-Id": game.game_id}
+        client.post("/submit_user_message", json={"message": "Potency = 0.6", "team": "red"}, headers=headers)
+        with redirect_stdout(io.StringIO()):
+            update = client.get("/get_update", headers=headers).get_json()
+        self.assertEqual(update["status"], "running")
+        self.assertEqual(update["current_step"], 2)
+        self.assertEqual(update["stats"]["CurrentTeam"], "Red")
+        self.assertEqual(game.stats_table[-1], update["stats"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from Clash_Of_LLMs import app, routes
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.simulator import Simulator
+from Clash_Of_LLMs.sessions import SessionRegistry
+
+NETWORK = {
+    "graph_type": "erdos_renyi",
+    "uncertainty": 0.5,
+    "n": 40,
+    "er_probability": 0.1,
+    "ba_connections": 2,
+    "ws_neighbours": 4,
+    "ws_rewire_probability": 0.1,
+}
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+class TestSessionRegistry(unittest.TestCase):
+    def test_lru_eviction(self):
+        registry = SessionRegistry(max_sessions=2)
+        first = registry.get_or_create("a")
+        registry.get_or_create("b")
+        self.assertIs(registry.get_or_create("a"), first)
+        registry.get_or_create("c")
+        # "b" was the least recently used
+        self.assertEqual(set(registry._sessions), {"a", "c"})
+        self.assertEqual(registry.evictions, 1)
+        self.assertIsNot(registry.get_or_create("b"), registry.get("a"))
+
+    def test_idle_timeout(self):
+        registry = SessionRegistry(idle_timeout=60)
+        old = registry.get_or_create("old")
+        old.last_used -= 120
+        registry.get_or_create("new")
+        self.assertNotIn("old", registry)
+        self.assertIn("new", registry)
+
+    def test_memory_budget(self):
+        registry = SessionRegistry(memory_budget=None)
+        for game_id in ["a", "b", "c"]:
+            registry.get_or_create(game_id).set_simulator(Simulator(num_nodes=2000))
+        per_session = registry.get("a").nbytes
+        self.assertGreater(per_session, 0)
+        registry.memory_budget = int(2.5 * per_session)
+        self.assertEqual(registry.evict(keep="a"), ["b"])
+        self.assertEqual(set(registry._sessions), {"c", "a"})
+        self.assertLessEqual(registry.memory_used(), registry.memory_budget)
+
+    def test_existing_sessions_are_evicted(self):
+        registry = SessionRegistry()
+        registry.get_or_create("a")
+        registry.get_or_create("b")
+        registry.memory_budget = registry.memory_used() + 1000
+        # A session that grows past the budget is evicted on a lookup,
+        # even of a session that already exists, once memory is due to
+        # be measured again
+        registry.get("a").set_simulator(Simulator(num_nodes=2000))
+        registry.get_or_create("b")
+        self.assertEqual(set(registry._sessions), {"a", "b"})
+        registry._memory_checked -= registry.memory_check_interval
+        registry.get_or_create("b")
+        self.assertEqual(set(registry._sessions), {"b"})
+
+        registry.idle_timeout = 60
+        registry.get_or_create("c").last_used -= 120
+        registry.get_or_create("b")
+        self.assertNotIn("c", registry)
+        self.assertEqual(registry.evictions, 2)
+
+    def test_game_ids(self):
+        registry = SessionRegistry()
+        session = registry.get_or_create("not a valid id!")
+        self.assertNotEqual(session.game_id, "not a valid id!")
+        self.assertEqual(len(registry.get_or_create(None).game_id), 32)
+
+
+class TestSessionRoutes(unittest.TestCase):
+    def test_games_are_separate(self):
+        alice, bob = app.test_client(), app.test_client()
+        with redirect_stdout(io.StringIO()):
+            response = alice.post("/generate_network", json=NETWORK)
+        self.assertEqual(len(response.get_json()["graph"]["nodes"]), 40)
+        self.assertIn("game_id=", response.headers["Set-Cookie"])
+
+        # Bob's game is not replaced by Alice's network
+        self.assertEqual(len(bob.get("/initial_graph").get_json()["graph"]["nodes"]), 10)
+        self.assertEqual(len(alice.get("/initial_graph").get_json()["graph"]["nodes"]), 40)
+
+        alice.post("/submit_user_message", json={"message": "Potency = 0.6", "team": "red"})
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(alice.get("/get_update").get_json()["current_step"], 2)
+            bob.post("/submit_user_message", json={"message": "Potency = 0.6", "team": "red"})
+            self.assertEqual(bob.get("/get_update").get_json()["current_step"], 2)
+
+    def test_new_network_is_evicted_over_budget(self):
+        client = app.test_client()
+        client.get("/initial_graph")
+        budget = routes.sessions.memory_budget
+        routes.sessions.memory_budget = routes.sessions.memory_used()
+        try:
+            # The larger network pushes the least recently used games out
+            with redirect_stdout(io.StringIO()):
+                client.post("/generate_network", json=NETWORK)
+            self.assertLessEqual(routes.sessions.memory_used(), routes.sessions.memory_budget)
+            self.assertIn(client.get_cookie("game_id").value, routes.sessions)
+        finally:
+            routes.sessions.memory_budget = budget
+
+    def test_login_is_per_session(self):
+        alice, bob = app.test_client(), app.test_client()
+        alice.get("/initial_graph")
+        with redirect_stdout(io.StringIO()):
+            alice.post("/login", json={"username": "guest", "password": "password"})
+        self.assertIn(b"graph-plot", alice.get("/game").data)
+        self.assertNotIn(b"graph-plot", bob.get("/game").data)
+
+
+if __name__ == "__main__":
+    unittest.main()
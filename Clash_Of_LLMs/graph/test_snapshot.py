@@ -0,0 +1,123 @@
+import io
+import os
+import tempfile
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.csr import CSRGraph
+from Clash_Of_LLMs.graph.node_state import ATTRIBUTES
+from Clash_Of_LLMs.graph.runner import to_message
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def play(simulator, turns, start=0):
+    """
+    Play turns, returning the state arrays and stats after each.
+    """
+    states = []
+    for turn in range(start, start + turns):
+        simulator.set_message(*to_message((["Red", "Blue"][turn % 2], [0.9, 0.4, 0.7][turn % 3])))
+        simulator.step_simulation()
+        states.append(
+            ({field: getattr(simulator.state, field).copy() for field in ATTRIBUTES}, simulator.get_stats())
+        )
+    return states
+
+
+class PlayTestCase(unittest.TestCase):
+    def assertSamePlay(self, first, second):
+        self.assertEqual(len(first), len(second))
+        for (arrays, stats), (other_arrays, other_stats) in zip(first, second):
+            for field in ATTRIBUTES:
+                np.testing.assert_array_equal(arrays[field], other_arrays[field])
+            self.assertEqual(stats, other_stats)
+
+
+class TestSnapshot(PlayTestCase):
+    def test_restore_continues_game(self):
+        for options in [{}, {"diffusion_engine": "csr", "graph_generator": "native"}]:
+            simulator = Simulator(num_nodes=200, **options)
+            simulator.G
+            play(simulator, 5)
+            file = io.BytesIO()
+            simulator.snapshot(file)
+            file.seek(0)
+            restored = Simulator.restore(file)
+            self.assertEqual(restored.current_step, simulator.current_step)
+            self.assertEqual(restored.history, simulator.history)
+            self.assertEqual(restored.blue_energy, simulator.blue_energy)
+            self.assertEqual(
+                [message.active_nodes for message in restored.active_messages],
+                [message.active_nodes for message in simulator.active_messages],
+            )
+            self.assertIs(restored.current_message, restored.current_messages["Red"])
+            self.assertSamePlay(play(simulator, 10, 5), play(restored, 10, 5))
+
+    def test_file(self):
+        simulator = Simulator(num_nodes=50, network_type="barabasi_albert", use_random_start_alignments=True)
+        simulator.set_network(nx.relabel_nodes(simulator.G, {node: f"n{node}" for node in simulator.G}))
+        simulator.initialize_node_attributes()
+        simulator.G.nodes["n3"]["label"] = "hub"
+        play(simulator, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "game")
+            simulator.snapshot(path)
+            restored = Simulator.restore(path + ".npz", record_history=True)
+        self.assertEqual(restored.csr.labels, simulator.csr.labels)
+        self.assertEqual(restored.G.nodes["n3"]["label"], "hub")
+        self.assertEqual(restored.checkpoints.steps, [6])
+        self.assertSamePlay(play(simulator, 4, 3), play(restored, 4, 3))
+
+        with self.assertRaises(ValueError):
+            file = io.BytesIO()
+            np.savez(file, indptr=np.zeros(1))
+            file.seek(0)
+            Simulator.restore(file)
+
+
+class TestFork(PlayTestCase):
+    def test_fork_is_independent(self):
+        simulator = Simulator(num_nodes=200, record_history=True)
+        play(simulator, 4)
+        fork = simulator.fork()
+        # The network is shared, the state is not
+        self.assertIs(fork.csr, simulator.csr)
+        self.assertIs(fork.G._adj, simulator.G._adj)
+        self.assertIsNot(fork.state.alignment, simulator.state.alignment)
+        self.assertEqual(fork.checkpoints.steps, [8])
+        self.assertIsNone(simulator.fork(record_history=False).checkpoints)
+
+        # A different what-if on the fork leaves the original untouched
+        for item in [("Red", 0.1), ("Blue", 0.95)]:
+            fork.set_message(*to_message(item))
+            fork.step_simulation()
+        control = Simulator(num_nodes=200)
+        self.assertSamePlay(play(simulator, 6, 4), play(control, 10)[4:])
+        self.assertEqual(fork.current_step, 12)
+        # and the same moves on a fork play out as on the original
+        self.assertSamePlay(play(control.fork(), 3, 10), play(control, 3, 10))
+
+class TestToNetworkx(unittest.TestCase):
+    def test_neighbour_order(self):
+        G = nx.watts_strogatz_graph(100, 4, 0.3, seed=1)
+        rebuilt = CSRGraph.from_networkx(G).to_networkx()
+        self.assertEqual(list(rebuilt.nodes), list(G.nodes))
+        for node in G:
+            self.assertEqual(list(rebuilt.neighbors(node)), list(G.neighbors(node)))
+        neighbour = next(iter(G[0]))
+        self.assertIs(rebuilt[0][neighbour], rebuilt[neighbour][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
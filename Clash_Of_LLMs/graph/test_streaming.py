@@ -0,0 +1,141 @@
+import json
+import queue
+import unittest
+
+from Clash_Of_LLMs import app, routes
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.runner import to_message
+from Clash_Of_LLMs.graph.simulator import Simulator
+from Clash_Of_LLMs.streaming import Autoplayer, sse_events
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+def next_update(subscriber, timeout=10):
+    """
+    Next update with graph data, skipping status changes.
+    """
+    while True:
+        event = subscriber.get(timeout=timeout)
+        if "data" in event:
+            return event
+
+
+class TestAutoplayer(unittest.TestCase):
+    def setUp(self):
+        self.simulator = Simulator(num_nodes=60)
+        self.autoplayer = Autoplayer(self.simulator, delay=0)
+
+    def tearDown(self):
+        self.autoplayer.close()
+
+    def test_step(self):
+        subscriber = self.autoplayer.subscribe()
+        snapshot = subscriber.get(timeout=10)
+        self.assertTrue(snapshot["data"]["full"])
+        self.assertEqual(len(snapshot["data"]["nodes"]), 60)
+
+        self.simulator.set_message(*to_message(("Red", 0.8)))
+        self.autoplayer.step()
+        update = next_update(subscriber)
+        self.assertEqual(update["status"], "running")
+        self.assertEqual(update["current_step"], 2)
+        self.assertEqual(update["stats"]["CurrentTeam"], "Red")
+        self.assertFalse(update["data"]["full"])
+        self.assertTrue(all(node["alignment"] == "Red" for node in update["data"]["nodes"]))
+        # Viewers never advance the game
+        self.assertEqual(self.simulator.current_step, 2)
+
+    def test_resume_waits_for_fresh_messages(self):
+        played = []
+        self.autoplayer.on_stats = played.append
+        subscriber = self.autoplayer.subscribe()
+        subscriber.get(timeout=10)  # The full graph
+        self.autoplayer.resume()
+        for item in [("Red", 0.8), ("Blue", 0.4), ("Red", 0.6)]:
+            self.simulator.set_message(*to_message(item))
+            self.autoplayer.notify()
+            self.assertEqual(next_update(subscriber)["stats"]["CurrentTeam"], item[0])
+        # Red's message was played, and Blue has no new one
+        with self.assertRaises(queue.Empty):
+            next_update(subscriber, timeout=0.3)
+        self.assertEqual(len(played), 3)
+        self.assertEqual(self.simulator.turns_completed, 3)
+
+    def test_controls(self):
+        with self.assertRaises(ValueError):
+            self.autoplayer.control("rewind")
+        with self.assertRaises(ValueError):
+            self.autoplayer.control(None, delay=-1)
+        self.autoplayer.control("resume", delay=0.5)
+        self.assertEqual((self.autoplayer.status, self.autoplayer.delay), ("running", 0.5))
+        self.autoplayer.control("pause")
+        self.assertEqual(self.autoplayer.status, "paused")
+
+    def test_sse_events(self):
+        events = sse_events(self.autoplayer)
+        self.assertEqual(next(events), "retry: 1000\n\n")
+        event = next(events)
+        self.assertTrue(event.startswith("event: update\ndata: "))
+        self.assertEqual(json.loads(event.split("data: ", 1)[1])["status"], "paused")
+        self.autoplayer.close()
+        self.assertEqual(json.loads(next(events).split("data: ", 1)[1])["status"], "closed")
+        with self.assertRaises(StopIteration):
+            next(events)
+
+
+class TestStreamRoutes(unittest.TestCase):
+    def test_stream_and_control(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-stream")
+        game.set_simulator(Simulator(num_nodes=20, edge_probability=0.3))
+        response = client.get("/stream?game_id=test-stream")
+        self.assertEqual(response.mimetype, "text/event-stream")
+        chunks = iter(response.response)
+        next(chunks)
+        self.assertIn(b'"full": true', next(chunks))
+
+        headers = {"X-Game-Id": game.game_id}
+        client.post("/submit_user_message", json={"message": "Potency = 0.6", "team": "red"}, headers=headers)
+        self.assertEqual(client.post("/stream/control", json={"action": "step"}, headers=headers).status_code, 200)
+        self.assertIn(b'"current_step": 2', next(chunks))
+        self.assertEqual(len(game.stats_table), 1)
+        self.assertEqual(client.post("/stream/control", json={"action": "jump"}, headers=headers).status_code, 400)
+        response.close()
+        routes.sessions.remove(game.game_id)
+
+    def test_new_game_closes_streams(self):
+        client = app.test_client()
+        game = routes.sessions.get_or_create("test-stream-new-game")
+        old = Simulator(num_nodes=20, edge_probability=0.3)
+        game.set_simulator(old)
+        response = client.get("/stream?game_id=test-stream-new-game")
+        events = iter(response.response)
+        next(events)
+        next(events)
+
+        # The stream of the discarded game ends, and never plays it
+        old.set_message(*to_message(("Red", 0.6)))
+        game.set_simulator(Simulator(num_nodes=30, edge_probability=0.3))
+        self.assertIn(b'"status": "closed"', next(events))
+        with self.assertRaises(StopIteration):
+            next(events)
+        self.assertEqual(old.current_step, 0)
+        self.assertIsNone(game.autoplayer)
+
+        response = client.get("/stream?game_id=test-stream-new-game")
+        events = iter(response.response)
+        next(events)
+        self.assertEqual(len(json.loads(next(events).split(b"data: ", 1)[1])["data"]["nodes"]), 30)
+        response.close()
+        routes.sessions.remove(game.game_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import glob
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.runner import play_game
+from Clash_Of_LLMs.graph.simulator import Simulator
+from Clash_Of_LLMs.graph.sweep import (
+    grid_design,
+    latin_hypercube_design,
+    load_sweep,
+    random_design,
+    run_sweep,
+)
+
+MESSAGES = [("Red", 0.8), ("Blue", 0.5), ("Red", 1.0), ("Blue", 0.9)]
+
+
+def setUpModule():
+    simulator_module.debugging = False
+
+
+def tearDownModule():
+    simulator_module.debugging = True
+
+
+class TestDesigns(unittest.TestCase):
+    def test_grid(self):
+        design = grid_design({"steps_per_turn": [1, 2, 3], "network_type": ["erdos_renyi", "watts_strogatz"]})
+        self.assertEqual(len(design), 6)
+        self.assertIn({"steps_per_turn": 3, "network_type": "erdos_renyi"}, design)
+
+    def test_random(self):
+        design = random_design({"base_influence_prob": (0.2, 0.4), "steps_per_turn": (1, 3)}, 200, 1)
+        values = [point["base_influence_prob"] for point in design]
+        self.assertTrue(0.2 <= min(values) and max(values) < 0.4)
+        self.assertEqual({point["steps_per_turn"] for point in design}, {1, 2, 3})
+
+    def test_latin_hypercube(self):
+        """
+        Every stratum of every parameter is sampled exactly once.
+        """
+        design = latin_hypercube_design({"base_influence_prob": (0.0, 1.0),
+                                         "network_type": ["erdos_renyi", "watts_strogatz"]}, 10, 2)
+        strata = sorted(int(point["base_influence_prob"] * 10) for point in design)
+        self.assertEqual(strata, list(range(10)))
+        self.assertEqual(sum(point["network_type"] == "erdos_renyi" for point in design), 5)
+
+
+class TestRunSweep(unittest.TestCase):
+    design = grid_design({"base_influence_prob": [0.3, 0.6], "steps_per_turn": [1, 2]})
+
+    def sweep(self, path, **kwargs):
+        return run_sweep(self.design, MESSAGES, path, replicates=2, random_seed=3,
+                         num_nodes=60, **kwargs)
+
+    def test_results_and_resume(self):
+        with tempfile.TemporaryDirectory() as path:
+            results = self.sweep(path, max_workers=2, chunk_size=3)
+            self.assertEqual(results["task_id"].tolist(), list(range(8)))
+            self.assertEqual(results["steps_per_turn"].tolist(), [1, 1, 2, 2] * 2)
+            np.testing.assert_array_equal(results["Red"] + results["Blue"] + results["Neutral"], 60)
+            self.assertTrue(np.all(results["Turns"] == len(MESSAGES)))
+
+            # A run matches the same game played directly
+            simulator = Simulator(random_seed=np.random.SeedSequence(3, spawn_key=(5,)),
+                                  num_nodes=60, base_influence_prob=0.6, steps_per_turn=1)
+            self.assertEqual(results["Red"][5], play_game(simulator, MESSAGES)[-1]["Red"])
+
+            # Resuming after losing a chunk only replays the missing runs
+            chunks = sorted(glob.glob(os.path.join(path, "chunk-*.npz")))
+            os.remove(chunks[0])
+            resumed = self.sweep(path, max_workers=1)
+            for name, column in results.items():
+                np.testing.assert_array_equal(resumed[name], column)
+
+            # Nothing is replayed once the sweep is complete
+            chunks = sorted(glob.glob(os.path.join(path, "chunk-*.npz")))
+            self.sweep(path, max_workers=1)
+            self.assertEqual(sorted(glob.glob(os.path.join(path, "chunk-*.npz"))), chunks)
+            self.assertEqual(len(load_sweep(path)["task_id"]), 8)
+
+    def test_rejects_different_sweep(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.sweep(path, max_workers=1)
+            with self.assertRaises(ValueError):
+                run_sweep(self.design, MESSAGES[:2], path, replicates=2, random_seed=3)
+
+    def test_failed_chunk_keeps_the_others(self):
+        design = grid_design({"network_type": ["erdos_renyi", "unknown", "barabasi_albert"]})
+        with tempfile.TemporaryDirectory() as path:
+            with self.assertRaises(Exception):
+                run_sweep(design, MESSAGES[:2], path, max_workers=2, chunk_size=1, num_nodes=30)
+            self.assertEqual(load_sweep(path)["task_id"].tolist(), [0, 2])
+
+    def test_parameter_types(self):
+        with tempfile.TemporaryDirectory() as path:
+            results = run_sweep(grid_design({"network_type": ["erdos_renyi", "watts_strogatz"]}),
+                                MESSAGES[:2], path, max_workers=1, num_nodes=30)
+            self.assertEqual(results["network_type"].tolist(), ["erdos_renyi", "watts_strogatz"])
+
+            # Columns that would be pickled could not be loaded back
+            for values in [[0.5, None], [1, "2"]]:
+                with self.assertRaises(ValueError):
+                    run_sweep(grid_design({"base_influence_prob": values}), MESSAGES, os.path.join(path, "bad"))
+            self.assertFalse(os.path.exists(os.path.join(path, "bad")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,443 @@
+"""
+LLM calls for the Red and Blue teams (and for message validation).
+
+Calls run on a shared thread pool and return futures, so a request can
+issue several calls at once (e.g. Red, Blue and a validation) and wait
+for all of them together. Every call has a timeout: the provider SDK
+gives up on the request after it, and futures not started by then are
+cancelled.
+
+Providers are picked by the model name: a model name containing a key
+of PROVIDERS is served by that provider.
+
+Provider clients are pooled per API key, rate limited and retried (see
+llm_pool.py). Keys are read from OPENAI_API_KEY[_n] and
+GEMINI_API_KEY_n, when a provider is first used. Model names containing
+"local" are served offline by a deterministic stand-in (see
+llm_local.py), for load and latency tests.
+
+Replies are cached (see llm_cache.py) by model, prompt and sampling
+parameters. Pass fresh=True to sample a new reply anyway.
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+from openai import OpenAI
+
+from Clash_Of_LLMs.llm_cache import ResponseCache, default_cache_path, response_key
+from Clash_Of_LLMs.llm_local import local_complete, local_stream
+from Clash_Of_LLMs.llm_pool import KeyPool
+
+# Seconds before an LLM call is abandoned
+DEFAULT_TIMEOUT = float(os.getenv("CLASH_LLM_TIMEOUT", 30))
+MAX_WORKERS = int(os.getenv("CLASH_LLM_WORKERS", 16))
+
+# Set the generation configuration for Google models
+generation_config = {
+    "temperature": 2,
+    "top_p": 0.95,
+    "top_k": 64,
+    "max_output_tokens": 200,  # Control response length
+    "response_mime_type": "text/plain",
+}
+
+# Sampling parameters of each provider, part of the cache key
+SAMPLING = {
+    "gpt": {"temperature": 0.9, "max_tokens": 150},
+    "gemini": {
+        "temperature": generation_config["temperature"],
+        "max_tokens": generation_config["max_output_tokens"],
+    },
+}
+
+# Environment variable holding the API key of each Gemini model
+GEMINI_API_KEYS = {
+    "gemini-1.0-pro": "GEMINI_API_KEY_1",
+    "gemini-1.5-flash": "GEMINI_API_KEY_2",
+}
+
+# Calls per minute allowed on each API key
+RATE_LIMITS = {
+    "gpt": float(os.getenv("CLASH_OPENAI_RPM", 500)),
+    "gemini": float(os.getenv("CLASH_GEMINI_RPM", 15)),
+    "local": float(os.getenv("CLASH_LOCAL_RPM", 600000)),
+}
+
+# Providers whose replies are never cached: the local stand-in is free,
+# and load tests through it must exercise the whole call path
+UNCACHED = {"local"}
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="llm")
+_lock = threading.Lock()
+_pools = {}
+_gemini_models = {}
+
+# Reply cache. None disables it ($CLASH_LLM_CACHE_SIZE=0)
+cache = None
+if int(os.getenv("CLASH_LLM_CACHE_SIZE", 1024)) > 0:
+    cache = ResponseCache(
+        max_entries=int(os.getenv("CLASH_LLM_CACHE_SIZE", 1024)),
+        path=default_cache_path(),
+        ttl=float(os.getenv("CLASH_LLM_CACHE_TTL", 86400)),
+    )
+
+
+def api_keys(name):
+    """
+    API keys in the environment variables NAME and NAME_1, NAME_2, ...
+    (in that order), without duplicates.
+    """
+    pattern = re.compile(rf"^{name}(?:_(\d+))?$")
+    found = []
+    for variable, value in os.environ.items():
+        match = pattern.match(variable)
+        if match and value:
+            found.append((int(match.group(1) or 0), value))
+    return list(dict.fromkeys(value for _, value in sorted(found)))
+
+
+def make_openai_client(api_key):
+    # Retries are done by the KeyPool, which can move to another key
+    return OpenAI(api_key=api_key, max_retries=0)
+
+
+def make_gemini_client(api_key):
+    # genai.configure sets a process-wide client, so each key's client is
+    # built once under the lock and then bound to its models, and
+    # concurrent calls with different keys never use each other's client
+    with _lock:
+        genai.configure(api_key=api_key)
+        return genai_client.get_default_generative_client()
+
+
+def pool(name):
+    """
+    The KeyPool of a provider ("gpt" or "gemini"), created on first use
+    from the API keys in the environment.
+    """
+    with _lock:
+        if name not in _pools:
+            if name == "gpt":
+                _pools[name] = KeyPool("OpenAI", api_keys("OPENAI_API_KEY"), make_openai_client, RATE_LIMITS[name])
+            elif name == "gemini":
+                _pools[name] = KeyPool("Gemini", api_keys("GEMINI_API_KEY"), make_gemini_client, RATE_LIMITS[name])
+            elif name == "local":
+                _pools[name] = KeyPool("Local", ["local"], lambda key: None, RATE_LIMITS[name])
+            else:
+                raise ValueError(f"Invalid provider. Must be one of {', '.join(RATE_LIMITS)}.")
+        return _pools[name]
+
+
+def gemini_model(client, model_name):
+    """
+    The GenerativeModel of a model name, bound to a key's client, built
+    once per key and model.
+    """
+    with _lock:
+        if (id(client), model_name) not in _gemini_models:
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                generation_config=generation_config,
+            )
+            model._client = client
+            _gemini_models[(id(client), model_name)] = model
+        return _gemini_models[(id(client), model_name)]
+
+
+def openai_request(model_name, prompt):
+    return {
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": "You are in a debate simulation."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": SAMPLING["gpt"]["max_tokens"],
+        "temperature": SAMPLING["gpt"]["temperature"],
+    }
+
+
+def openai_complete(model_name, prompt, timeout):
+    def complete(client, remaining):
+        response = client.chat.completions.create(**openai_request(model_name, prompt), timeout=remaining)
+        return response.choices[0].message.content
+    return pool("gpt").call(complete, timeout)
+
+
+def openai_stream(model_name, prompt, timeout):
+    def open_stream(client, remaining):
+        return client.chat.completions.create(**openai_request(model_name, prompt), stream=True, timeout=remaining)
+    # Rate limits and retries apply to opening the stream, before any
+    # token has been relayed
+    for chunk in pool("gpt").call(open_stream, timeout):
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def gemini_complete(model_name, prompt, timeout):
+    if model_name not in GEMINI_API_KEYS:
+        raise ValueError("Unsupported model name for Gemini")
+
+    def complete(client, remaining):
+        response = gemini_model(client, model_name).generate_content(
+            prompt, request_options={"timeout": remaining}
+        )
+        return response.text
+    # Each model keeps to its own key while that key is within its limit
+    return pool("gemini").call(complete, timeout, preferred=os.getenv(GEMINI_API_KEYS[model_name]))
+
+
+def gemini_stream(model_name, prompt, timeout):
+    if model_name not in GEMINI_API_KEYS:
+        raise ValueError("Unsupported model name for Gemini")
+
+    def open_stream(client, remaining):
+        return gemini_model(client, model_name).generate_content(
+            prompt, stream=True, request_options={"timeout": remaining}
+        )
+    response = pool("gemini").call(open_stream, timeout, preferred=os.getenv(GEMINI_API_KEYS[model_name]))
+    for chunk in response:
+        # Chunks without text (e.g. the final one) raise on .text
+        text = "".join(part.text for part in chunk.parts) if chunk.parts else ""
+        if text:
+            yield text
+
+
+def local_provider_complete(model_name, prompt, timeout):
+    # Through a KeyPool, so injected failures are retried and latencies
+    # recorded just like the real providers'
+    return pool("local").call(lambda client, remaining: local_complete(model_name, prompt, remaining), timeout)
+
+
+def local_provider_stream(model_name, prompt, timeout):
+    yield from pool("local").call(lambda client, remaining: local_stream(model_name, prompt, remaining), timeout)
+
+
+def provider_stats():
+    """
+    Latency histograms and per-key call counts of the providers used so
+    far.
+    """
+    with _lock:
+        pools = dict(_pools)
+    return {name: key_pool.stats() for name, key_pool in pools.items()}
+
+
+# Model name substring -> function(model_name, prompt, timeout) -> text
+PROVIDERS = {
+    "gpt": openai_complete,
+    "gemini": gemini_complete,
+    "local": local_provider_complete,
+}
+
+# Model name substring -> function(model_name, prompt, timeout) -> iterator
+# of text chunks. Providers without one are streamed as a single chunk
+STREAMS = {
+    "gpt": openai_stream,
+    "gemini": gemini_stream,
+    "local": local_provider_stream,
+}
+
+
+def provider_key(model_name):
+    for key in PROVIDERS:
+        if key in (model_name or ""):
+            return key
+    raise ValueError(f"Invalid model name. Must contain one of {', '.join(PROVIDERS)}.")
+
+
+def provider(model_name):
+    return PROVIDERS[provider_key(model_name)]
+
+
+def cache_key(model_name, prompt):
+    return response_key(model_name, prompt, **SAMPLING.get(provider_key(model_name), {}))
+
+
+def _store(cache, key):
+    """
+    Done callback storing a reply in the cache that was in use when the
+    call was made, even if llm.cache has been replaced since.
+    """
+    def store(future):
+        if key is not None and not future.cancelled() and future.exception() is None and cache is not None:
+            cache.put(key, future.result())
+    return store
+
+
+def submit(model_name, prompt, timeout=None, fresh=False):
+    """
+    Start an LLM call.
+
+    Parameters
+    ----------
+    model_name : str
+        The model.
+    prompt : str
+        The prompt.
+    timeout : float, optional
+        Seconds before the provider gives up. The default is
+        DEFAULT_TIMEOUT.
+    fresh : bool, optional
+        Skip the cache and sample a new reply (which then replaces the
+        cached one). The default is False.
+
+    Returns
+    -------
+    concurrent.futures.Future
+        Future of the reply text, already done on a cache hit. Cancel it
+        to drop the call if it has not started yet.
+    """
+    complete = provider(model_name)
+    timeout = DEFAULT_TIMEOUT if timeout is None else float(timeout)
+    key = cache_key(model_name, prompt)
+    if provider_key(model_name) in UNCACHED:
+        fresh, key = True, None
+    if cache is not None and not fresh:
+        message = cache.get(key)
+        if message is not None:
+            future = Future()
+            future.set_result(message)
+            return future
+    future = _executor.submit(complete, model_name, prompt, timeout)
+    future.add_done_callback(_store(cache, key))
+    return future
+
+
+def generate(model_name, prompt, timeout=None, fresh=False):
+    """
+    Make an LLM call and wait for the reply.
+
+    Raises
+    ------
+    TimeoutError
+        If there is no reply within the timeout.
+    """
+    call = {"model_name": model_name, "prompt": prompt, "fresh": fresh}
+    return generate_many([call], timeout)[0].result()
+
+
+def stream(model_name, prompt, timeout=None, fresh=False):
+    """
+    Make an LLM call, yielding the reply's text as the provider streams
+    it, so the first words can be shown long before the reply is
+    complete. The complete reply is cached as a submit() reply is, and a
+    cached reply is yielded whole.
+
+    Parameters
+    ----------
+    model_name, prompt, timeout, fresh
+        As for submit.
+
+    Yields
+    ------
+    str
+        Chunks of the reply, which join up to the reply.
+
+    Raises
+    ------
+    TimeoutError
+        If the reply is not complete within the timeout.
+    """
+    key_name = provider_key(model_name)
+    if key_name not in STREAMS:
+        yield generate(model_name, prompt, timeout, fresh)
+        return
+    timeout = DEFAULT_TIMEOUT if timeout is None else float(timeout)
+    deadline = time.monotonic() + timeout
+    key = None if key_name in UNCACHED else cache_key(model_name, prompt)
+    # The cache in use when the call was made
+    replies = cache
+    if key is not None and replies is not None and not fresh:
+        message = replies.get(key)
+        if message is not None:
+            yield message
+            return
+
+    chunks = []
+    for text in STREAMS[key_name](model_name, prompt, timeout):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"LLM call timed out after {timeout:g} s")
+        chunks.append(text)
+        yield text
+    if key is not None and replies is not None:
+        replies.put(key, "".join(chunks))
+
+
+class Result:
+    """
+    Outcome of one call of a batch.
+
+    Attributes
+    ----------
+    message : str or None
+        The reply, if the call succeeded.
+    error : Exception or None
+        Why the call failed.
+    """
+
+    __slots__ = ("message", "error")
+
+    def __init__(self, message=None, error=None):
+        self.message = message
+        self.error = error
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.message
+
+
+def generate_many(calls, timeout=None):
+    """
+    Make several LLM calls at once and wait for all of them, within one
+    shared timeout. Calls still queued at the timeout are cancelled.
+
+    Parameters
+    ----------
+    calls : list
+        Dicts with the "model_name" and "prompt" of each call, and
+        optionally "fresh" (see submit).
+    timeout : float, optional
+        Seconds to wait for all the calls. The default is
+        DEFAULT_TIMEOUT.
+
+    Returns
+    -------
+    list
+        One Result per call, in order.
+
+    Raises
+    ------
+    ValueError
+        If a call is not a dict with a str model_name and prompt. Raised
+        before any call is made.
+    """
+    for call in calls:
+        if not (isinstance(call, dict) and isinstance(call.get("model_name"), str)
+                and isinstance(call.get("prompt"), str)):
+            raise ValueError("Invalid call. Must be an object with a model_name and a prompt (strings).")
+    timeout = DEFAULT_TIMEOUT if timeout is None else float(timeout)
+    futures = []
+    for call in calls:
+        try:
+            futures.append(submit(call.get("model_name"), call.get("prompt"), timeout, bool(call.get("fresh"))))
+        except ValueError as e:
+            futures.append(e)
+    done, not_done = wait([future for future in futures if not isinstance(future, Exception)], timeout=timeout)
+    results = []
+    for future in futures:
+        if isinstance(future, Exception):
+            results.append(Result(error=future))
+        elif future in not_done:
+            future.cancel()
+            results.append(Result(error=TimeoutError(f"LLM call timed out after {timeout:g} s")))
+        elif future.exception() is not None:
+            results.append(Result(error=future.exception()))
+        else:
+            results.append(Result(message=future.result()))
+    return results
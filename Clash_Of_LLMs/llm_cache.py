@@ -0,0 +1,209 @@
+"""
+Cache of LLM replies, so replays, demos and regression runs that send the
+same prompt again (e.g. the topic validation prompt) do not pay for, or
+wait on, another call.
+
+Replies are keyed by a hash of the model name, the full prompt and the
+sampling parameters. The cache has two tiers: a bounded in-memory LRU,
+and an optional SQLite database on disk that is shared between runs.
+Both expire entries after a time to live.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def default_cache_path():
+    """
+    Path of the SQLite database: $CLASH_LLM_CACHE, or
+    ~/.cache/clash_of_llms/llm_responses.sqlite. An empty
+    $CLASH_LLM_CACHE keeps the cache in memory only.
+    """
+    path = os.environ.get(
+        "CLASH_LLM_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "clash_of_llms", "llm_responses.sqlite"),
+    )
+    return path or None
+
+
+def response_key(model_name, prompt, temperature=None, max_tokens=None):
+    """
+    Cache key of a call.
+
+    Returns
+    -------
+    str
+        Hex digest.
+    """
+    description = json.dumps(
+        {
+            "model_name": model_name,
+            "prompt": prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM replies.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Size of the in-memory tier. The default is 1024.
+    path : str, optional
+        SQLite database of the on-disk tier. It is only opened when first
+        used, and only created when a reply is first stored. None keeps
+        the cache in memory only. The default is None.
+    ttl : float, optional
+        Seconds an entry is served for. None never expires. The default
+        is one day.
+
+    Attributes
+    ----------
+    hits, disk_hits, misses : int
+        Lookup counters. hits counts both tiers, disk_hits those found
+        on disk only.
+
+    Methods
+    -------
+    get(key)
+        Cached reply for a key, or None.
+    put(key, message)
+        Store a reply.
+    clear()
+        Drop every entry.
+    stats()
+        Counters and sizes, as a dict.
+    """
+
+    def __init__(self, max_entries=1024, path=None, ttl=86400.0):
+        self.max_entries = max_entries
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._opened = path is None
+
+    def _database(self, create=True):
+        """
+        The database, opened on first use. Lookups do not create it, so
+        a cache that never stores a reply leaves nothing on disk.
+        """
+        if not self._opened:
+            if not create and not os.path.exists(self.path):
+                return None
+            self._opened = True
+            self._db = self._connect(self.path)
+        return self._db
+
+    def _connect(self, path):
+        """
+        Open (or create) the database. Failures to open it leave the cache
+        in memory only, as the cache is only an optimisation.
+        """
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Calls finish on the LLM worker threads, so the connection
+            # is shared between threads, behind the lock
+            db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, message TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            if self.ttl is not None:
+                db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            return db
+        except (OSError, sqlite3.Error):
+            return None
+
+    def _fresh(self, created):
+        return self.ttl is None or time.time() - created <= self.ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._fresh(entry[1]):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            row = None
+            db = self._database(create=False)
+            if db is not None:
+                try:
+                    row = db.execute(
+                        "SELECT message, created FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+            if row is None or not self._fresh(row[1]):
+                self.misses += 1
+                return None
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key, message):
+        created = time.time()
+        with self._lock:
+            self._remember(key, message, created)
+            db = self._database()
+            if db is not None:
+                try:
+                    db.execute(
+                        "INSERT OR REPLACE INTO responses (key, message, created) VALUES (?, ?, ?)",
+                        (key, message, created),
+                    )
+                except sqlite3.Error:
+                    pass
+
+    def _remember(self, key, message, created):
+        self._memory[key] = (message, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            db = self._database(create=False)
+            if db is not None:
+                try:
+                    db.execute("DELETE FROM responses")
+                except sqlite3.Error:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            disk_entries = None
+            db = self._database(create=False)
+            if db is not None:
+                try:
+                    disk_entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
@@ -0,0 +1,165 @@
+"""
+Local stand-in for the LLM providers, for load and latency tests that
+must not call (or pay for) the real APIs.
+
+Replies are deterministic: the same prompt always gets the same message,
+ending with a parseable "Potency = 0.xx", and validation prompts get
+"True". Latency and failures are simulated from a profile, set by the
+environment (CLASH_LOCAL_LATENCY, CLASH_LOCAL_JITTER,
+CLASH_LOCAL_TOKEN_LATENCY, CLASH_LOCAL_FAILURE_RATE,
+CLASH_LOCAL_FAILURE_STATUS, CLASH_LOCAL_SEED) and overridden per call by
+a query string in the model name, e.g.
+"local?latency=0.5&jitter=0.2&failure_rate=0.1".
+"""
+import hashlib
+import os
+import random
+import re
+import time
+from urllib.parse import parse_qsl
+
+# Profile option -> type
+OPTIONS = {
+    "latency": float,
+    "jitter": float,
+    "failure_rate": float,
+    "failure_status": int,
+    "token_latency": float,
+}
+
+ARGUMENTS = (
+    "Consider the evidence carefully before you decide on",
+    "Communities that look closely keep coming back to",
+    "History shows again and again why people should support",
+    "Ask the people around you and you will hear the case for",
+    "Every honest look at the facts points towards",
+    "The strongest voices in this debate keep defending",
+)
+
+REASONS = (
+    "It protects the people who need protecting the most.",
+    "The alternative has failed every single time it was tried.",
+    "Look at who really benefits and the answer is clear.",
+    "Our neighbours deserve far better than more empty promises.",
+    "The numbers have told the same story for many years.",
+    "Nobody gains anything from ignoring what is right in front of us.",
+)
+
+# Words in a reply, as game.js counts them: it asks again for replies
+# outside 30 to 40 words
+MIN_WORDS, MAX_WORDS = 30, 40
+
+_random = random.Random(int(os.getenv("CLASH_LOCAL_SEED", 0)))
+
+
+class LocalProviderError(Exception):
+    """
+    Injected failure, with the HTTP status of the failure it stands in
+    for (so 429 and 5xx are retried like real ones).
+    """
+
+    def __init__(self, status_code):
+        super().__init__(f"Local provider injected failure (HTTP {status_code})")
+        self.status_code = status_code
+
+
+def default_profile():
+    return {
+        "latency": float(os.getenv("CLASH_LOCAL_LATENCY", 0)),
+        "jitter": float(os.getenv("CLASH_LOCAL_JITTER", 0)),
+        "failure_rate": float(os.getenv("CLASH_LOCAL_FAILURE_RATE", 0)),
+        "failure_status": int(os.getenv("CLASH_LOCAL_FAILURE_STATUS", 503)),
+        "token_latency": float(os.getenv("CLASH_LOCAL_TOKEN_LATENCY", 0)),
+    }
+
+
+def parse_profile(model_name):
+    """
+    The profile of a model name: the defaults, overridden by the options
+    in its query string.
+
+    Raises
+    ------
+    ValueError
+        If an option is unknown or not a number.
+    """
+    profile = default_profile()
+    _, _, query = model_name.partition("?")
+    for name, value in parse_qsl(query):
+        if name not in OPTIONS:
+            raise ValueError(f"Invalid local model option. Must be one of {', '.join(OPTIONS)}.")
+        profile[name] = OPTIONS[name](value)
+    return profile
+
+
+def local_message(prompt):
+    """
+    Deterministic reply to a prompt.
+    """
+    if 'Respond with "True"' in prompt:
+        return "True"
+    digest = int.from_bytes(hashlib.sha256(prompt.encode()).digest()[:8], "big")
+    topics = re.findall(r'Argue in favor of: "([^"]*)"', prompt)
+    topic = topics[-1].replace("=", "") if topics else "our position"
+    # Potencies 0.11 to 0.99, never ending in 0 (as the prompts ask)
+    tenths, hundredths = divmod(digest % 81, 9)
+    potency = ["Potency", "=", f"0.{tenths + 1}{hundredths + 1}"]
+
+    words = f'{ARGUMENTS[digest % len(ARGUMENTS)]} "{topic}".'.split(" ")
+    for i in range(len(REASONS)):
+        if len(words) + len(potency) >= MIN_WORDS:
+            break
+        words += REASONS[(digest // len(ARGUMENTS) + i) % len(REASONS)].split(" ")
+    return " ".join(words[:MAX_WORDS - len(potency)] + potency)
+
+
+def _respond(profile, timeout):
+    """
+    Wait out the simulated latency (to the first token), or fail as the
+    profile says.
+    """
+    delay = max(0.0, profile["latency"] + _random.uniform(-1, 1) * profile["jitter"])
+    if delay > timeout:
+        time.sleep(max(timeout, 0))
+        raise TimeoutError(f"Local provider timed out after {timeout:g} s")
+    time.sleep(delay)
+    if _random.random() < profile["failure_rate"]:
+        raise LocalProviderError(profile["failure_status"])
+
+
+def local_complete(model_name, prompt, timeout):
+    """
+    Reply to a prompt after the simulated latency of the model's profile,
+    or fail as the profile says.
+
+    Raises
+    ------
+    TimeoutError
+        If the simulated latency is longer than the timeout.
+    LocalProviderError
+        Injected failures.
+    """
+    profile = parse_profile(model_name)
+    _respond(profile, timeout)
+    message = local_message(prompt)
+    time.sleep(profile["token_latency"] * len(message.split(" ")))
+    return message
+
+
+def local_stream(model_name, prompt, timeout):
+    """
+    As local_complete, but returns an iterator of the reply's words
+    (tokens), one every token_latency seconds. The first token's latency
+    and the failures happen before this returns, as for a real stream.
+    """
+    profile = parse_profile(model_name)
+    _respond(profile, timeout)
+    return _tokens(local_message(prompt), profile["token_latency"])
+
+
+def _tokens(message, token_latency):
+    words = message.split(" ")
+    for i, word in enumerate(words):
+        if i:
+            time.sleep(token_latency)
+        yield word if i == 0 else f" {word}"
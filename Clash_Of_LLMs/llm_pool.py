@@ -0,0 +1,238 @@
+"""
+Provider clients shared by all LLM calls.
+
+Each provider has a KeyPool: one client per API key, built once and
+reused, so its HTTP connection pool is kept between calls. Calls are
+spread over the keys, each limited by its own token bucket, and calls
+that fail with a rate limit (429) or server error (5xx) are retried with
+jittered exponential backoff until the call's deadline. The latency of
+every call is recorded in a histogram per provider.
+"""
+import bisect
+import random
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limit.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    capacity : float, optional
+        Most tokens held, i.e. the largest burst. The default is one
+        minute of tokens.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = max(1.0, rate * 60 if capacity is None else capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now=None):
+        """
+        Seconds until a token is available.
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now=None):
+        """
+        Take a token if one is available.
+
+        Returns
+        -------
+        bool
+            Whether a token was taken.
+        """
+        if self.wait_time(now) > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LatencyHistogram:
+    """
+    Call counts by latency bucket, and by outcome.
+
+    Methods
+    -------
+    observe(seconds, outcome="ok")
+        Record a call.
+    snapshot()
+        The counts, as a dict.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.outcomes = {}
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, outcome="ok"):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def retried(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            count = sum(self.counts)
+            return {
+                "count": count,
+                "mean": self.total / count if count else 0.0,
+                "buckets": {
+                    **{f"le_{bound:g}": n for bound, n in zip(self.buckets, self.counts)},
+                    "le_inf": self.counts[-1],
+                },
+                "outcomes": dict(self.outcomes),
+                "retries": self.retries,
+            }
+
+
+def status_code(error):
+    """
+    HTTP status of a provider error (OpenAI errors have status_code,
+    Google API errors code), or None.
+    """
+    for name in ("status_code", "code"):
+        code = getattr(error, name, None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def retryable(error):
+    """
+    Whether a failed call is worth retrying: rate limited, or a server
+    error.
+    """
+    code = status_code(error)
+    return code is not None and (code == 429 or code >= 500)
+
+
+class KeyPool:
+    """
+    The API keys of a provider, with one client and one token bucket per
+    key.
+
+    Parameters
+    ----------
+    name : str
+        Provider name, for errors and stats.
+    keys : list
+        API keys.
+    make_client : callable
+        Builds the client of a key, called once per key.
+    rate_per_minute : float
+        Calls allowed per minute on each key.
+    retries : int, optional
+        Retries of a rate-limited or failed call. The default is 3.
+    backoff : float, optional
+        Base backoff (seconds) before a retry, doubled each retry and
+        jittered. The default is 0.5.
+
+    Methods
+    -------
+    call(function, timeout, preferred=None)
+        Call function(client, remaining_seconds) on a key, with rate
+        limiting and retries.
+    stats()
+        Latency histogram and per-key counters.
+    """
+
+    def __init__(self, name, keys, make_client, rate_per_minute, retries=3, backoff=0.5):
+        if not keys:
+            raise ValueError(f"Invalid {name} API keys. Must set at least one key.")
+        self.name = name
+        self.keys = list(keys)
+        self.make_client = make_client
+        self.buckets = {key: TokenBucket(rate_per_minute / 60) for key in self.keys}
+        self.calls = {key: 0 for key in self.keys}
+        self.retries = retries
+        self.backoff = backoff
+        self.latency = LatencyHistogram()
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def client(self, key):
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = self.make_client(key)
+            return self._clients[key]
+
+    def acquire(self, deadline, preferred=None, avoid=None):
+        """
+        A key with a free token: the preferred key if it has one, else
+        the least used key that has one. A key to avoid (e.g. one that
+        was just rate limited) is used last. Waits for a token until the
+        deadline.
+
+        Raises
+        ------
+        TimeoutError
+            If no key has a token before the deadline.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                order = sorted(self.keys, key=lambda key: (key == avoid, key != preferred, self.calls[key]))
+                for key in order:
+                    if self.buckets[key].take(now):
+                        self.calls[key] += 1
+                        return key
+                wait = min(self.buckets[key].wait_time(now) for key in self.keys)
+            if now + wait > deadline:
+                raise TimeoutError(f"{self.name} rate limit: no API key available before the timeout")
+            time.sleep(wait)
+
+    def call(self, function, timeout, preferred=None):
+        """
+        Call function(client, remaining_seconds) with the client of a free
+        key, retrying rate-limited and server errors with backoff (on
+        another key, if there is one), as long as the timeout allows.
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        attempt = 0
+        key = None
+        while True:
+            try:
+                key = self.acquire(deadline, preferred, avoid=key)
+                result = function(self.client(key), deadline - time.monotonic())
+            except Exception as e:
+                delay = self._random.uniform(0.5, 1.5) * self.backoff * 2**attempt
+                if attempt >= self.retries or not retryable(e) or time.monotonic() + delay > deadline:
+                    outcome = "timeout" if isinstance(e, TimeoutError) else status_code(e) or "error"
+                    self.latency.observe(time.monotonic() - start, str(outcome))
+                    raise
+                attempt += 1
+                self.latency.retried()
+                time.sleep(delay)
+                continue
+            self.latency.observe(time.monotonic() - start)
+            return result
+
+    def stats(self):
+        with self._lock:
+            calls = {f"key_{i + 1}": self.calls[key] for i, key in enumerate(self.keys)}
+        return {"latency": self.latency.snapshot(), "calls_per_key": calls}
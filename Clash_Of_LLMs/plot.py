@@ -6,6 +6,9 @@ import io
 import time
 import csv
 
+from Clash_Of_LLMs.graph import graph_io
+from Clash_Of_LLMs.graph.csr import CSRGraph
+
 blueSideColour = "#0571b0"
 redSideColour = "#ca0020"
 undecidedColour = "#bababa"
@@ -35,7 +38,8 @@ class GameGraph:
         
     def exportGraphAsCSV(self, outputPath):
         """
-        export the current graph as a CSV file
+        export the current graph as a CSV file, in the format importCSVGraph reads.
+        Rows are written in bulk (see graph_io.write_adjacency_csv)
         
         Args:
             outputPath (string): path to the output file
@@ -43,33 +47,13 @@ class GameGraph:
         Returns:
             Bool: True if the export is successful, False if an error occured
         """
-        # 'rows' key is the node name, and the value is an array of the node name, colour and edges
-        # rows structure example: {0: [0, 'red', '1,2'], 1: [1, 'grey', '0,'], 2: [2, 'blue', '1,']}
-        rows = {}
-        
-        # add the node colours to 'rows' and setup the node connections string
-        for node in self.graph.nodes.items():
-            # 'node' structure example: (0, {'color': 'red', 'size': 10})
-            # first value is it's name, second is a dictionary of node data
-            nodeName = node[0]
-            nodeColour = node[1]["color"]
-            rows[nodeName] = [nodeName, nodeColour, ""]
-        
-        # add all edges to the rows dictionary
-        for edge in self.graph.edges.items():
-            # 'edge' structure example: ((1, 4), {'width': 1})
-            # first value is a tuple if the source and destination node, second is a dictionary of edge data
-            nodeSource = edge[0][0]
-            nodeDestination = edge[0][1]
-            rows[nodeSource][2] += f"{nodeDestination},"
-        
+        # rows structure example: 0,red,"1,2," / 1,grey, / 2,blue,
+        # each edge is listed once, on the row of its first node
+        csr = CSRGraph.from_networkx(self.graph)
+        colours = [self.graph.nodes[node].get("color") for node in csr.labels]
         try:
-            # write the dictionary to a CSV file
-            with open(outputPath, 'w', newline='') as file: # newline='' is required, otherwise extra lines will be added to the CSV
-                csvwriter = csv.writer(file)
-                for row in rows.values():
-                    csvwriter.writerow(row)
-        except:
+            graph_io.write_adjacency_csv(csr, colours, outputPath)
+        except OSError:
             print("unable to write row to CSV export file.")      
             return False
     
@@ -88,46 +72,125 @@ class GameGraph:
             3,grey,"4,"
             4,red,"3,1"
         
+        The file is parsed in chunks into NumPy arrays and duplicate edges are merged in one step
+        (see graph_io.read_adjacency_csv). Names and connections are the same nodes: integers if
+        every name is an integer, otherwise strings.
+        
         Args:
             inputPath (string): path to the CSV file being imported
 
         Returns:
             Bool: true if importing succeeded, false if it failed
         """
-        self.graph = nx.Graph()
-        
         try:
-            with open(inputPath, 'r') as file:
-                csvreader = csv.reader(file)
-                for row in csvreader:
-                    if len(row) != 3:
-                        print("CSV isn't formatted correctly.")
-                        return False
-                    
-                    name = row[0]
-                    colour = row[1]
-                    connections = row[2]
-                    
-                    connectionsList = []
-                    try:
-                        for connection in connections.split(','):
-                            if connection == '': # prevents the extra comma from being added
-                                continue
-                            
-                            connectionsList.append(int(connection))
-                    except:
-                        print("CSV has an invalid connection.")
-                        return False
-                    
-                    self.graph.add_node(name, color=colour)
-                    for connection in connectionsList:
-                        self.graph.add_edge(name, connection)
-        except:
+            csr, colours = graph_io.read_adjacency_csv(inputPath)
+        except OSError:
             print("unable to open CSV file.")      
             return False
+        except ValueError as e:
+            print(f"CSV isn't formatted correctly. {e}")
+            return False
+        
+        self.loadCSRGraph(csr, colours)
+        return True
+    
+    def importEdgeList(self, inputPath, delimiter=None):
+        """
+        Import a graph from an edge list, one "source target" pair per line (e.g. a crawl dump).
+        Large files are parsed in chunks (see graph_io.read_edge_list). Nodes start undecided.
+
+        Args:
+            inputPath (string): path to the edge list
+            delimiter (string, optional): column separator (default is any whitespace)
+
+        Returns:
+            Bool: true if importing succeeded, false if it failed
+        """
+        try:
+            csr = graph_io.read_edge_list(inputPath, delimiter=delimiter)
+        except OSError:
+            print("unable to open edge list file.")
+            return False
+        except ValueError as e:
+            print(f"Edge list isn't formatted correctly. {e}")
+            return False
+        
+        self.loadCSRGraph(csr)
+        return True
+    
+    def exportEdgeList(self, outputPath, delimiter=" "):
+        """
+        export the current graph as an edge list, each edge once
+
+        Args:
+            outputPath (string): path to the output file
+            delimiter (string, optional): column separator (default is a space)
+
+        Returns:
+            Bool: True if the export is successful, False if an error occured
+        """
+        try:
+            graph_io.write_edge_list(CSRGraph.from_networkx(self.graph), outputPath, delimiter)
+        except OSError:
+            print("unable to write edge list export file.")
+            return False
+        
+        return True
+    
+    def importCSRGraph(self, inputPath, mmapMode=None):
+        """
+        Import a graph saved by exportCSRGraph (a CSR .npz file). Nodes start undecided.
+
+        Args:
+            inputPath (string): path to the .npz file
+            mmapMode (string, optional): "r" maps the arrays from the file instead of reading them (default is None)
+
+        Returns:
+            Bool: true if importing succeeded, false if it failed
+        """
+        try:
+            csr = graph_io.load_csr(inputPath, mmap_mode=mmapMode)
+        except (OSError, KeyError, ValueError):
+            print("unable to open CSR graph file.")
+            return False
         
+        self.loadCSRGraph(csr)
         return True
     
+    def exportCSRGraph(self, outputPath):
+        """
+        export the current graph as a compact binary CSR .npz file, which loads far faster than CSV
+
+        Args:
+            outputPath (string): path to the output file (".npz" is added if missing)
+
+        Returns:
+            Bool: True if the export is successful, False if an error occured
+        """
+        try:
+            graph_io.save_csr(CSRGraph.from_networkx(self.graph), outputPath)
+        except (OSError, ValueError):
+            print("unable to write CSR graph file.")
+            return False
+        
+        return True
+    
+    def loadCSRGraph(self, csr, colours=None):
+        """
+        load a CSR adjacency into the current graph
+
+        Args:
+            csr (CSRGraph): the graph to be loaded
+            colours (list, optional): colour of each node, None for undecided (default is all undecided)
+        """
+        self.graph = csr.to_networkx()
+        colours = [None] * csr.num_nodes if colours is None else colours
+        nx.set_node_attributes(
+            self.graph,
+            {node: undecidedColour if colour is None else colour for node, colour in zip(csr.labels, colours)},
+            "color",
+        )
+    
     def load_external_graph(self, external_graph):
         """
         load an external graph into the current graph
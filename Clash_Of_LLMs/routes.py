@@ -1,50 +1,69 @@
 from flask import jsonify, render_template, request
 from flask import json, render_template
-from flask import Flask, render_template, Response, send_file, make_response
-from Clash_Of_LLMs import app, plot
+from flask import Flask, render_template, Response, send_file, make_response, stream_with_context, g
+from Clash_Of_LLMs import app, export, plot
 from Clash_Of_LLMs.graph.simulator import Simulator
 from Clash_Of_LLMs.graph.message import Message
+from Clash_Of_LLMs.graph.node_state import ATTRIBUTES
+from Clash_Of_LLMs.graph.runner import advance
+from Clash_Of_LLMs import llm
+from Clash_Of_LLMs.sessions import SessionRegistry
+from Clash_Of_LLMs.streaming import sse_event, sse_events
 from flask import request, jsonify, render_template
 import csv
-import google.generativeai as genai
-from openai import OpenAI
 import os  # To get API keys from environment variables
 from os.path import relpath
 relpath('./CCLMs_Results.csv')
 from dotenv import load_dotenv
 load_dotenv()
 
-global simulator
-simulator = Simulator(num_nodes=10, edge_probability=0.5)
-
-# Get API keys from environment variables
-openai_api_key = os.getenv("OPENAI_API_KEY")
-gemini_api_key_1 = os.getenv("GEMINI_API_KEY_1")
-gemini_api_key_2 = os.getenv("GEMINI_API_KEY_2")
-
-# Ensure API keys are present
-if not openai_api_key:
-    raise ValueError("OpenAI API key not set in environment variables.")
-if not gemini_api_key_1 or not gemini_api_key_2:
-    raise ValueError("Google Gemini API keys not set in environment variables.")
-
-# Initialize OpenAI client with the API key from environment variables
-openai_client = OpenAI(api_key=openai_api_key)
-
-# Initialise csv contents
-stats_table = []
-logged_in = False
+# API keys are read from environment variables when a provider is first
+# used, so the app runs (e.g. with the "local" model) without them
+if not llm.api_keys("OPENAI_API_KEY"):
+    app.logger.warning("OpenAI API key not set in environment variables.")
+if not llm.api_keys("GEMINI_API_KEY"):
+    app.logger.warning("Google Gemini API keys not set in environment variables.")
+
+# Game sessions: each game id has its own simulator, stats table and
+# login (see sessions.py)
+max_sessions = os.getenv("CLASH_MAX_SESSIONS")
+sessions = SessionRegistry(
+    idle_timeout=float(os.getenv("CLASH_SESSION_IDLE_TIMEOUT", 3600)),
+    max_sessions=int(max_sessions) if max_sessions else None,
+    memory_budget=int(os.getenv("CLASH_SESSION_MEMORY_BUDGET", 2 * 1024**3)),
+)
+
+def current_session():
+    '''
+    The game session of the request. The game id comes from the
+    X-Game-Id header, the game_id query parameter or the game_id cookie,
+    in that order. Requests without one start a new game, and get its id
+    as a cookie.
+    '''
+    if 'game' not in g:
+        game_id = request.headers.get('X-Game-Id') or request.args.get('game_id')
+        g.game_id_in_cookie = game_id is None
+        if game_id is None:
+            game_id = request.cookies.get('game_id')
+        g.game = sessions.get_or_create(game_id)
+    return g.game
+
+@app.after_request
+def set_game_cookie(response):
+    game = g.get('game')
+    if game is not None and g.game_id_in_cookie and request.cookies.get('game_id') != game.game_id:
+        response.set_cookie('game_id', game.game_id, httponly=True, samesite='Lax')
+    return response
 
 @app.route('/login', methods=['POST'])
 def login():
-    global logged_in
     username = request.json.get('username')
     password = request.json.get('password')
     print("us", username, password)
 
     # Check if the credentials are valid
     if username == "guest" and password == "password":
-        logged_in = True
+        current_session().logged_in = True
         return {"message": "Logged in successfully"}, 200
 
     # Invalid credentials
@@ -54,7 +73,7 @@ def login():
 
 @app.route('/game')
 def game():
-    if logged_in:
+    if current_session().logged_in:
         # Pass the graph data to the template
         return render_template('game.html', title="Game")
     else:
@@ -65,34 +84,42 @@ def game():
 def index():
     return render_template("home.html")
 
-# Set the generation configuration for Google models
-generation_config = {
-    "temperature": 2,
-    "top_p": 0.95,
-    "top_k": 64,
-    "max_output_tokens": 200,  # Control response length
-    "response_mime_type": "text/plain",
-}
-
-# Function to start the chat session for a specific model and API key (Google Gemini)
-def start_team_chat(model_name):
-    if model_name == "gemini-1.0-pro":
-        api_key = gemini_api_key_1
-    elif model_name == "gemini-1.5-flash":
-        api_key = gemini_api_key_2
-    else:
-        raise ValueError("Unsupported model name for Gemini")
-
-    # Configure the API key for Google Gemini
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel(
-        model_name=model_name,
-        generation_config=generation_config,
-    )
-    return model.start_chat()
+def set_generated_message(team, message):
+    '''
+    Set an LLM message as the team's message in the game of the request,
+    if it states a potency (replies without one, such as validations,
+    are only returned).
+    '''
+    if not team or "Potency" not in message:
+        return
+    game = current_session()
+    with game.lock:
+        # Create a message object with default potency and active nodes
+        message_obj = Message(
+            team=team.capitalize(),
+            content=message,
+            potency = 0.0,
+            active_nodes = [],
+            steps_remaining = game.simulator.steps_per_turn            
+            )
+        app.logger.info(game.simulator.set_message(team=team, message=message_obj))
+    game.notify()
 
 @app.route('/generate_message', methods=['POST'])
 def generate_message():
+    '''
+    (POST) Generates a message with an LLM, and sets it as the team's
+    message if it states a potency.
+    
+    JSON body:
+    ----------
+        model_name, prompt, team (optional), timeout (seconds, optional),
+        fresh (optional, true skips the reply cache).
+    
+    Returns:
+    --------
+        JSON response with the message, or the error (504 on timeout).
+    '''
     data = request.json
     model_name = data.get('model_name')
     prompt = data.get('prompt')
@@ -100,45 +127,130 @@ def generate_message():
     app.logger.info(f"Received request with model: {model_name}, prompt: {prompt}, team: {team}")
     
     try:
-        if "gpt" in model_name:  # OpenAI model
-            response = openai_client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": "You are in a debate simulation."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=150,
-                temperature=0.9
-            )
-            message = response.choices[0].message.content
-            
-        elif "gemini" in model_name:  # Google Gemini models
-            chat_session = start_team_chat(model_name)
-            response = chat_session.send_message(prompt)
-            message = response.text
-        
+        message = llm.generate(model_name, prompt, timeout=data.get('timeout'), fresh=bool(data.get('fresh')))
 
         app.logger.info(f"Message: {message}")
         # Set the message in the simulator, this also updates the
         # active nodes and potency based on the message content
-        if "Potency" in message:
-        # Create a message object with default potency and active nodes
-            message_obj = Message(
-                team=team.capitalize(),
-                content=message,
-                potency = 0.0,
-                active_nodes = [],
-                steps_remaining = simulator.steps_per_turn            
-                )
-            app.logger.info(simulator.set_message(team=team, message=message_obj))
-        
-            
+        set_generated_message(team, message)
 
         return jsonify({'message': message, 'team': data.get('team')})
 
+    except TimeoutError as e:
+        app.logger.error(f"Error occurred: {str(e)}")
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         app.logger.error(f"Error occurred: {str(e)}")
         return jsonify({'error': str(e)}), 500
+
+@app.route('/generate_message/stream', methods=['POST'])
+def generate_message_stream():
+    '''
+    (POST) Streaming /generate_message: relays the LLM's reply as it is
+    generated, so the first words show without waiting for the whole
+    reply. Once the reply is complete, it is set as the team's message
+    (if it states a potency), once.
+    
+    JSON body:
+    ----------
+        As /generate_message.
+    
+    Returns:
+    --------
+        text/event-stream response: "token" events ({text}) as the reply
+        arrives, then a "done" event ({message, team}), or an "error"
+        event ({error, team}).
+    '''
+    data = request.json or {}
+    model_name = data.get('model_name')
+    prompt = data.get('prompt')
+    team = data.get('team')
+    app.logger.info(f"Received streaming request with model: {model_name}, prompt: {prompt}, team: {team}")
+    # The session (and its cookie) must be settled before streaming
+    current_session()
+
+    def events():
+        chunks = []
+        try:
+            for text in llm.stream(model_name, prompt, timeout=data.get('timeout'), fresh=bool(data.get('fresh'))):
+                chunks.append(text)
+                yield sse_event('token', {'text': text})
+            message = ''.join(chunks)
+            app.logger.info(f"Message: {message}")
+            set_generated_message(team, message)
+            yield sse_event('done', {'message': message, 'team': team})
+        except Exception as e:
+            app.logger.error(f"Error occurred: {str(e)}")
+            yield sse_event('error', {'error': str(e), 'team': team})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/generate_messages', methods=['POST'])
+def generate_messages():
+    '''
+    (POST) Generates several messages at once (e.g. Red, Blue and a
+    validation). The LLM calls run concurrently, and messages with a team
+    and a potency are set in the order given, as separate
+    /generate_message calls would.
+    
+    JSON body:
+    ----------
+        requests: list of {model_name, prompt, team (optional), fresh
+        (optional)}.
+        timeout: seconds to wait for all the calls (optional).
+    
+    Returns:
+    --------
+        JSON response with one result per request, in order: the
+        message, or the error.
+    '''
+    data = request.json or {}
+    calls = data.get('requests')
+    if not isinstance(calls, list) or not calls:
+        return jsonify({'status': 'error', 'message': "'requests' must be a non-empty list"}), 400
+    try:
+        results = llm.generate_many(calls, timeout=data.get('timeout'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    response = []
+    for call, result in zip(calls, results):
+        if result.error is not None:
+            app.logger.error(f"Error occurred: {str(result.error)}")
+            response.append({'error': str(result.error), 'team': call.get('team')})
+        else:
+            set_generated_message(call.get('team'), result.message)
+            response.append({'message': result.message, 'team': call.get('team')})
+    return jsonify({'results': response})
+
+@app.route('/llm_cache', methods=['GET'])
+def llm_cache_stats():
+    '''
+    (GET) Hit and miss counts of the LLM reply cache.
+    
+    Returns:
+    --------
+        JSON response with the cache stats, or enabled: false.
+    '''
+    if llm.cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **llm.cache.stats()})
+
+@app.route('/llm_stats', methods=['GET'])
+def llm_stats():
+    '''
+    (GET) Latency histograms, outcomes and retries of the LLM providers,
+    and calls per API key (keys are numbered, never shown).
+    
+    Returns:
+    --------
+        JSON response with the stats of each provider used so far.
+    '''
+    return jsonify({'providers': llm.provider_stats()})
     
 @app.route('/submit_user_message', methods=['POST'])
 def submit_user_message():
@@ -150,14 +262,17 @@ def submit_user_message():
     try:
         # Set the message in the simulator, this also updates the
         # active nodes and potency based on the message content
-        message_obj = Message(
-            team=team.capitalize(),
-            content=message,
-            potency = 0.0,
-            active_nodes = [],
-            steps_remaining = simulator.steps_per_turn            
-            )
-        app.logger.info(simulator.set_message(team=team, message=message_obj))
+        game = current_session()
+        with game.lock:
+            message_obj = Message(
+                team=team.capitalize(),
+                content=message,
+                potency = 0.0,
+                active_nodes = [],
+                steps_remaining = game.simulator.steps_per_turn            
+                )
+            app.logger.info(game.simulator.set_message(team=team, message=message_obj))
+        game.notify()
         
         return jsonify({'message': message, 'team': team})
 
@@ -233,8 +348,10 @@ def initial_graph():
     --------
         JSON response with the initial graph.
     '''
-    graph_data = simulator.get_graph_data()
-    stats = simulator.get_stats() # ! Need to implement this method in simulator.py
+    game = current_session()
+    with game.lock:
+        graph_data = game.simulator.get_graph_data(positions=True)
+        stats = game.simulator.get_stats() # ! Need to implement this method in simulator.py
     return jsonify({'graph': graph_data, 'stats': stats})
 
 
@@ -249,8 +366,9 @@ def start_simulation():
         JSON response with status: 'started'
     '''
     # Clear stats table
-    for entry in stats_table:
-        stats_table.remove(entry)
+    game = current_session()
+    with game.lock:
+        game.stats_table.clear()
     return jsonify({'status': 'started'})
     
 @app.route('/restart_simulation', methods=['GET'])
@@ -262,36 +380,119 @@ def restart_simulation():
     --------
         JSON response with status: 'started'
     '''
-    graph_data, stats, status = simulator.restart_simulation()
-    for entry in stats_table:
-        stats_table.remove(entry)
+    game = current_session()
+    with game.lock:
+        graph_data, stats, status = game.simulator.restart_simulation()
+        game.stats_table.clear()
+        graph_data = game.simulator.get_graph_data(positions=True)
     
-    return jsonify({'graph': simulator.get_graph_data(), 'stats': stats})
+    return jsonify({'graph': graph_data, 'stats': stats})
 
 @app.route('/get_update', methods=['GET'])
 def get_update():
     '''
     (GET) Returns the next update in the simulation.
     
+    Query parameters:
+    -----------------
+        since: graph version the client holds. Only the nodes changed
+        since then are returned, or the full graph if it is missing or
+        unknown (see Simulator.get_graph_delta).
+        fields: comma separated node attributes to follow (default all).
+    
     Returns:
     --------
         JSON response with the next update in the simulation.
     '''
-    update = simulator.step_simulation()
+    # Same turn logic and end conditions as the headless runner
+    since = request.args.get('since', type=int)
+    fields = request.args.get('fields')
+    fields = fields.split(',') if fields else None
+    if fields and any(field not in ATTRIBUTES for field in fields):
+        return jsonify({'status': 'error', 'message': f"Invalid field. Must be one of {', '.join(ATTRIBUTES)}."}), 400
+    game = current_session()
+    with game.lock:
+        status, update, stats = advance(game.simulator, delta=True, since=since, fields=fields)
+        if stats is not None:
+            game.stats_table.append(stats)
     try:
         print(f"Update: {update}")
         
-        if update['status'] == 'running':
-            stats = simulator.get_stats()
-            stats_table.append(stats)
-            if stats["BlueEnergy"] <= 0 or stats["AlienatedPercentage"] >= 100:
-                return jsonify({'status': 'finished', 'data': update.get('data', None), 'current_step': update.get('current_step', None)})
+        if status == 'running':
             return jsonify({'status': 'running', 'data': update['data'], 'current_step': update['current_step'], 'stats': stats})
         else:
             return jsonify({'status': 'finished', 'data': update.get('data', None), 'current_step': update.get('current_step', None)})
     except StopIteration:
         return jsonify({'status': 'finished', 'data': None, 'current_step': None})
 
+@app.route('/get_step', methods=['GET'])
+def get_step():
+    '''
+    (GET) Returns the state of the nodes at a past step of the game, to
+    rewind the network view. The game is not changed.
+    
+    Query parameters:
+    -----------------
+        step: the step, from 0 to the current step.
+        fields: comma separated node attributes (default all).
+    
+    Returns:
+    --------
+        JSON response with the step, its nodes and its population stats.
+    '''
+    step = request.args.get('step', type=int)
+    if step is None:
+        return jsonify({'status': 'error', 'message': "Invalid step. Must be an integer."}), 400
+    fields = request.args.get('fields')
+    fields = fields.split(',') if fields else None
+    game = current_session()
+    with game.lock:
+        try:
+            data = game.simulator.get_step_data(step, fields)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        current_step = game.simulator.current_step
+    return jsonify({'status': 'success', 'data': data, 'current_step': current_step})
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    '''
+    (GET) Server-Sent Events stream of the game. Sends the full graph
+    first, then an "update" event for every turn played by the
+    server-side autoplay, with the stats and the changed nodes.
+    
+    Returns:
+    --------
+        text/event-stream response.
+    '''
+    return Response(
+        stream_with_context(sse_events(current_session().get_autoplayer())),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/stream/control', methods=['POST'])
+def stream_control():
+    '''
+    (POST) Controls the server-side autoplay.
+    
+    JSON body:
+    ----------
+        action: 'pause', 'resume' or 'step' (optional).
+        delay: seconds between turns while running (optional).
+    
+    Returns:
+    --------
+        JSON response with the autoplay status and delay.
+    '''
+    params = request.json or {}
+    player = current_session().get_autoplayer()
+    try:
+        player.control(params.get('action'), params.get('delay'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': player.status, 'delay': player.delay})
+
 @app.route('/generate_network', methods=['POST'])
 def generate_network():
     '''
@@ -317,9 +518,9 @@ def generate_network():
     ws_neighbours = data['ws_neighbours']
     ws_rewire_probability = data['ws_rewire_probability']
     
-    global simulator
-    
-    simulator = Simulator(num_nodes=n, edge_probability=er_probability)
+    # Build the new game outside the session lock, so the old one can
+    # still be served meanwhile
+    simulator = Simulator(num_nodes=n, edge_probability=er_probability, record_history=True)
     simulator.create_network_custom(network_type=graph_type, 
                                     uncertainty=uncertainty, 
                                     n=n, 
@@ -329,33 +530,88 @@ def generate_network():
                                     ws_rewire_probability=ws_rewire_probability)
     simulator.initialize_simulation()
     
-    graph_data = simulator.get_graph_data()
-    stats = simulator.get_stats()
+    game = current_session()
+    with game.lock:
+        game.set_simulator(simulator)
+        graph_data = simulator.get_graph_data(positions=True)
+        stats = simulator.get_stats()
+    # The new game may be larger than the old one. Evicted outside the
+    # session lock, as closing a session takes its lock
+    sessions.evict(keep=game.game_id)
     print(f"Stats: {stats}")
     
     return jsonify({'status': 'success', 'graph': graph_data, 'stats': stats})
 
-def generate_csv():
-    csv_content = "sep=|\nTurn|Team|Message|Potency|Red Alignment|Blue Alignment|Neutral Alignment|Red Influence|Blue Energy\n"
-    turn_counter = 2
-    total_pop = stats_table[0]["Red"] + stats_table[0]["Blue"] + stats_table[0]["Neutral"]
-    for entry in stats_table:
-        csv_content += f"{turn_counter//2}|{entry['CurrentTeam']}|{entry['CurrentMessageContent']}|{entry['CurrentPotency']}|{entry['Red']}/{total_pop} ({entry['RedPercentage']}%)|{entry['Blue']}/{total_pop} ({entry['BluePercentage']}%)|{entry['Neutral']}/{total_pop} ({entry['NeutralPercentage']}%)|{total_pop - entry['Alienated']}/{total_pop} ({100 - entry['AlienatedPercentage']}%)|{entry['BlueEnergy']}\n"        
-        turn_counter += 1
-    return csv_content
-
 @app.route("/download_csv")
 def download_csv():
+    '''
+    (GET) The stats of every turn of the game as a "|" separated CSV
+    file, streamed a row at a time.
+    
+    Returns:
+    --------
+        text/csv attachment.
+    '''
+    game = current_session()
+    with game.lock:
+        stats_table = list(game.stats_table)
     if len(stats_table) == 0:
         return "Nothing to download"
-    csv_data = generate_csv() 
-    response = make_response(csv_data)
-    cd = 'attachment; filename=CLLMs_results.csv'
-    response.headers['Content-Disposition'] = cd 
-    response.mimetype='text/csv'
-
-    return response
+    return Response(
+        stream_with_context(export.stats_csv(stats_table)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=CLLMs_results.csv'},
+    )
 
+@app.route("/export", methods=['GET'])
+def export_results():
+    '''
+    (GET) Exports the game's results with typed columns, streamed as
+    they are written.
+    
+    Query parameters:
+    -----------------
+        table: 'stats' (default), the stats of every turn, or
+            'trajectories', the state of every node at every recorded
+            step.
+        format: 'csv' (default), 'ndjson', or, with pyarrow installed,
+            'parquet' or 'arrow' (an Arrow IPC stream).
+        fields: comma separated node attributes of the trajectories
+            (default all).
+    
+    Returns:
+    --------
+        File attachment in the format.
+    '''
+    table = request.args.get('table', 'stats')
+    format = request.args.get('format', 'csv')
+    fields = request.args.get('fields')
+    fields = fields.split(',') if fields else None
+    game = current_session()
+    try:
+        if table == 'stats':
+            with game.lock:
+                stats_table = list(game.stats_table)
+            columns, batches = export.stats_batches(stats_table)
+        elif table == 'trajectories':
+            with game.lock:
+                simulator = game.simulator
+                if simulator.checkpoints is None:
+                    raise ValueError("Invalid table. The game's node states are not recorded.")
+            columns, batches = export.trajectory_batches(
+                simulator.checkpoints, simulator.csr.labels, fields, lock=game.lock
+            )
+        else:
+            raise ValueError("Invalid table. Must be 'stats' or 'trajectories'.")
+        chunks = export.write(columns, batches, format)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    filename = f"CLLMs_{table}.{export.EXTENSIONS[format]}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=export.MIMETYPES[format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Headless batch runner: plays a scripted game at full speed, without
+Flask, and writes the stats after every update as CSV or JSONL.
+
+Usage
+-----
+    python -m Clash_Of_LLMs.run scenario.json [-o stats.csv] [--format jsonl]
+
+A scenario is a JSON file such as::
+
+    {
+        "seed": 42,
+        "simulator": {"base_influence_prob": 0.5, "steps_per_turn": 2},
+        "network": {"network_type": "watts_strogatz", "n": 200, "uncertainty": 0.5},
+        "messages": [
+            {"team": "Red", "potency": 0.8, "content": "..."},
+            {"team": "Blue", "potency": 0.4}
+        ]
+    }
+
+"simulator" holds Simulator parameters, "network" holds
+Simulator.create_network_custom parameters, and "messages" is played
+one message per turn until it runs out or the game ends (same end
+conditions as the /get_update route).
+"""
+import argparse
+import csv
+import json
+import sys
+
+from Clash_Of_LLMs.graph import simulator as simulator_module
+from Clash_Of_LLMs.graph.runner import iter_game
+from Clash_Of_LLMs.graph.simulator import Simulator
+
+FORMATS = ("csv", "jsonl")
+
+
+def load_scenario(path):
+    """
+    Read and check a scenario file.
+
+    Returns
+    -------
+    dict
+        The scenario, with defaults filled in.
+    """
+    with open(path) as f:
+        scenario = json.load(f)
+    if not isinstance(scenario.get("messages"), list) or not scenario["messages"]:
+        raise ValueError("Invalid scenario. 'messages' must be a non-empty list.")
+    for message in scenario["messages"]:
+        if message.get("team", "").capitalize() not in ["Red", "Blue"]:
+            raise ValueError("Invalid scenario. Message team must be 'Red' or 'Blue'.")
+        if not 0 <= float(message.get("potency", -1)) <= 1:
+            raise ValueError("Invalid scenario. Message potency must be between 0 and 1.")
+    scenario.setdefault("simulator", {})
+    scenario.setdefault("network", None)
+    scenario.setdefault("seed", 42)
+    return scenario
+
+
+def build_simulator(scenario):
+    """
+    Create the Simulator described by a scenario.
+    """
+    simulator = Simulator(random_seed=scenario["seed"], **scenario["simulator"])
+    if scenario["network"] is not None:
+        simulator.create_network_custom(**scenario["network"])
+    return simulator
+
+
+def write_stats(rows, out, output_format="csv"):
+    """
+    Write stats rows as they are produced.
+
+    Parameters
+    ----------
+    rows : iterable
+        Stats dicts (see runner.iter_game).
+    out : file
+        Text stream to write to.
+    output_format : str, optional
+        "csv" or "jsonl". The default is "csv".
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    if output_format not in FORMATS:
+        raise ValueError("Invalid format. Must be 'csv' or 'jsonl'.")
+    writer = None
+    count = 0
+    for row in rows:
+        if output_format == "jsonl":
+            out.write(json.dumps(row) + "\n")
+        else:
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m Clash_Of_LLMs.run",
+        description="Play a scripted Clash of LLMs game without the web UI.",
+    )
+    parser.add_argument("scenario", help="scenario JSON file")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="output format (default: from the output extension, else csv)")
+    parser.add_argument("--seed", type=int, help="override the scenario seed")
+    parser.add_argument("--debug", action="store_true", help="print simulator debugging output")
+    args = parser.parse_args(argv)
+
+    simulator_module.debugging = args.debug
+    scenario = load_scenario(args.scenario)
+    if args.seed is not None:
+        scenario["seed"] = args.seed
+    output_format = args.format
+    if output_format is None:
+        output_format = "jsonl" if args.output and args.output.endswith(".jsonl") else "csv"
+
+    simulator = build_simulator(scenario)
+    rows = iter_game(simulator, scenario["messages"])
+    if args.output:
+        with open(args.output, "w", newline="") as out:
+            count = write_stats(rows, out, output_format)
+    else:
+        count = write_stats(rows, sys.stdout, output_format)
+    print(f"Played {simulator.turns_completed} turns ({count} updates).", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
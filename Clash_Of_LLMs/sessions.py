@@ -0,0 +1,280 @@
+"""
+Game sessions: each player (or API client) gets a game id, and every
+game id its own Simulator, stats log and autoplay, so players never
+share or overwrite each other's games.
+
+Sessions are kept in least-recently-used order. On every lookup, a
+session that has been idle for longer than the idle timeout is evicted,
+as are the least recently used sessions whenever the number of sessions
+is over its limit. The same goes for their total memory, which is
+measured when a game is created or replaced, and every few seconds as
+games grow while they are played.
+"""
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from Clash_Of_LLMs.graph.simulator import Simulator
+from Clash_Of_LLMs.streaming import Autoplayer
+
+GAME_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_game_id():
+    return uuid.uuid4().hex
+
+
+def default_simulator():
+    """
+    Simulator of a new session, before a network is generated. Games
+    keep their history, so players can rewind them (see /get_step).
+    """
+    return Simulator(num_nodes=10, edge_probability=0.5, record_history=True)
+
+
+class GameSession:
+    """
+    State of one game.
+
+    Attributes
+    ----------
+    game_id : str
+        The game id.
+    simulator : Simulator
+        The game.
+    stats_table : list
+        Stats of every turn played, for the CSV download.
+    logged_in : bool
+        Whether the player has logged in.
+    lock : threading.RLock
+        Held while the game is read or changed, by requests and by the
+        autoplay thread.
+    last_used : float
+        time.monotonic() of the last access.
+
+    Methods
+    -------
+    get_autoplayer()
+        The autoplay of the current simulator.
+    set_simulator(simulator)
+        Replace the game.
+    close()
+        Stop the autoplay.
+    """
+
+    def __init__(self, game_id, simulator):
+        self.game_id = game_id
+        self.simulator = simulator
+        self.stats_table = []
+        self.logged_in = False
+        self.autoplayer = None
+        self.lock = threading.RLock()
+        self.last_used = time.monotonic()
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory held by the game.
+        """
+        return self.simulator.nbytes
+
+    def set_simulator(self, simulator):
+        """
+        Replace the game. The autoplay of the old game is closed, so its
+        streams end (and browsers reconnect to the new game) rather than
+        keep following a game that is no longer played.
+        """
+        with self.lock:
+            self.simulator = simulator
+            if self.autoplayer is not None:
+                self.autoplayer.close()
+                self.autoplayer = None
+
+    def get_autoplayer(self):
+        """
+        The Autoplayer of the current simulator, created when first asked
+        for (see set_simulator).
+        """
+        with self.lock:
+            if self.autoplayer is None:
+                self.autoplayer = Autoplayer(
+                    self.simulator, on_stats=self.stats_table.append, lock=self.lock
+                )
+            return self.autoplayer
+
+    def notify(self):
+        """
+        Wake the autoplay, if any, e.g. after a message has been set.
+        """
+        self.autoplayer.notify() if self.autoplayer is not None else None
+
+    def close(self):
+        with self.lock:
+            if self.autoplayer is not None:
+                self.autoplayer.close()
+                self.autoplayer = None
+
+
+class SessionRegistry:
+    """
+    Game sessions by game id, with idle timeout and LRU eviction.
+
+    Parameters
+    ----------
+    idle_timeout : float, optional
+        Seconds after which an unused session is evicted. None never
+        times out. The default is 3600.
+    max_sessions : int, optional
+        Largest number of sessions kept. None is unlimited. The default
+        is None.
+    memory_budget : int, optional
+        Largest total memory of the sessions (bytes, see
+        Simulator.nbytes). None is unlimited. The default is 2 GiB.
+    simulator_factory : callable, optional
+        Creates the simulator of a new session. The default is
+        default_simulator.
+    memory_check_interval : float, optional
+        Seconds between memory checks on lookups of existing sessions
+        (games grow as they are played). The default is 10.
+
+    Methods
+    -------
+    get(game_id)
+        The session of a game id, or None.
+    get_or_create(game_id)
+        The session of a game id, created if needed.
+    remove(game_id)
+        Close and remove a session.
+    evict()
+        Apply the eviction policy.
+    """
+
+    def __init__(
+        self,
+        idle_timeout=3600.0,
+        max_sessions=None,
+        memory_budget=2 * 1024**3,
+        simulator_factory=default_simulator,
+        memory_check_interval=10.0
+    ):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.memory_budget = memory_budget
+        self.simulator_factory = simulator_factory
+        self.memory_check_interval = memory_check_interval
+        self.evictions = 0
+        self._memory_checked = time.monotonic()
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, game_id):
+        return game_id in self._sessions
+
+    def get(self, game_id):
+        with self._lock:
+            session = self._sessions.get(game_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(game_id)
+            return session
+
+    def get_or_create(self, game_id=None):
+        """
+        The session of a game id, created with a new simulator if the id
+        is unknown (or evicted). An invalid or missing id gets a new
+        one. Idle and surplus sessions are evicted on every call, sparing
+        the session returned. Memory is checked when a session is
+        created, and otherwise at most every memory_check_interval
+        seconds, as it is measured session by session.
+
+        Returns
+        -------
+        GameSession
+            The session.
+        """
+        if game_id is None or not GAME_ID_PATTERN.match(game_id):
+            game_id = new_game_id()
+        session = self.get(game_id)
+        if session is not None:
+            due = time.monotonic() - self._memory_checked >= self.memory_check_interval
+            self.evict(keep=game_id, memory=due)
+            return session
+        # Build outside the registry lock, as networks can be slow
+        session = GameSession(game_id, self.simulator_factory())
+        with self._lock:
+            # Another request may have created it meanwhile
+            session = self._sessions.setdefault(game_id, session)
+            self._sessions.move_to_end(game_id)
+        self.evict(keep=game_id)
+        return session
+
+    def remove(self, game_id):
+        with self._lock:
+            session = self._sessions.pop(game_id, None)
+        if session is not None:
+            session.close()
+
+    def memory_used(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return sum(session.nbytes for session in sessions)
+
+    def evict(self, keep=None, memory=True):
+        """
+        Evict idle sessions, then the least recently used sessions until
+        the session count and memory are within their limits.
+
+        Parameters
+        ----------
+        keep : str, optional
+            Game id that is never evicted (the one being served).
+        memory : bool, optional
+            Whether to measure the sessions' memory, which costs a pass
+            over every session, e.g. after a game is created or
+            replaced. The default is True.
+
+        Returns
+        -------
+        list
+            Ids of the evicted sessions.
+        """
+        evicted = []
+        with self._lock:
+            now = time.monotonic()
+            # Oldest first, so the idle sessions come first
+            if self.idle_timeout is not None:
+                for game_id, session in list(self._sessions.items()):
+                    if now - session.last_used <= self.idle_timeout:
+                        break
+                    if game_id != keep:
+                        evicted.append(self._sessions.pop(game_id))
+            if self.max_sessions is not None:
+                for game_id in list(self._sessions):
+                    if len(self._sessions) <= self.max_sessions:
+                        break
+                    if game_id != keep:
+                        evicted.append(self._sessions.pop(game_id))
+            sessions = list(self._sessions.items()) if memory and self.memory_budget is not None else []
+            if memory:
+                self._memory_checked = now
+
+        # Measured outside the lock, so other requests are not held up
+        sizes = [(game_id, session, session.nbytes) for game_id, session in sessions]
+        total = sum(nbytes for _, _, nbytes in sizes)
+        if sizes and total > self.memory_budget:
+            with self._lock:
+                for game_id, session, nbytes in sizes:
+                    if total <= self.memory_budget:
+                        break
+                    if game_id != keep and self._sessions.get(game_id) is session:
+                        evicted.append(self._sessions.pop(game_id))
+                        total -= nbytes
+        for session in evicted:
+            session.close()
+        self.evictions += len(evicted)
+        return [session.game_id for session in evicted]
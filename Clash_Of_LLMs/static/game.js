@@ -2,7 +2,8 @@
 const modelNames = {
   "Gemini 1.0 Pro": "gemini-1.0-pro",
   "Gemini 1.5 Flash": "gemini-1.5-flash",
-  "ChatGPT 4o Mini": "gpt-4o-mini"
+  "ChatGPT 4o Mini": "gpt-4o-mini",
+  "Local (offline)": "local"
 };
 
 // Function to get the topics for both teams
@@ -105,6 +106,7 @@ let gameStarted = false;
 let network = null;
 let savedPositions = {};
 let savedEdges = {};
+let eventSource = null; // Server-Sent Events stream of the game (see /stream)
 
 function countWords(message) {
   return message.split(" ").filter(word => word.trim() !== "").length;
@@ -204,23 +206,20 @@ async function generateMessage(team, modelName, previousMessage, isFirstRedTurn)
 
   let message;
   let wordCount = 0;
+  let attempt = 0;
 
   try {
 	do {
-	  const response = await fetch("/generate_message", {
-		method: "POST",
-		headers: { "Content-Type": "application/json" },
-		body: JSON.stringify({
-		  team: team,
-		  model_name: modelName, // Model name sent to the backend
-		  prompt: promptWithPreviousMessage, // Full prompt sent to the backend
-		}),
+	  // Stream the message, showing it as it is written
+	  const result = await streamMessage(team, {
+		team: team,
+		model_name: modelName, // Model name sent to the backend
+		prompt: promptWithPreviousMessage, // Full prompt sent to the backend
+		fresh: attempt++ > 0, // A retry must not get the rejected reply back from the cache
 	  });
-
-	  const result = await response.json();
 	  console.log("Message generation response:", result);
 
-	  if (response.ok) {
+	  if (result.message !== undefined) {
 		message = result.message;
 		wordCount = countWords(message);
 		console.log(`${team} team message: ${message} (Word Count: ${wordCount})`);
@@ -230,7 +229,7 @@ async function generateMessage(team, modelName, previousMessage, isFirstRedTurn)
 	  }
 
 	  // Validate the message against the team's chosen topic
-	  const isValidMessage = await validateMessageAgainstTopic(message, teamTopic);
+	  const isValidMessage = await validateMessageAgainstTopic(message, teamTopic, modelName);
 
 	  if (!isValidMessage) {
 		console.log(`Invalid message detected for ${team} team. Regenerating message...`);
@@ -343,6 +342,9 @@ async function pauseButton() {
 	  return;
   }
   autoSimulation = false;
+  if (eventSource) {
+	controlStream('pause');
+  }
 
   document.getElementById("next-turn-button").hidden = false;
   document.getElementById("play-button").hidden = false;
@@ -362,6 +364,63 @@ function appendMessage(team, message) {
   newPost.innerHTML = `<div class="${team}-post-content"><p>${message}</p></div>`;
   postContainer.appendChild(newPost);
   postContainer.scrollTop = postContainer.scrollHeight;
+  return newPost;
+}
+
+// Generate a message with /generate_message/stream, showing the tokens in
+// a draft post as they arrive. Resolves to {message} or {error}
+async function streamMessage(team, body) {
+  const response = await fetch("/generate_message/stream", {
+	method: "POST",
+	headers: { "Content-Type": "application/json" },
+	body: JSON.stringify(body),
+  });
+  if (!response.ok || !response.body) {
+	return { error: `HTTP ${response.status}` };
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let draft = null;
+  let buffer = "";
+  try {
+	while (true) {
+	  const { value, done } = await reader.read();
+	  if (done) {
+		return { error: "The message stream ended early" };
+	  }
+	  buffer += decoder.decode(value, { stream: true });
+	  let boundary;
+	  while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+		const lines = buffer.slice(0, boundary).split("\n");
+		buffer = buffer.slice(boundary + 2);
+		const eventLine = lines.find(line => line.startsWith("event: "));
+		const dataLine = lines.find(line => line.startsWith("data: "));
+		if (!eventLine || !dataLine) {
+		  continue;
+		}
+		const data = JSON.parse(dataLine.slice(6));
+		const event = eventLine.slice(7);
+		if (event === "token") {
+		  if (draft === null) {
+			// The first words replace the wait
+			hideAIWaitModal();
+			draft = appendMessage(team, "");
+		  }
+		  draft.querySelector("p").textContent += data.text;
+		} else if (event === "done") {
+		  return { message: data.message };
+		} else if (event === "error") {
+		  return { error: data.error };
+		}
+	  }
+	}
+  } finally {
+	// The caller posts the complete message
+	if (draft !== null) {
+	  draft.remove();
+	}
+  }
 }
 
 function showAIWaitModal() {
@@ -378,7 +437,6 @@ function hideAIWaitModal() {
 
 let simulationRunning = false;
 let autoSimulation = false;
-let pollInterval = null;
 
 function initializeNetwork(initialData) {
 	const container = document.getElementById('graph-plot');
@@ -404,6 +462,9 @@ function initializeNetwork(initialData) {
 		edges: edges
 	};
 
+	// Nodes laid out by the server need no physics stabilisation
+	const hasPositions = initialData.nodes.length > 0 && initialData.nodes[0].x !== undefined;
+
 	const options = {
 		configure: {
 			enabled: false // Disable the configure option
@@ -414,7 +475,7 @@ function initializeNetwork(initialData) {
 			},
 			smooth: {
 				enabled: true,
-				type: 'dynamic' // Dynamic curve type
+				type: hasPositions ? 'continuous' : 'dynamic' // Dynamic curves need physics
 			},
 		},
 		nodes: {
@@ -432,9 +493,9 @@ function initializeNetwork(initialData) {
 			hideNodesOnDrag: false
 		},
 		physics: {
-			enabled: true,
+			enabled: !hasPositions,
 			stabilization: {
-				enabled: true,
+				enabled: !hasPositions,
 				fit: true, // Adjust view to fit the network
 				iterations: 1000, // Maximum number of iterations
 				onlyDynamicEdges: false, // Don't only consider dynamic edges
@@ -462,6 +523,9 @@ function updateNetwork(newData) {
 		else {
 			node.color = 'gray';
 		}
+		// Keep nodes where they are (or where the user dragged them)
+		delete node.x;
+		delete node.y;
 		network.body.data.nodes.update(node);
 	});
 	
@@ -505,7 +569,8 @@ function startSimulation() {
 	.then(data => {
 		if (data.status === 'started') {
 			if (autoSimulation) {
-				pollInterval = setInterval(pollForUpdates, 1000); // Poll every second
+				openStream();
+				controlStream('resume');
 			}
 		} else {
 			alert('Error starting simulation');
@@ -525,32 +590,66 @@ function startSimulation() {
 }
 
 
-// Function to poll for simulation updates
-function pollForUpdates() {
-	fetch('/get_update')
-		.then(response => response.json())
-		.then(data => {
-			if (data.status === 'running') {
+// Function to follow the game over the server's event stream. The
+// server plays the turns and pushes the stats and changed nodes of each.
+function openStream() {
+	if (eventSource) {
+		return;
+	}
+	eventSource = new EventSource('/stream');
+	eventSource.addEventListener('update', event => {
+		const data = JSON.parse(event.data);
+		if (data.data) {
+			if (network) {
 				updateNetwork(data.data);
-				updateStatus('Running (Step ${data.current_step})');
-				updateStats(data.stats); // ! NEED TO INCLUDE STATS IN THE RESPONSE
-			} else if (data.status === 'finished') {
-				updateStatus('Finished');
-				simulationRunning = false;
-				clearInterval(pollInterval);
-				toggleButtons(true);
-				disableControls(false);
-				alert('Simulation finished');
+			} else {
+				initializeNetwork(data.data);
 			}
-		})
-		.catch(error => {
-			console.error('Error getting simulation update:', error);
+		}
+		if (data.stats) {
+			updateStats(data.stats);
+		}
+		if (data.status === 'running' && data.data) {
+			updateStatus(`Running (Step ${data.current_step})`);
+			simulationRunning = false;
+		} else if (data.status === 'finished') {
+			updateStatus('Finished');
+			simulationRunning = false;
+			closeStream();
+			toggleButtons(true);
+			disableControls(false);
+			alert('Simulation finished');
+		} else if (data.status === 'error') {
+			console.error('Error performing simulation step:', data.message);
 			updateStatus('Error');
 			simulationRunning = false;
-			clearInterval(pollInterval);
 			toggleButtons(false);
-			disableControls(false);
-		});
+		}
+		// On 'closed' (a new network was generated) the browser
+		// reconnects to the new game by itself
+	});
+}
+
+function closeStream() {
+	if (eventSource) {
+		eventSource.close();
+		eventSource = null;
+	}
+}
+
+// Function to send a control ('pause', 'resume' or 'step') to the server's autoplay
+function controlStream(action) {
+	return fetch('/stream/control', {
+		method: 'POST',
+		headers: { 'Content-Type': 'application/json' },
+		body: JSON.stringify({ action: action })
+	})
+	.catch(error => {
+		console.error('Error controlling simulation:', error);
+		updateStatus('Error');
+		simulationRunning = false;
+		toggleButtons(false);
+	});
 }
 
 // Function to perform a single simulation step
@@ -563,30 +662,9 @@ function stepSimulation() {
 	updateStatus('Running');
 	toggleButtons(false);
 
-	fetch ('/get_update')
-		.then(response=> response.json())
-		.then(data => {
-			if (data.status === 'running') {
-				updateNetwork(data.data);
-				updateStatus('Running (Step ${data.current_step})');
-				updateStats(data.stats); // ! NEED TO INCLUDE STATS IN THE RESPONSE
-			} else if (data.status === 'finished') {
-				updateStatus('Finished');
-				simulationRunning = false;
-				toggleButtons(true);
-				alert('Simulation finished');
-			}
-			simulationRunning = false;
-			// toggleButtons(false);
-			console.log('Simulation step response:', data);
-		})
-		.catch(error => {
-			console.error('Error performing simulation step:', error);
-			updateStatus('Error');
-			simulationRunning = false;
-			toggleButtons(false);
-		});
-	}
+	openStream();
+	controlStream('step');
+}
 
 
 // Function to toggle simulation control buttons
@@ -849,7 +927,7 @@ function handleCustomTopic(team) {
   }
 }
 
-async function validateMessageAgainstTopic(message, teamTopic) {
+async function validateMessageAgainstTopic(message, teamTopic, modelName) {
   const validationPrompt = `
 	Validate the following message to see if it aligns with the given topic:
 	
@@ -864,7 +942,8 @@ async function validateMessageAgainstTopic(message, teamTopic) {
 	  method: "POST",
 	  headers: { "Content-Type": "application/json" },
 	  body: JSON.stringify({
-		model_name: "gemini-1.0-pro", // Use a default model for validation
+		// Use a default model for validation, or the local model offline
+		model_name: modelName && modelName.startsWith("local") ? modelName : "gemini-1.0-pro",
 		prompt: validationPrompt,
 	  }),
 	});
@@ -0,0 +1,293 @@
+"""
+Server-side autoplay, pushed to the browser with Server-Sent Events.
+
+An Autoplayer owns the game loop of one Simulator: a background thread
+plays a turn whenever the game is running (or a single step has been
+asked for) and the team to play has a message, then pushes the turn's
+stats and node changes to every subscriber. Viewers only watch, so any
+number of them can follow a game without advancing it.
+"""
+import json
+import queue
+import threading
+
+from Clash_Of_LLMs.graph.runner import advance
+
+ACTIONS = ("pause", "resume", "step")
+
+
+class Autoplayer:
+    """
+    Background game loop for a Simulator.
+
+    Attributes
+    ----------
+    simulator : Simulator
+        The game.
+    delay : float
+        Seconds to wait between turns while running. 0 plays turns as
+        fast as they compute.
+    fields : list
+        Node attributes sent in each update (see
+        Simulator.get_graph_delta).
+    fresh_messages : bool
+        While running, play each message only once, and wait for the
+        next message of a team before playing its turn. When False, a
+        team's last message is replayed, as the polling autoplay did.
+    on_stats : callable or None
+        Called with the stats of every turn played.
+    lock : threading.RLock or None
+        Lock held while a turn is played, shared with the code that
+        serves the same game. The default is a lock of its own.
+    running : bool
+        Whether turns are played continuously.
+    status : str
+        "paused", "running", "finished" or "closed".
+
+    Methods
+    -------
+    pause() / resume() / step()
+        Controls.
+    control(action, delay)
+        Apply a control by name.
+    subscribe() / unsubscribe(subscriber)
+        Follow the game updates.
+    notify()
+        Wake the loop, e.g. after a message has been set.
+    close()
+        Stop the loop and end every stream.
+    """
+
+    def __init__(
+        self,
+        simulator,
+        delay=None,
+        fields=("alignment",),
+        fresh_messages=True,
+        on_stats=None,
+        lock=None
+    ):
+        self.simulator = simulator
+        self.on_stats = on_stats
+        self.delay = simulator.autoplay_delay if delay is None else delay
+        self.fields = list(fields)
+        self.fresh_messages = fresh_messages
+        self.running = False
+        self.status = "paused"
+        self.stats = None
+        self.current_step = simulator.current_step
+        # Updates carry the changes since the previous update, so every
+        # subscriber stays in sync from its first snapshot on
+        self.version = simulator.delta.commit()
+        self._pending_steps = 0
+        self._played = {"Red": None, "Blue": None}
+        self._subscribers = []
+        self._condition = threading.Condition(lock if lock is not None else threading.RLock())
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def pause(self):
+        with self._condition:
+            self.running = False
+            self._pending_steps = 0
+            self._set_status("paused")
+
+    def resume(self):
+        with self._condition:
+            self.running = True
+            self._set_status("running")
+
+    def step(self):
+        """
+        Play one turn, as soon as its message is available.
+        """
+        with self._condition:
+            self._pending_steps += 1
+            self._condition.notify_all()
+
+    def control(self, action, delay=None):
+        """
+        Apply a control sent by a client.
+
+        Parameters
+        ----------
+        action : str or None
+            "pause", "resume", "step", or None to only change the delay.
+        delay : float, optional
+            New delay between turns (seconds).
+        """
+        if action is not None and action not in ACTIONS:
+            raise ValueError("Invalid action. Must be 'pause', 'resume' or 'step'.")
+        if delay is not None:
+            if float(delay) < 0:
+                raise ValueError("Invalid delay. Must be non-negative.")
+            with self._condition:
+                self.delay = float(delay)
+                self._condition.notify_all()
+        if action is not None:
+            getattr(self, action)()
+
+    def notify(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.running = False
+            self._set_status("closed")
+
+    def _set_status(self, status):
+        # Called with the condition held
+        if self.status in ["finished", "closed"]:
+            return
+        self.status = status
+        self._publish({"status": status})
+        self._condition.notify_all()
+
+    def subscribe(self):
+        """
+        Start following the game.
+
+        Returns
+        -------
+        queue.Queue
+            Queue of update dicts, starting with the full graph.
+        """
+        subscriber = queue.Queue()
+        with self._condition:
+            subscriber.put(self.snapshot())
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._condition:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def snapshot(self):
+        """
+        The full graph and the stats of the last turn (Simulator.get_stats
+        is not called again, as it charges Blue's energy).
+        """
+        with self._condition:
+            # Subscribers are sent the changes since self.version, so the
+            # full graph must be of a committed state (the game may have
+            # been played through /get_update since the last update)
+            if self.simulator.delta.pending:
+                self.simulator.delta.commit()
+            return {
+                "status": self.status,
+                "data": {**self.simulator.get_graph_data(), "full": True},
+                "current_step": self.current_step,
+                "stats": self.stats,
+                "delay": self.delay,
+            }
+
+    def _publish(self, event):
+        for subscriber in self._subscribers:
+            subscriber.put(event)
+
+    def _ready(self):
+        if self.status in ["finished", "closed"]:
+            return False
+        team = self.simulator.current_team
+        message = self.simulator.current_messages[team]
+        if message is None:
+            return False
+        # An asked-for step plays whatever message is set, as
+        # /get_update does
+        if self._pending_steps:
+            return True
+        return self.running and (not self.fresh_messages or message is not self._played[team])
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                # Messages are set by other requests, so also re-check
+                # now and then without a notify
+                while not self._ready():
+                    if self.status == "closed":
+                        return
+                    self._condition.wait(timeout=0.1)
+                team = self.simulator.current_team
+                self._played[team] = self.simulator.current_messages[team]
+                self._pending_steps = max(self._pending_steps - 1, 0)
+                try:
+                    status, update, stats = advance(
+                        self.simulator, delta=True, since=self.version, fields=self.fields
+                    )
+                except Exception as e:
+                    # Keep the loop alive; the clients decide what to do
+                    self.running = False
+                    self._pending_steps = 0
+                    self.status = "paused"
+                    self._publish({"status": "error", "message": str(e)})
+                    continue
+                if stats is not None and self.on_stats is not None:
+                    self.on_stats(stats)
+                if update.get("data") is not None:
+                    self.version = update["data"]["version"]
+                self.current_step = self.simulator.current_step
+                self.stats = stats if stats is not None else self.stats
+                self._publish({
+                    "status": status,
+                    "data": update.get("data"),
+                    "current_step": self.current_step,
+                    "stats": stats,
+                })
+                if status == "finished":
+                    self.running = False
+                    self.status = "finished"
+                    continue
+                delay = self.delay if self.running else 0
+                if delay > 0:
+                    # Controls cut the wait short
+                    self._condition.wait(timeout=delay)
+
+
+def sse_event(event, data):
+    """
+    Encode a Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_events(autoplayer, heartbeat=15.0, max_backlog=32):
+    """
+    Server-Sent Events stream of an Autoplayer's updates, one "update"
+    event per turn or status change.
+
+    Parameters
+    ----------
+    autoplayer : Autoplayer
+        The game to follow.
+    heartbeat : float, optional
+        Seconds between keep-alive comments while idle. The default is
+        15.
+    max_backlog : int, optional
+        A client that falls this many updates behind is sent the full
+        graph instead of the backlog. The default is 32.
+
+    Yields
+    ------
+    str
+        Encoded events.
+    """
+    subscriber = autoplayer.subscribe()
+    try:
+        yield "retry: 1000\n\n"
+        while True:
+            try:
+                event = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if subscriber.qsize() > max_backlog:
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+                event = autoplayer.snapshot()
+            yield sse_event("update", event)
+            if event["status"] == "closed":
+                return
+    finally:
+        autoplayer.unsubscribe(subscriber)